@@ -1,7 +1,10 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from pathlib import Path
 import os
 
+BACKEND_DIR = Path(__file__).resolve().parent
+
 
 class Settings(BaseSettings):
     # OpenAI
@@ -9,13 +12,90 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4o"
     openai_embed_model: str = "text-embedding-3-large"
 
+    # Shared OpenAI HTTP pool and retry policy (services/llm_gateway.py)
+    llm_max_connections: int = 100
+    llm_max_keepalive: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_timeout: float = 60.0
+    llm_max_retries: int = 3
+
     # Database (PostgreSQL)
     database_url: str = ""
 
+    # PostgreSQL connection pool per process: size, seconds to wait for
+    # a free connection, and idle seconds after which a connection is
+    # checked with SELECT 1 before reuse
+    db_pool_min: int = 1
+    db_pool_max: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_check_idle: float = 30.0
+    # asyncpg pool per event loop for async routes (services/db.py
+    # get_async_db)
+    db_async_pool_min: int = 1
+    db_async_pool_max: int = 10
+
     # Qdrant
     qdrant_url: str = "http://localhost:6333"
     qdrant_collection: str = "streamworks"
 
+    # Hybrid search per-leg timeouts (seconds)
+    bm25_search_timeout: float = 5.0
+    semantic_search_timeout: float = 20.0
+
+    # Seconds queries may be served from a stale BM25 index while it is
+    # rebuilt in the background before they wait for the rebuild
+    bm25_max_staleness: float = 30.0
+
+    # BM25 index snapshot (shared by all workers; empty = no persistence)
+    bm25_snapshot_dir: str = "data/bm25"
+    # Seconds uploads/deletes are collected before the snapshot is rewritten
+    # (a rewrite freezes and saves the whole index)
+    bm25_persist_interval: float = 10.0
+    # Seconds between checks of the API's BM25 index for documents finished
+    # by ingestion workers (0 = off; rag_service.sync_index)
+    bm25_sync_interval: float = 5.0
+
+    # Embedding cache (SQLite file; empty = disabled)
+    embedding_cache_path: str = "data/embedding_cache.sqlite3"
+    embedding_cache_max_mb: int = 512
+    embedding_cache_dtype: str = "float16"
+
+    # Embedding requests: per-batch token/input budget, concurrent
+    # batches in flight, and retries for rate-limited batches
+    embed_batch_max_tokens: int = 100_000
+    embed_batch_max_inputs: int = 512
+    embed_max_concurrency: int = 4
+    embed_max_retries: int = 6
+
+    # Ingestion worker threads per API process (0 = only standalone
+    # workers, see services/ingest_worker.py), job lease/heartbeat,
+    # attempts per job and backoff between attempts (seconds)
+    ingest_workers: int = 2
+    ingest_lease_seconds: float = 60.0
+    ingest_max_attempts: int = 3
+    ingest_retry_delay: float = 30.0
+    ingest_poll_interval: float = 2.0
+
+    # Ingestion pipeline: chunks per embed/upsert batch and batches
+    # buffered between pipeline stages
+    ingest_batch_chunks: int = 64
+    ingest_queue_batches: int = 4
+
+    # Chunking: maximum chunk size and overlap, in "chars" or "tokens"
+    # (embedding model tokens)
+    chunk_size: int = 800
+    chunk_overlap: int = 200
+    chunk_unit: str = "chars"
+
+    # Parser worker processes (0 = parse in the calling thread), PDF
+    # pages per parallel shard and CPU seconds per parse task
+    parse_workers: int = 2
+    parse_shard_pages: int = 50
+    parse_cpu_limit: float = 120.0
+
+    # XLSX: data rows per chunk
+    xlsx_chunk_rows: int = 50
+
     # MinIO
     minio_endpoint: str = "localhost:9000"
     minio_access_key: str = "streamworks"
@@ -23,6 +103,11 @@ class Settings(BaseSettings):
     minio_bucket: str = "documents"
     minio_secure: bool = False
 
+    # Uploads: maximum file size and MinIO multipart part size (bytes,
+    # at least 5 MiB); uploads are streamed, never held in memory
+    max_upload_mb: int = 200
+    upload_part_size: int = 16 * 1024 * 1024
+
     # Server
     backend_host: str = "0.0.0.0"
     backend_port: int = 8000
@@ -43,3 +128,11 @@ class Settings(BaseSettings):
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
+
+
+def resolve_data_path(path: str) -> Path:
+    """Resolve a configured data path; relative paths are relative to the backend dir."""
+    resolved = Path(path)
+    if not resolved.is_absolute():
+        resolved = BACKEND_DIR / resolved
+    return resolved
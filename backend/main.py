@@ -1,12 +1,37 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
 from routers import health, wizard, rag, documents, options
+from services import db, ingestion, parse_pool, rag_service
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-app = FastAPI(title="Streamworks-KI", version="2.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up ingestion jobs interrupted by a restart
+    try:
+        await asyncio.to_thread(ingestion.resume_pending)
+    except Exception as e:
+        logger.warning("Could not resume ingestion jobs: %s", e)
+    ingestion.start_workers(settings.ingest_workers)
+    rag_service.start_index_sync(settings.bm25_sync_interval)
+    yield
+    rag_service.stop_index_sync()
+    ingestion.stop_workers()
+    parse_pool.shutdown()
+    await asyncio.to_thread(rag_service.flush_index)
+    await db.close_async_pool()
+
+
+app = FastAPI(title="Streamworks-KI", version="2.0.0", lifespan=lifespan)
 
 allowed_origins = [origin.strip() for origin in settings.cors_origins.split(",")]
 
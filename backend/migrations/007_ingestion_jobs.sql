@@ -0,0 +1,9 @@
+-- Ingestion job state on documents (uploads are processed in the background)
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'ready';
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS stage TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS progress INT NOT NULL DEFAULT 100;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS error TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(status)
+    WHERE status IN ('queued', 'processing');
@@ -0,0 +1,17 @@
+-- Ingestion job queue, claimed by workers with FOR UPDATE SKIP LOCKED
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    document_id UUID PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INT NOT NULL DEFAULT 0,
+    locked_by TEXT,
+    locked_until TIMESTAMPTZ,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_queued ON ingest_jobs(available_at)
+    WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_leases ON ingest_jobs(locked_until)
+    WHERE status = 'running';
@@ -0,0 +1,2 @@
+-- SHA-256 of the stored original, computed while the upload streams to MinIO
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
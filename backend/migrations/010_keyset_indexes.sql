@@ -0,0 +1,6 @@
+-- Keyset pagination: each paged list seeks and orders on (sort key, id)
+CREATE INDEX IF NOT EXISTS idx_documents_created_id ON documents(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_id ON chat_sessions(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created_id
+    ON chat_messages(session_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_id ON sessions(created_at, id);
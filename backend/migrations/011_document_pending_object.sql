@@ -0,0 +1,2 @@
+-- Re-uploaded original waiting to be ingested; becomes object_name on success
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS pending_object_name TEXT;
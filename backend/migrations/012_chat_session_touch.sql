@@ -0,0 +1,14 @@
+-- A new message bumps its session's updated_at in the same statement
+CREATE OR REPLACE FUNCTION touch_chat_session()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE chat_sessions SET updated_at = now() WHERE id = NEW.session_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chat_messages_touch_session ON chat_messages;
+CREATE TRIGGER chat_messages_touch_session
+    AFTER INSERT ON chat_messages
+    FOR EACH ROW
+    EXECUTE FUNCTION touch_chat_session();
@@ -0,0 +1,3 @@
+-- Chat sessions are paged on (created_at, id); updated_at changes while paging.
+-- idx_chat_sessions_updated_id (010) stays for the unpaged list, newest activity first
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_created_id ON chat_sessions(created_at, id);
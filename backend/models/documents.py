@@ -8,6 +8,8 @@ class UploadResponse(BaseModel):
     filename: str
     chunks: int
     message: str
+    replaced: bool = False
+    status: str = "ready"
 
 
 class DocumentInfo(BaseModel):
@@ -17,9 +19,26 @@ class DocumentInfo(BaseModel):
     mime_type: str
     chunks: int = 0
     folder_id: Optional[str] = None
+    status: str = "ready"
+    progress: int = 100
     created_at: Optional[datetime] = None
 
 
+class DocumentPage(BaseModel):
+    items: list[DocumentInfo]
+    next_cursor: Optional[str] = None
+
+
+class DocumentStatus(BaseModel):
+    document_id: str
+    filename: str
+    status: str
+    stage: Optional[str] = None
+    progress: int = 0
+    error: Optional[str] = None
+    chunks: int = 0
+
+
 class SearchRequest(BaseModel):
     query: str
     limit: int = 5
@@ -29,6 +29,11 @@ class ChatSession(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class ChatSessionPage(BaseModel):
+    items: list[ChatSession]
+    next_cursor: Optional[str] = None
+
+
 class ChatMessage(BaseModel):
     id: str
     session_id: str
@@ -36,3 +41,8 @@ class ChatMessage(BaseModel):
     content: str
     sources: list[Source] = []
     created_at: Optional[datetime] = None
+
+
+class ChatMessagePage(BaseModel):
+    items: list[ChatMessage]
+    next_cursor: Optional[str] = None
@@ -10,6 +10,11 @@ class WizardSession(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class WizardSessionPage(BaseModel):
+    items: list[WizardSession]
+    next_cursor: Optional[str] = None
+
+
 class SaveStepRequest(BaseModel):
     step: int
     data: dict
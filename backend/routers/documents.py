@@ -1,23 +1,41 @@
+import asyncio
+import json
+import os
 import uuid
 import logging
+from contextlib import closing
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from models.documents import (
     UploadResponse,
     DocumentInfo,
+    DocumentPage,
     FolderCreate,
     FolderInfo,
     FolderUpdate,
     DocumentMove,
     DocumentPreview,
+    DocumentStatus,
 )
-from services import document_processor, vector_store, file_storage
-from services.db import get_db
+from config import get_settings
+from services import ingestion, parse_pool, vector_store, file_storage
+from services.db import get_async_db, keyset_page, page_result
+from services.file_storage import UploadTooLarge
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Seconds between job-state polls of the progress event stream
+_EVENTS_POLL_INTERVAL = 0.5
+
+# Columns behind DocumentInfo; list endpoints never fetch the rest of the row
+_DOCUMENT_COLUMNS = (
+    "id, filename, file_size, mime_type, chunks, folder_id, status, progress, created_at"
+)
+_DOCUMENT_KEYS = ["created_at", "id"]
+
 
 # ── Folder Endpoints ───────────────────────────────────────────────
 
@@ -25,7 +43,7 @@ router = APIRouter()
 @router.post("/folders", response_model=FolderInfo)
 async def create_folder(body: FolderCreate):
     folder_id = str(uuid.uuid4())
-    get_db().table("folders").insert({
+    await get_async_db().table("folders").insert({
         "id": folder_id,
         "name": body.name,
         "color": body.color,
@@ -42,25 +60,21 @@ async def create_folder(body: FolderCreate):
 @router.get("/folders", response_model=list[FolderInfo])
 async def list_folders():
     result = (
-        get_db()
+        await get_async_db()
         .table("folders")
         .select("*")
         .order("created_at", desc=False)
         .execute()
     )
-    docs = (
-        get_db()
+    # Documents per folder, counted by the database
+    counts = (
+        await get_async_db()
         .table("documents")
-        .select("*")
+        .group_by("folder_id")
+        .count()
         .execute()
     )
-
-    # Count documents per folder
-    folder_counts: dict[str, int] = {}
-    for doc in docs.data:
-        fid = doc.get("folder_id")
-        if fid:
-            folder_counts[fid] = folder_counts.get(fid, 0) + 1
+    folder_counts = {row["folder_id"]: row["count"] for row in counts.data}
 
     return [
         FolderInfo(
@@ -88,7 +102,7 @@ async def update_folder(folder_id: str, body: FolderUpdate):
     update_data["updated_at"] = "now()"
 
     result = (
-        get_db()
+        await get_async_db()
         .table("folders")
         .update(update_data)
         .eq("id", folder_id)
@@ -100,9 +114,13 @@ async def update_folder(folder_id: str, body: FolderUpdate):
 
     folder = result.data[0]
 
-    # Count documents
-    docs = get_db().table("documents").select("*").eq("folder_id", folder_id).execute()
-    doc_count = len(docs.data) if docs.data else 0
+    doc_count = (
+        await get_async_db()
+        .table("documents")
+        .count()
+        .eq("folder_id", folder_id)
+        .execute()
+    ).data
 
     return FolderInfo(
         id=folder["id"],
@@ -116,12 +134,15 @@ async def update_folder(folder_id: str, body: FolderUpdate):
 @router.delete("/folders/{folder_id}")
 async def delete_folder(folder_id: str):
     # Move documents in this folder back to root (folder_id = None)
-    docs = get_db().table("documents").select("*").eq("folder_id", folder_id).execute()
-    if docs.data:
-        for doc in docs.data:
-            get_db().table("documents").update({"folder_id": None}).eq("id", doc["id"]).execute()
+    await (
+        get_async_db()
+        .table("documents")
+        .update({"folder_id": None})
+        .eq("folder_id", folder_id)
+        .execute()
+    )
 
-    get_db().table("folders").delete().eq("id", folder_id).execute()
+    await get_async_db().table("folders").delete().eq("id", folder_id).execute()
     return {"message": "Ordner geloescht"}
 
 
@@ -132,12 +153,12 @@ async def delete_folder(folder_id: str):
 async def move_document(document_id: str, body: DocumentMove):
     # Verify folder exists if folder_id is given
     if body.folder_id:
-        folder = get_db().table("folders").select("*").eq("id", body.folder_id).execute()
+        folder = await get_async_db().table("folders").select("*").eq("id", body.folder_id).execute()
         if not folder.data:
             raise HTTPException(404, "Ordner nicht gefunden")
 
     result = (
-        get_db()
+        await get_async_db()
         .table("documents")
         .update({"folder_id": body.folder_id, "updated_at": "now()"})
         .eq("id", document_id)
@@ -150,9 +171,35 @@ async def move_document(document_id: str, body: DocumentMove):
     return {"message": "Dokument verschoben"}
 
 
+# Characters of extracted text shown in the preview
+_PREVIEW_CHARS = 10000
+
+
+def _preview_text(object_name: str, filename: str, mime_type: str) -> str:
+    """
+    Extract the start of a stored original, parsed from a temp file (in
+    the parse pool, like ingestion) and only as far as the preview reaches.
+    """
+    suffix = os.path.splitext(filename)[1]
+    parts: list[str] = []
+    size = 0
+    with file_storage.download_to_temp(object_name, suffix) as path, \
+            closing(parse_pool.iter_segments(filename, path, mime_type)) as segments:
+        # Closing the generator cancels parse tasks still running
+        for segment in segments:
+            parts.append(segment.text)
+            size += len(segment.text) + 2
+            if size > _PREVIEW_CHARS:
+                break
+    text = "\n\n".join(parts)
+    if len(text) > _PREVIEW_CHARS:
+        text = text[:_PREVIEW_CHARS] + "\n\n... (gekuerzt)"
+    return text
+
+
 @router.get("/{document_id}/preview", response_model=DocumentPreview)
 async def preview_document(document_id: str):
-    doc = get_db().table("documents").select("*").eq("id", document_id).execute()
+    doc = await get_async_db().table("documents").select("*").eq("id", document_id).execute()
     if not doc.data:
         raise HTTPException(404, "Dokument nicht gefunden")
 
@@ -164,18 +211,13 @@ async def preview_document(document_id: str):
         raise HTTPException(404, "Datei nicht im Speicher gefunden")
 
     try:
-        file_bytes = file_storage.download_file(object_name)
-        text = document_processor._parse_file(
-            doc_info["filename"], file_bytes, mime_type
+        text = await asyncio.to_thread(
+            _preview_text, object_name, doc_info["filename"], mime_type
         )
     except Exception as e:
         logger.warning("Vorschau fehlgeschlagen fuer %s: %s", document_id, e)
         text = f"(Vorschau nicht verfuegbar: {e})"
 
-    # Limit preview to first 10000 chars
-    if len(text) > 10000:
-        text = text[:10000] + "\n\n... (gekuerzt)"
-
     return DocumentPreview(
         id=document_id,
         filename=doc_info["filename"],
@@ -187,7 +229,7 @@ async def preview_document(document_id: str):
 # ── Existing Endpoints (modified) ─────────────────────────────────
 
 
-@router.post("/upload", response_model=UploadResponse)
+@router.post("/upload", response_model=UploadResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     folder_id: Optional[str] = Query(None),
@@ -202,117 +244,213 @@ async def upload_document(
     if file.content_type not in allowed:
         raise HTTPException(400, f"Unsupported file type: {file.content_type}")
 
-    file_bytes = await file.read()
-    if len(file_bytes) == 0:
+    # The body is already spooled to a temp file; it is streamed from
+    # there to MinIO and never read into memory
+    max_mb = get_settings().max_upload_mb
+    if file.size == 0:
         raise HTTPException(400, "Leere Datei kann nicht verarbeitet werden")
-    if len(file_bytes) > 40 * 1024 * 1024:
-        raise HTTPException(400, "File too large (max 40MB)")
+    if file.size is not None and file.size > max_mb * 1024 * 1024:
+        raise HTTPException(400, f"File too large (max {max_mb}MB)")
+
+    # Verify folder exists if folder_id is given
+    if folder_id:
+        folder = await get_async_db().table("folders").select("*").eq("id", folder_id).execute()
+        if not folder.data:
+            raise HTTPException(404, "Ordner nicht gefunden")
 
-    # Check for duplicate filename
+    # An existing filename is replaced in place (new version of the document)
     existing = (
-        get_db()
+        await get_async_db()
         .table("documents")
-        .select("id")
+        .select("*")
         .eq("filename", file.filename)
         .execute()
     )
-    if existing.data:
+    doc = existing.data[0] if existing.data else None
+    if doc and doc.get("status") in ingestion.ACTIVE_STATES:
         raise HTTPException(
             409,
-            f"Dokument '{file.filename}' existiert bereits. Bitte zuerst loeschen oder umbenennen.",
+            f"Dokument '{file.filename}' wird gerade verarbeitet. Bitte spaeter erneut versuchen.",
         )
+    document_id = doc["id"] if doc else str(uuid.uuid4())
+    # Every version gets its own object: the current original stays in
+    # place until the new version has been ingested (services.ingestion)
+    object_name = f"{document_id}/{uuid.uuid4().hex[:12]}/{file.filename}"
 
-    # Verify folder exists if folder_id is given
-    if folder_id:
-        folder = get_db().table("folders").select("*").eq("id", folder_id).execute()
-        if not folder.data:
-            raise HTTPException(404, "Ordner nicht gefunden")
-
+    # Store the original first; the ingestion job reads it from MinIO
+    await file.seek(0)
     try:
-        result = document_processor.process_document(
-            file.filename, file_bytes, file.content_type
+        file_size, content_hash = await asyncio.to_thread(
+            file_storage.upload_stream,
+            object_name,
+            file.file,
+            file.content_type,
+            max_mb * 1024 * 1024,
         )
+    except UploadTooLarge:
+        raise HTTPException(400, f"File too large (max {max_mb}MB)")
     except Exception as e:
         raise HTTPException(
             500,
-            f"Dokument konnte nicht verarbeitet werden: {e}"
+            f"Dokument konnte nicht gespeichert werden: {e}"
+        )
+
+    if doc and doc.get("status") == ingestion.READY and doc.get("content_hash") == content_hash:
+        # Same content as the indexed version: nothing to re-ingest
+        await asyncio.to_thread(file_storage.discard_file, object_name)
+        if folder_id:
+            await get_async_db().table("documents").update({"folder_id": folder_id}).eq(
+                "id", document_id
+            ).execute()
+        return UploadResponse(
+            document_id=document_id,
+            filename=file.filename,
+            chunks=doc.get("chunks", 0),
+            message=f"Document '{file.filename}' is unchanged",
+            replaced=True,
+            status=ingestion.READY,
         )
 
-    # Persist document metadata in DB so GET /api/documents/ returns it
-    insert_data = {
-        "id": result["document_id"],
-        "filename": result["filename"],
-        "object_name": f"{result['document_id']}/{result['filename']}",
-        "file_size": len(file_bytes),
+    job_data = {
+        "file_size": file_size,
+        "content_hash": content_hash,
         "mime_type": file.content_type,
-        "chunks": result["chunks_count"],
+        "status": ingestion.QUEUED,
+        "stage": None,
+        "progress": 0,
+        "error": None,
     }
     if folder_id:
-        insert_data["folder_id"] = folder_id
+        job_data["folder_id"] = folder_id
+
+    if doc:
+        job_data["pending_object_name"] = object_name
+        job_data["updated_at"] = "now()"
+        await get_async_db().table("documents").update(job_data).eq("id", document_id).execute()
+        # A version that failed earlier is superseded
+        if doc.get("pending_object_name"):
+            await asyncio.to_thread(file_storage.discard_file, doc["pending_object_name"])
+    else:
+        await get_async_db().table("documents").insert({
+            "id": document_id,
+            "filename": file.filename,
+            "chunks": 0,
+            "object_name": object_name,
+            **job_data,
+        }).execute()
+
+    await asyncio.to_thread(ingestion.enqueue, document_id)
 
-    get_db().table("documents").insert(insert_data).execute()
+    return UploadResponse(
+        document_id=document_id,
+        filename=file.filename,
+        chunks=doc.get("chunks", 0) if doc else 0,
+        message=f"Document '{file.filename}' queued for processing",
+        replaced=doc is not None,
+        status=ingestion.QUEUED,
+    )
 
-    # Mark hybrid search index dirty so new chunks are found
-    from services.rag_service import mark_index_dirty
-    mark_index_dirty()
 
-    return UploadResponse(
-        document_id=result["document_id"],
-        filename=result["filename"],
-        chunks=result["chunks_count"],
-        message=f"Document '{file.filename}' processed successfully",
+@router.get("/{document_id}/status", response_model=DocumentStatus)
+async def document_status(document_id: str):
+    status = await asyncio.to_thread(ingestion.job_status, document_id)
+    if status is None:
+        raise HTTPException(404, "Dokument nicht gefunden")
+    return DocumentStatus(**status)
+
+
+@router.get("/{document_id}/events")
+async def document_events(document_id: str):
+    """Server-Sent Events with the job's progress until it is ready or failed."""
+    status = await asyncio.to_thread(ingestion.job_status, document_id)
+    if status is None:
+        raise HTTPException(404, "Dokument nicht gefunden")
+
+    async def event_generator():
+        current = status
+        last = None
+        while True:
+            if current is None:
+                yield f"event: error\ndata: {json.dumps({'detail': 'Dokument nicht gefunden'})}\n\n"
+                return
+            if current != last:
+                yield f"event: progress\ndata: {json.dumps(current)}\n\n"
+                last = current
+            if current["status"] in ingestion.TERMINAL_STATES:
+                yield f"event: done\ndata: {json.dumps({'status': current['status']})}\n\n"
+                return
+            await asyncio.sleep(_EVENTS_POLL_INTERVAL)
+            current = await asyncio.to_thread(ingestion.job_status, document_id)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+def _document_info(doc: dict) -> DocumentInfo:
+    return DocumentInfo(
+        id=doc["id"],
+        filename=doc["filename"],
+        file_size=doc.get("file_size", 0),
+        mime_type=doc.get("mime_type", ""),
+        chunks=doc.get("chunks", 0),
+        folder_id=doc.get("folder_id"),
+        status=doc.get("status") or ingestion.READY,
+        progress=doc.get("progress", 100),
+        created_at=doc.get("created_at"),
     )
 
 
 @router.get("/", response_model=list[DocumentInfo])
 async def list_documents():
     result = (
-        get_db()
+        await get_async_db()
         .table("documents")
-        .select("*")
+        .select(_DOCUMENT_COLUMNS)
         .order("created_at", desc=True)
         .execute()
     )
-    return [
-        DocumentInfo(
-            id=doc["id"],
-            filename=doc["filename"],
-            file_size=doc.get("file_size", 0),
-            mime_type=doc.get("mime_type", ""),
-            chunks=doc.get("chunks", 0),
-            folder_id=doc.get("folder_id"),
-            created_at=doc.get("created_at"),
-        )
-        for doc in result.data
-    ]
+    return [_document_info(doc) for doc in result.data]
+
+
+@router.get("/paged", response_model=DocumentPage)
+async def list_documents_paged(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """Documents newest first, ``limit`` at a time; pass ``next_cursor`` on."""
+    query = get_async_db().table("documents").select(_DOCUMENT_COLUMNS)
+    try:
+        result = await keyset_page(query, _DOCUMENT_KEYS, limit, cursor, desc=True).execute()
+    except ValueError:
+        raise HTTPException(400, "Ungueltiger Cursor")
+    docs, next_cursor = page_result(result.data, _DOCUMENT_KEYS, limit)
+    return DocumentPage(
+        items=[_document_info(doc) for doc in docs], next_cursor=next_cursor
+    )
 
 
 @router.delete("/{document_id}")
 async def delete_document(document_id: str):
     # Delete from vector store
-    vector_store.delete_document(document_id)
+    await asyncio.to_thread(vector_store.delete_document, document_id)
 
     # Delete from file storage
     doc = (
-        get_db()
+        await get_async_db()
         .table("documents")
         .select("*")
         .eq("id", document_id)
         .execute()
     )
     if doc.data:
-        object_name = doc.data[0].get("object_name")
-        if object_name:
-            try:
-                file_storage.delete_file(object_name)
-            except Exception:
-                pass
+        for key in ("object_name", "pending_object_name"):
+            if doc.data[0].get(key):
+                await asyncio.to_thread(file_storage.discard_file, doc.data[0][key])
 
     # Delete from database
-    get_db().table("documents").delete().eq("id", document_id).execute()
+    await get_async_db().table("documents").delete().eq("id", document_id).execute()
 
-    # Mark hybrid search index dirty
-    from services.rag_service import mark_index_dirty
-    mark_index_dirty()
+    # Drop the document's chunks from the hybrid search index
+    from services.rag_service import remove_document_from_index
+    await asyncio.to_thread(remove_document_from_index, document_id)
 
     return {"message": "Document deleted"}
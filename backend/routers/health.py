@@ -1,4 +1,5 @@
 from fastapi import APIRouter
+from services import db, embedding_cache, llm_gateway, rag_service
 
 router = APIRouter()
 
@@ -6,3 +7,27 @@ router = APIRouter()
 @router.get("/health")
 async def health_check():
     return {"status": "ok", "version": "2.0.0"}
+
+
+@router.get("/health/search-index")
+async def search_index_stats():
+    """BM25 index size and per-component memory usage of this worker."""
+    return rag_service.index_stats()
+
+
+@router.get("/health/embedding-cache")
+async def embedding_cache_stats():
+    """Embedding cache size and hit/miss counters of this worker."""
+    return embedding_cache.stats()
+
+
+@router.get("/health/llm")
+async def llm_stats():
+    """Latency, token and error counters per OpenAI call site of this worker."""
+    return llm_gateway.metrics()
+
+
+@router.get("/health/db")
+async def db_pool_stats():
+    """PostgreSQL connection pool usage and wait times of this worker."""
+    return db.pool_stats()
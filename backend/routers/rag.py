@@ -1,50 +1,83 @@
-from fastapi import APIRouter, HTTPException
+import json
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from models.rag import ChatRequest, ChatResponse, Source, ChatSession, ChatMessage
+from models.rag import (
+    ChatRequest, ChatResponse, Source, ChatSession, ChatMessage,
+    ChatSessionPage, ChatMessagePage,
+)
 from services import rag_service, chat_session_service
 
 router = APIRouter()
 
+# Session storage and the RAG pipeline are both async, so concurrent
+# chats never stall the loop.
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(body: ChatRequest):
+
+async def _start_turn(body: ChatRequest) -> tuple[str, list[dict]]:
+    """Create or load the session, store the user message and return its history."""
     # Create or get session
     if body.session_id:
-        session = chat_session_service.get_session(body.session_id)
+        session = await chat_session_service.get_session(body.session_id)
         if not session:
             raise HTTPException(404, "Session not found")
         session_id = body.session_id
     else:
-        session = chat_session_service.create_session()
+        session = await chat_session_service.create_session()
         session_id = session["id"]
 
     # Save user message
-    chat_session_service.add_message(session_id, "user", body.message)
+    await chat_session_service.add_message(session_id, "user", body.message)
 
     # Get chat history
-    history = chat_session_service.get_chat_history(session_id)
+    history = await chat_session_service.get_chat_history(session_id)
+    return session_id, history
 
-    # Query RAG
-    result = rag_service.query(body.message, chat_history=history[:-1])
 
-    # Save assistant message -- normalize keys to match Source model
-    sources_data = []
-    for s in result["sources"]:
+def _normalize_sources(sources: list) -> list[dict]:
+    """Normalize source keys to match the Source model for storage."""
+    normalized = []
+    for s in sources:
         d = s if isinstance(s, dict) else s.dict()
-        sources_data.append({
+        normalized.append({
             "document_name": d.get("document_name", ""),
             "chunk_text": d.get("chunk_text") or d.get("text_preview") or d.get("text", ""),
             "score": d.get("score", 0),
             "page": d.get("page"),
         })
-    chat_session_service.add_message(
-        session_id, "assistant", result["answer"], sources=sources_data
-    )
+    return normalized
+
+
+async def _finish_turn(
+    body: ChatRequest,
+    session_id: str,
+    history: list[dict],
+    answer: str,
+    sources: list[dict],
+) -> None:
+    """Store the assistant message and auto-title new sessions."""
+    await chat_session_service.add_message(session_id, "assistant", answer, sources=sources)
 
     # Auto-title on first message
     if len(history) <= 1:
         title = body.message[:50] + ("..." if len(body.message) > 50 else "")
-        chat_session_service.update_session_title(session_id, title)
+        await chat_session_service.update_session_title(session_id, title)
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(body: ChatRequest):
+    session_id, history = await _start_turn(body)
+
+    # Query RAG
+    result = await rag_service.query(body.message, chat_history=history[:-1])
+
+    # Save assistant message
+    await _finish_turn(
+        body, session_id, history,
+        result["answer"], _normalize_sources(result["sources"]),
+    )
 
     return ChatResponse(
         answer=result["answer"],
@@ -64,28 +97,13 @@ async def chat(body: ChatRequest):
 
 @router.post("/chat/stream")
 async def chat_stream(body: ChatRequest):
-    # Create or get session
-    if body.session_id:
-        session = chat_session_service.get_session(body.session_id)
-        if not session:
-            raise HTTPException(404, "Session not found")
-        session_id = body.session_id
-    else:
-        session = chat_session_service.create_session()
-        session_id = session["id"]
-
-    # Save user message
-    chat_session_service.add_message(session_id, "user", body.message)
-
-    # Get chat history
-    history = chat_session_service.get_chat_history(session_id)
+    session_id, history = await _start_turn(body)
 
     async def event_generator():
-        import json
         full_answer = ""
         sources = []
 
-        for event in rag_service.query_stream(body.message, chat_history=history[:-1]):
+        async for event in rag_service.query_stream(body.message, chat_history=history[:-1]):
             etype = event["type"]
             if etype == "sources":
                 sources = event["data"]
@@ -96,60 +114,82 @@ async def chat_stream(body: ChatRequest):
             elif etype == "done":
                 yield f"event: done\ndata: {json.dumps({'confidence': event['data']})}\n\n"
 
-        # Save assistant message after streaming -- normalize keys to match Source model
-        norm_sources = []
-        for s in sources:
-            d = s if isinstance(s, dict) else s.dict()
-            norm_sources.append({
-                "document_name": d.get("document_name", ""),
-                "chunk_text": d.get("chunk_text") or d.get("text_preview") or d.get("text", ""),
-                "score": d.get("score", 0),
-                "page": d.get("page"),
-            })
-        chat_session_service.add_message(session_id, "assistant", full_answer, sources=norm_sources)
-
-        # Auto-title on first message
-        if len(history) <= 1:
-            title = body.message[:50] + ("..." if len(body.message) > 50 else "")
-            chat_session_service.update_session_title(session_id, title)
+        # Save assistant message after streaming
+        await _finish_turn(
+            body, session_id, history,
+            full_answer, _normalize_sources(sources),
+        )
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
+def _chat_session(s: dict) -> ChatSession:
+    return ChatSession(
+        id=s["id"],
+        title=s["title"],
+        created_at=s.get("created_at"),
+        updated_at=s.get("updated_at"),
+    )
+
+
+def _chat_message(m: dict) -> ChatMessage:
+    return ChatMessage(
+        id=m["id"],
+        session_id=m["session_id"],
+        role=m["role"],
+        content=m["content"],
+        sources=[
+            Source(**s) if isinstance(s, dict) else s
+            for s in (m.get("sources") or [])
+        ],
+        created_at=m.get("created_at"),
+    )
+
+
 @router.get("/sessions", response_model=list[ChatSession])
 async def list_sessions():
-    sessions = chat_session_service.list_sessions()
-    return [
-        ChatSession(
-            id=s["id"],
-            title=s["title"],
-            created_at=s.get("created_at"),
-            updated_at=s.get("updated_at"),
-        )
-        for s in sessions
-    ]
+    sessions = await chat_session_service.list_sessions()
+    return [_chat_session(s) for s in sessions]
+
+
+@router.get("/sessions/paged", response_model=ChatSessionPage)
+async def list_sessions_paged(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    try:
+        sessions, next_cursor = await chat_session_service.list_sessions_page(limit, cursor)
+    except ValueError:
+        raise HTTPException(400, "Ungueltiger Cursor")
+    return ChatSessionPage(
+        items=[_chat_session(s) for s in sessions], next_cursor=next_cursor
+    )
 
 
 @router.get("/sessions/{session_id}/messages", response_model=list[ChatMessage])
 async def get_messages(session_id: str):
-    messages = chat_session_service.get_messages(session_id)
-    return [
-        ChatMessage(
-            id=m["id"],
-            session_id=m["session_id"],
-            role=m["role"],
-            content=m["content"],
-            sources=[
-                Source(**s) if isinstance(s, dict) else s
-                for s in (m.get("sources") or [])
-            ],
-            created_at=m.get("created_at"),
+    messages = await chat_session_service.get_messages(session_id)
+    return [_chat_message(m) for m in messages]
+
+
+@router.get("/sessions/{session_id}/messages/paged", response_model=ChatMessagePage)
+async def get_messages_paged(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    try:
+        messages, next_cursor = await chat_session_service.get_messages_page(
+            session_id, limit, cursor
         )
-        for m in messages
-    ]
+    except ValueError:
+        raise HTTPException(400, "Ungueltiger Cursor")
+    return ChatMessagePage(
+        items=[_chat_message(m) for m in messages], next_cursor=next_cursor
+    )
 
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
-    chat_session_service.delete_session(session_id)
+    await chat_session_service.delete_session(session_id)
     return {"message": "Session deleted"}
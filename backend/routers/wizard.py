@@ -9,7 +9,9 @@ import logging
 import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
 
 from models.wizard import (
     AnalyzeRequest,
@@ -22,8 +24,9 @@ from models.wizard import (
     QuickEditRequest,
     SaveStepRequest,
     WizardSession,
+    WizardSessionPage,
 )
-from services.db import get_db
+from services.db import get_db, keyset_page, page_result
 from services.parameter_extractor import (
     FIELD_LABELS,
     FIELD_TO_STEP,
@@ -79,6 +82,25 @@ def list_sessions():
     return result.data or []
 
 
+@router.get("/sessions/paged", response_model=WizardSessionPage)
+def list_sessions_paged(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+):
+    """
+    List wizard sessions newest first, ``limit`` at a time, without their
+    ``data`` (fetch a session for that).
+    """
+    keys = ["created_at", "id"]
+    query = get_db().table("sessions").select("id, created_at, updated_at")
+    try:
+        result = keyset_page(query, keys, limit, cursor, desc=True).execute()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Ungueltiger Cursor")
+    rows, next_cursor = page_result(result.data or [], keys, limit)
+    return WizardSessionPage(items=rows, next_cursor=next_cursor)
+
+
 @router.get("/sessions/{session_id}")
 def get_session(session_id: str):
     """Get a single wizard session by ID."""
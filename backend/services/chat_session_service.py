@@ -1,25 +1,47 @@
-from services.db import get_db
+from services.db import get_async_db, keyset_page, page_result
 
+_SESSION_COLUMNS = "id, title, created_at, updated_at"
+# Paged on the immutable creation time: updated_at moves with every new
+# message, which would shift sessions between pages while paging
+_SESSION_KEYS = ["created_at", "id"]
+_MESSAGE_COLUMNS = "id, session_id, role, content, sources, created_at"
+_MESSAGE_KEYS = ["created_at", "id"]
 
-def create_session(title: str = "Neuer Chat") -> dict:
-    result = get_db().table("chat_sessions").insert({"title": title}).execute()
+
+async def create_session(title: str = "Neuer Chat") -> dict:
+    result = await get_async_db().table("chat_sessions").insert({"title": title}).execute()
     return result.data[0]
 
 
-def list_sessions() -> list[dict]:
+async def list_sessions() -> list[dict]:
     result = (
-        get_db()
+        await get_async_db()
         .table("chat_sessions")
-        .select("*")
+        .select(_SESSION_COLUMNS)
         .order("updated_at", desc=True)
         .execute()
     )
     return result.data
 
 
-def get_session(session_id: str) -> dict | None:
+async def list_sessions_page(limit: int, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """
+    One page of sessions, newest first.
+
+    Returns:
+        The sessions and the cursor of the next page (None on the last).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = get_async_db().table("chat_sessions").select(_SESSION_COLUMNS)
+    result = await keyset_page(query, _SESSION_KEYS, limit, cursor, desc=True).execute()
+    return page_result(result.data, _SESSION_KEYS, limit)
+
+
+async def get_session(session_id: str) -> dict | None:
     result = (
-        get_db()
+        await get_async_db()
         .table("chat_sessions")
         .select("*")
         .eq("id", session_id)
@@ -28,9 +50,9 @@ def get_session(session_id: str) -> dict | None:
     return result.data[0] if result.data else None
 
 
-def update_session_title(session_id: str, title: str) -> dict:
+async def update_session_title(session_id: str, title: str) -> dict:
     result = (
-        get_db()
+        await get_async_db()
         .table("chat_sessions")
         .update({"title": title, "updated_at": "now()"})
         .eq("id", session_id)
@@ -39,28 +61,25 @@ def update_session_title(session_id: str, title: str) -> dict:
     return result.data[0] if result.data else None
 
 
-def delete_session(session_id: str) -> None:
-    get_db().table("chat_sessions").delete().eq("id", session_id).execute()
+async def delete_session(session_id: str) -> None:
+    await get_async_db().table("chat_sessions").delete().eq("id", session_id).execute()
 
 
-def add_message(session_id: str, role: str, content: str, sources: list = None) -> dict:
+async def add_message(session_id: str, role: str, content: str, sources: list = None) -> dict:
     row = {
         "session_id": session_id,
         "role": role,
         "content": content,
         "sources": sources or [],
     }
-    result = get_db().table("chat_messages").insert(row).execute()
-    # Touch session updated_at
-    get_db().table("chat_sessions").update(
-        {"updated_at": "now()"}
-    ).eq("id", session_id).execute()
+    # The session's updated_at is bumped by the chat_messages insert trigger
+    result = await get_async_db().table("chat_messages").insert(row).execute()
     return result.data[0]
 
 
-def get_messages(session_id: str) -> list[dict]:
+async def get_messages(session_id: str) -> list[dict]:
     result = (
-        get_db()
+        await get_async_db()
         .table("chat_messages")
         .select("*")
         .eq("session_id", session_id)
@@ -70,10 +89,35 @@ def get_messages(session_id: str) -> list[dict]:
     return result.data
 
 
-def get_chat_history(session_id: str, limit: int = 10) -> list[dict]:
+async def get_messages_page(
+    session_id: str, limit: int, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    One page of a session's messages, oldest first.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = (
+        get_async_db()
+        .table("chat_messages")
+        .select(_MESSAGE_COLUMNS)
+        .eq("session_id", session_id)
+    )
+    result = await keyset_page(query, _MESSAGE_KEYS, limit, cursor).execute()
+    return page_result(result.data, _MESSAGE_KEYS, limit)
+
+
+async def get_chat_history(session_id: str, limit: int = 10) -> list[dict]:
     """Get recent messages formatted for LLM chat history."""
-    messages = get_messages(session_id)
-    history = []
-    for msg in messages[-limit:]:
-        history.append({"role": msg["role"], "content": msg["content"]})
-    return history
+    result = (
+        await get_async_db()
+        .table("chat_messages")
+        .select("role, content")
+        .eq("session_id", session_id)
+        .order("created_at", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    # Newest first from the query, oldest first for the model
+    return [{"role": msg["role"], "content": msg["content"]} for msg in reversed(result.data)]
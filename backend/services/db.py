@@ -6,30 +6,223 @@ so all existing router/service code continues to work unchanged.
 
 Falls back to a file-backed in-memory store when DATABASE_URL is not set
 (for local development without Docker).
+
+``get_async_db`` offers the same interface with awaitable ``execute``
+(asyncpg) for async routes.
 """
 
+import asyncio
+import base64
+import itertools
 import json
 import logging
 import os
+import re
+import threading
+import time
 import uuid
-from datetime import datetime, timezone
+import weakref
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
 from functools import lru_cache
 from pathlib import Path
+from typing import Callable
 
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
-from psycopg2.pool import SimpleConnectionPool
 
 from config import get_settings
 
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - async routes fall back to threads
+    asyncpg = None
+
 logger = logging.getLogger(__name__)
 
 # ── Connection Pool ──────────────────────────────────────────────────
 
-_pool: SimpleConnectionPool | None = None
 
+class PoolTimeout(RuntimeError):
+    """No pooled connection became free within the pool's wait timeout."""
+
+
+class _ConnectionPool:
+    """
+    Thread-safe, bounded PostgreSQL connection pool.
+
+    Sync routes run in the Starlette threadpool and ingestion workers in
+    their own threads, so connections are handed out under a lock. When
+    all ``maxconn`` connections are in use, callers wait (up to
+    ``timeout`` seconds) for one to be returned instead of failing.
+    Connections that sat idle longer than ``check_idle`` seconds are
+    verified with ``SELECT 1`` before reuse; broken ones are replaced.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], "psycopg2.extensions.connection"],
+        minconn: int = 1,
+        maxconn: int = 10,
+        timeout: float = 30.0,
+        check_idle: float = 30.0,
+    ):
+        self._connect = connect
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._cond = threading.Condition()
+        self._idle: deque[tuple[object, float]] = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        # Counters for stats()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(self.minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._open += 1
+
+    def getconn(self, timeout: float | None = None):
+        """
+        Borrow a connection, waiting for one if the pool is exhausted.
+
+        Raises:
+            PoolTimeout: If none became free within ``timeout`` seconds
+                (default: the pool's timeout).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.maxconn:
+                    conn, returned_at = None, None
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection free after {timeout:g}s "
+                        f"({self.maxconn} in use)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        # Connect and health-check outside the lock
+        try:
+            if conn is not None and not self._healthy(conn, returned_at):
+                self._close(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn) -> None:
+        """Return a borrowed connection; broken ones are closed and dropped."""
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                keep = False
+        with self._cond:
+            self._in_use -= 1
+            if keep and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+                if not keep:
+                    self._discarded += 1
+            self._cond.notify()
+        if not keep or self._closed:
+            self._close(conn)
+
+    def closeall(self) -> None:
+        """Close idle connections; connections in use are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        """Pool size, in-use/idle/waiting gauges and wait-time counters."""
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+            }
+
+    def _healthy(self, conn, returned_at: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.info("Dropping broken database connection: %s", e)
+            return False
 
-def _get_pool() -> SimpleConnectionPool | None:
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pool: _ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _ConnectionPool | None:
     global _pool
     if _pool is not None:
         return _pool
@@ -39,26 +232,54 @@ def _get_pool() -> SimpleConnectionPool | None:
         logger.warning("DATABASE_URL not set, using in-memory fallback")
         return None
 
-    try:
-        _pool = SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
-            dsn=settings.database_url,
-        )
-        # Quick connectivity test
-        conn = _pool.getconn()
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
         try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT 1")
-            conn.commit()
-        finally:
-            _pool.putconn(conn)
-        logger.info("Connected to PostgreSQL")
-        return _pool
-    except Exception as e:
-        logger.warning("PostgreSQL unavailable (%s), using in-memory fallback", e)
-        _pool = None
-        return None
+            pool = _ConnectionPool(
+                lambda: psycopg2.connect(settings.database_url),
+                minconn=settings.db_pool_min,
+                maxconn=settings.db_pool_max,
+                timeout=settings.db_pool_timeout,
+                check_idle=settings.db_pool_check_idle,
+            )
+            # Quick connectivity test
+            conn = pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.commit()
+            finally:
+                pool.putconn(conn)
+            logger.info(
+                "Connected to PostgreSQL (pool %d-%d)", pool.minconn, pool.maxconn
+            )
+            _pool = pool
+            return _pool
+        except Exception as e:
+            logger.warning("PostgreSQL unavailable (%s), using in-memory fallback", e)
+            return None
+
+
+def pool_stats() -> dict:
+    """
+    Connection pool gauges of this process (empty without PostgreSQL),
+    including the asyncpg pool of the calling event loop.
+    """
+    if _pool is None:
+        return {"backend": "memory"}
+    stats = {"backend": "postgres", **_pool.stats()}
+    async_pool = _current_async_pool()
+    if async_pool is not None:
+        size, idle = async_pool.get_size(), async_pool.get_idle_size()
+        stats["async"] = {
+            "min": async_pool.get_min_size(),
+            "max": async_pool.get_max_size(),
+            "open": size,
+            "in_use": size - idle,
+            "idle": idle,
+        }
+    return stats
 
 
 def init_db():
@@ -87,6 +308,28 @@ def init_db():
         pool.putconn(conn)
 
 
+@contextmanager
+def pg_connection():
+    """
+    Borrow a pooled PostgreSQL connection for statements the query builder
+    cannot express (row locking, multi-statement transactions).
+
+    Commits when the block exits normally and rolls back on error.
+    """
+    pool = _get_pool()
+    if pool is None:
+        raise RuntimeError("PostgreSQL is not configured")
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
 # ── PostgreSQL Query Builder ─────────────────────────────────────────
 
 class _PgResult:
@@ -94,30 +337,56 @@ class _PgResult:
         self.data = data
 
 
+def _keyset(orders: list[tuple[str, bool]], values: list) -> tuple[list[str], str]:
+    """Order keys and comparison (">" or "<") of a keyset pagination cursor."""
+    if len(values) != len(orders) or len({desc for _, desc in orders}) != 1:
+        raise ValueError("Keyset pagination needs one value per order key and one direction")
+    return [key for key, _ in orders], "<" if orders[0][1] else ">"
+
+
 class _PgTable:
     """Chainable query builder that translates to SQL."""
 
-    def __init__(self, table_name: str, pool: SimpleConnectionPool):
+    def __init__(self, table_name: str, pool: _ConnectionPool):
         self._table = table_name
         self._pool = pool
         self._op = "select"
         self._columns = "*"
-        self._filters: list[tuple[str, object]] = []
-        self._order_key: str | None = None
-        self._order_desc = False
+        self._filters: list[tuple[str, str, object]] = []
+        self._orders: list[tuple[str, bool]] = []
+        self._after: list | None = None
         self._limit_n: int | None = None
         self._single_mode = False
-        self._insert_data: dict | None = None
+        self._insert_data: list[dict] = []
+        self._on_conflict: str | None = None
         self._update_data: dict | None = None
+        self._group_by: list[str] = []
 
     def select(self, cols="*"):
         self._op = "select"
         self._columns = cols
         return self
 
-    def insert(self, data: dict):
+    def count(self):
+        """Count matching rows (per group with ``group_by``) in the database."""
+        self._op = "count"
+        return self
+
+    def group_by(self, *keys: str):
+        self._group_by = list(keys)
+        return self
+
+    def insert(self, data: dict | list[dict]):
+        """Insert one row, or many in a single statement."""
         self._op = "insert"
-        self._insert_data = data
+        self._insert_data = [data] if isinstance(data, dict) else list(data)
+        return self
+
+    def upsert(self, data: dict | list[dict], on_conflict: str = "id"):
+        """Insert rows, updating the existing row on an ``on_conflict`` clash."""
+        self.insert(data)
+        self._op = "upsert"
+        self._on_conflict = on_conflict
         return self
 
     def update(self, data: dict):
@@ -130,12 +399,32 @@ class _PgTable:
         return self
 
     def eq(self, key: str, value):
-        self._filters.append((key, value))
+        self._filters.append((key, "eq", value))
+        return self
+
+    def in_(self, key: str, values):
+        self._filters.append((key, "in", list(values)))
+        return self
+
+    def gt(self, key: str, value):
+        self._filters.append((key, "gt", value))
+        return self
+
+    def lt(self, key: str, value):
+        self._filters.append((key, "lt", value))
         return self
 
     def order(self, key: str, desc: bool = False):
-        self._order_key = key
-        self._order_desc = desc
+        """Sort by ``key``; further calls add tie-breakers."""
+        self._orders.append((key, desc))
+        return self
+
+    def after(self, values: list):
+        """
+        Keyset pagination: only rows sorting after ``values``, the order
+        key values of the last row of the previous page.
+        """
+        self._after = list(values)
         return self
 
     def limit(self, n: int):
@@ -148,55 +437,129 @@ class _PgTable:
         return self
 
     def _where_clause(self):
-        if not self._filters:
-            return "", []
         parts = []
         values = []
-        for key, val in self._filters:
-            if val is None:
+        if self._after is not None:
+            keys, op = _keyset(self._orders, self._after)
+            cols = ", ".join(f'"{k}"' for k in keys)
+            slots = ", ".join(["%s"] * len(keys))
+            parts.append(f"({cols}) {op} ({slots})")
+            values.extend(self._after)
+        for key, op, val in self._filters:
+            if op in ("gt", "lt"):
+                parts.append(f'"{key}" {">" if op == "gt" else "<"} %s')
+                values.append(val)
+            elif op == "in":
+                # One placeholder per value: an array parameter goes out as
+                # text[], which Postgres will not compare with uuid columns
+                if val:
+                    slots = ", ".join(["%s"] * len(val))
+                    parts.append(f'"{key}" IN ({slots})')
+                    values.extend(val)
+                else:
+                    parts.append("FALSE")
+            elif val is None:
                 parts.append(f'"{key}" IS NULL')
             else:
                 parts.append(f'"{key}" = %s')
                 values.append(val)
+        if not parts:
+            return "", []
         return " WHERE " + " AND ".join(parts), values
 
     def execute(self):
+        statement = self._statement()
+        if statement is None:
+            return _PgResult([])
+        sql, values = statement
         conn = self._pool.getconn()
         try:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                if self._op == "insert":
-                    return self._exec_insert(cur, conn)
-                elif self._op == "update":
-                    return self._exec_update(cur, conn)
-                elif self._op == "delete":
-                    return self._exec_delete(cur, conn)
-                else:
-                    return self._exec_select(cur)
+                cur.execute(sql, values)
+                rows = cur.fetchall()
+            if self._op != "select":
+                conn.commit()
+        except psycopg2.DataError as e:
+            self._reject_cursor(e)
+            raise
         finally:
             self._pool.putconn(conn)
+        return self._result(rows)
+
+    def _reject_cursor(self, error: Exception) -> None:
+        """Report a value Postgres could not take as a bad cursor, if one was given."""
+        if self._after is not None:
+            raise ValueError(f"Invalid cursor values: {self._after!r}") from error
+
+    def _statement(self) -> tuple[str, list] | None:
+        """
+        The SQL (with %s placeholders) and parameters of this query, or
+        None if there is nothing to run (inserting no rows).
+        """
+        if self._op in ("insert", "upsert"):
+            return self._insert_statement() if self._insert_data else None
+        elif self._op == "update":
+            return self._update_statement()
+        elif self._op == "delete":
+            return self._delete_statement()
+        elif self._op == "count":
+            return self._count_statement()
+        return self._select_statement()
+
+    def _result(self, rows) -> _PgResult:
+        if self._op == "count" and not self._group_by:
+            return _PgResult(rows[0]["count"] if rows else 0)
+        result = [self._deserialize(dict(r)) for r in rows]
+        if self._op == "select" and self._single_mode:
+            return _PgResult(result[0] if result else None)
+        return _PgResult(result)
 
-    def _exec_insert(self, cur, conn):
-        data = dict(self._insert_data)
-
-        # Auto-generate id if missing
-        if "id" not in data:
-            data["id"] = str(uuid.uuid4())
+    def _insert_statement(self):
+        rows = []
+        columns: dict[str, None] = {}
+        for data in self._insert_data:
+            data = dict(data)
 
-        # Serialize dicts/lists to JSON for JSONB columns
-        for k, v in data.items():
-            if isinstance(v, (dict, list)):
-                data[k] = json.dumps(v, ensure_ascii=False)
+            # Auto-generate id if missing
+            if "id" not in data:
+                data["id"] = str(uuid.uuid4())
 
-        cols = ", ".join(f'"{k}"' for k in data.keys())
-        placeholders = ", ".join(["%s"] * len(data))
-        sql = f'INSERT INTO "{self._table}" ({cols}) VALUES ({placeholders}) RETURNING *'
+            # Serialize dicts/lists to JSON for JSONB columns
+            for k, v in data.items():
+                if isinstance(v, (dict, list)):
+                    data[k] = json.dumps(v, ensure_ascii=False)
+            rows.append(data)
+            columns.update(dict.fromkeys(data))
 
-        cur.execute(sql, list(data.values()))
-        conn.commit()
-        row = cur.fetchone()
-        return _PgResult([self._deserialize(dict(row))] if row else [])
+        # All rows go into one statement; columns a row lacks get DEFAULT
+        values = []
+        tuples = []
+        for data in rows:
+            slots = []
+            for k in columns:
+                if k not in data:
+                    slots.append("DEFAULT")
+                elif data[k] == "now()":
+                    slots.append("NOW()")
+                else:
+                    slots.append("%s")
+                    values.append(data[k])
+            tuples.append(f"({', '.join(slots)})")
+
+        cols = ", ".join(f'"{k}"' for k in columns)
+        sql = f'INSERT INTO "{self._table}" ({cols}) VALUES {", ".join(tuples)}'
+        if self._op == "upsert":
+            # The id of an existing row is kept (it may be auto-generated here)
+            updates = ", ".join(
+                f'"{k}" = EXCLUDED."{k}"'
+                for k in columns
+                if k not in (self._on_conflict, "id")
+            )
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            sql += f' ON CONFLICT ("{self._on_conflict}") {action}'
+        return sql + " RETURNING *", values
 
-    def _exec_update(self, cur, conn):
+    def _update_statement(self):
         data = dict(self._update_data)
 
         # Handle "now()" special value
@@ -215,45 +578,48 @@ class _PgTable:
         values.extend(where_vals)
 
         sql = f'UPDATE "{self._table}" SET {", ".join(set_parts)}{where} RETURNING *'
-        cur.execute(sql, values)
-        conn.commit()
-        rows = cur.fetchall()
-        return _PgResult([self._deserialize(dict(r)) for r in rows])
+        return sql, values
 
-    def _exec_delete(self, cur, conn):
+    def _delete_statement(self):
         where, values = self._where_clause()
         sql = f'DELETE FROM "{self._table}"{where} RETURNING *'
-        cur.execute(sql, values)
-        conn.commit()
-        rows = cur.fetchall()
-        return _PgResult([self._deserialize(dict(r)) for r in rows])
+        return sql, values
 
-    def _exec_select(self, cur):
+    def _count_statement(self):
+        where, values = self._where_clause()
+        keys = ", ".join(f'"{k}"' for k in self._group_by)
+        if not keys:
+            return f'SELECT COUNT(*) AS "count" FROM "{self._table}"{where}', values
+        sql = (
+            f'SELECT {keys}, COUNT(*) AS "count" FROM "{self._table}"{where}'
+            f" GROUP BY {keys}"
+        )
+        return sql, values
+
+    def _select_statement(self):
         where, values = self._where_clause()
 
         order = ""
-        if self._order_key:
-            direction = "DESC" if self._order_desc else "ASC"
-            order = f' ORDER BY "{self._order_key}" {direction}'
+        if self._orders:
+            order = " ORDER BY " + ", ".join(
+                f'"{key}" {"DESC" if desc else "ASC"}' for key, desc in self._orders
+            )
 
         limit = ""
         if self._limit_n is not None:
             limit = f" LIMIT {self._limit_n}"
 
         sql = f'SELECT {self._columns} FROM "{self._table}"{where}{order}{limit}'
-        cur.execute(sql, values)
-        rows = cur.fetchall()
-        result = [self._deserialize(dict(r)) for r in rows]
-
-        if self._single_mode:
-            return _PgResult(result[0] if result else None)
-        return _PgResult(result)
+        return sql, values
 
     def _deserialize(self, row: dict) -> dict:
         """Ensure JSONB columns come back as Python dicts/lists, and datetimes as ISO strings."""
         for k, v in row.items():
             if isinstance(v, datetime):
                 row[k] = v.isoformat()
+            elif isinstance(v, uuid.UUID):
+                # asyncpg decodes UUID columns, psycopg2 returns strings
+                row[k] = str(v)
             elif isinstance(v, str) and k in ("data", "sources", "metadata"):
                 try:
                     row[k] = json.loads(v)
@@ -265,13 +631,169 @@ class _PgTable:
 class _PgStore:
     """PostgreSQL store with the same .table() interface as Supabase client."""
 
-    def __init__(self, pool: SimpleConnectionPool):
+    def __init__(self, pool: _ConnectionPool):
         self._pool = pool
 
     def table(self, name: str):
         return _PgTable(name, self._pool)
 
 
+def commit_horizon() -> str:
+    """
+    Start of the oldest transaction still open on the database (ISO 8601).
+
+    Rows are stamped with ``now()``, the start time of the transaction
+    that writes them, so a row with an earlier ``updated_at`` can no longer
+    be committed: readers that page on ``updated_at`` up to this point miss
+    nothing that commits later. Without PostgreSQL writes are immediate and
+    this is the current time.
+
+    Only transactions of the application's own database role are visible
+    in ``pg_stat_activity``, which is all that writes these rows.
+    """
+    if not isinstance(get_db(), _PgStore):
+        return datetime.now(timezone.utc).isoformat()
+    with pg_connection() as conn, conn.cursor() as cur:
+        # Includes this transaction, so there is always a row
+        cur.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity"
+            " WHERE datname = current_database()"
+        )
+        return cur.fetchone()[0].isoformat()
+
+
+# ── Async Query Builder ──────────────────────────────────────────────
+
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _get_async_pool():
+    """The asyncpg pool of the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    task = _async_pools.get(loop)
+    if task is None:
+        settings = get_settings()
+        task = loop.create_task(
+            asyncpg.create_pool(
+                settings.database_url,
+                min_size=settings.db_async_pool_min,
+                max_size=settings.db_async_pool_max,
+            )
+        )
+        _async_pools[loop] = task
+    try:
+        return await task
+    except Exception:
+        if _async_pools.get(loop) is task:
+            del _async_pools[loop]
+        raise
+
+
+def _current_async_pool():
+    try:
+        task = _async_pools.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+    if task is None or not task.done() or task.cancelled() or task.exception():
+        return None
+    return task.result()
+
+
+async def close_async_pool() -> None:
+    """Close the asyncpg pool of the running event loop, if any."""
+    pool = _current_async_pool()
+    _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+def _numbered(sql: str) -> str:
+    """Turn psycopg2 ``%s`` placeholders into asyncpg's ``$1, $2, ...``."""
+    count = itertools.count(1)
+    return re.sub(r"%s", lambda _: f"${next(count)}", sql)
+
+
+def _coerce(types, values: list) -> list:
+    """
+    Convert ISO timestamp strings (as rows and cursors carry them) for
+    timestamp parameters; asyncpg, unlike psycopg2, does not cast text.
+    """
+    coerced = []
+    for param, value in zip(types, values):
+        if isinstance(value, str) and param.name in ("timestamptz", "timestamp"):
+            value = datetime.fromisoformat(value)
+        elif isinstance(value, str) and param.name == "date":
+            value = date.fromisoformat(value)
+        coerced.append(value)
+    return coerced
+
+
+class _AsyncPgTable(_PgTable):
+    """``_PgTable`` whose ``execute`` is awaitable and runs on asyncpg."""
+
+    def __init__(self, table_name: str):
+        super().__init__(table_name, None)
+
+    async def execute(self):
+        statement = self._statement()
+        if statement is None:
+            return _PgResult([])
+        sql, values = statement
+        pool = await _get_async_pool()
+        async with pool.acquire(timeout=get_settings().db_pool_timeout) as conn:
+            statement = await conn.prepare(_numbered(sql))
+            try:
+                rows = await statement.fetch(*_coerce(statement.get_parameters(), values))
+            except asyncpg.DataError as e:
+                self._reject_cursor(e)
+                raise
+        return self._result(rows)
+
+
+class _AsyncPgStore:
+    """Async PostgreSQL store with the same .table() interface."""
+
+    def table(self, name: str):
+        return _AsyncPgTable(name)
+
+
+class _AsyncQuery:
+    """Awaitable wrapper around a sync query builder."""
+
+    def __init__(self, query, offload: bool):
+        self._query = query
+        self._offload = offload
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def chain(*args, **kwargs):
+            return _AsyncQuery(method(*args, **kwargs), self._offload)
+
+        return chain
+
+    async def execute(self):
+        if self._offload:
+            return await asyncio.to_thread(self._query.execute)
+        return self._query.execute()
+
+
+class _AsyncStore:
+    """
+    Async view of a sync store: the in-memory store is queried in place,
+    blocking stores in a worker thread.
+    """
+
+    def __init__(self, store, offload: bool):
+        self._store = store
+        self._offload = offload
+
+    def table(self, name: str):
+        return _AsyncQuery(self._store.table(name), self._offload)
+
+
 # ── In-Memory Fallback Store ────────────────────────────────────────
 
 _STORAGE_FILE = Path(__file__).resolve().parent.parent / "data" / "local_db.json"
@@ -283,6 +805,7 @@ class _MemStore:
     _DEFAULT_TABLES = [
         "sessions", "streams", "dropdown_options",
         "chat_sessions", "chat_messages", "documents", "folders",
+        "ingest_jobs",
     ]
 
     def __init__(self, persist: bool = True):
@@ -369,14 +892,17 @@ class _MemTable:
     def __init__(self, rows: list[dict], on_mutate=None):
         self._rows = rows
         self._on_mutate = on_mutate
-        self._filters: list[tuple[str, object]] = []
-        self._order_key = None
-        self._order_desc = False
+        self._filters: list[tuple[str, str, object]] = []
+        self._orders: list[tuple[str, bool]] = []
+        self._group_by: list[str] = []
         self._selected = "*"
 
     def _clone(self):
+        # Carries the whole query, as _PgTable keeps it across calls
         t = _MemTable(self._rows, self._on_mutate)
         t._filters = list(self._filters)
+        t._orders = list(self._orders)
+        t._group_by = list(self._group_by)
         return t
 
     def select(self, cols="*"):
@@ -384,9 +910,14 @@ class _MemTable:
         t._selected = cols
         return t
 
-    def insert(self, data: dict):
+    def insert(self, data: dict | list[dict]):
         t = self._clone()
-        t._insert_data = data
+        t._insert_data = [data] if isinstance(data, dict) else list(data)
+        return t
+
+    def upsert(self, data: dict | list[dict], on_conflict: str = "id"):
+        t = self.insert(data)
+        t._on_conflict = on_conflict
         return t
 
     def update(self, data: dict):
@@ -399,13 +930,37 @@ class _MemTable:
         t._is_delete = True
         return t
 
+    def count(self):
+        t = self._clone()
+        t._count = True
+        return t
+
+    def group_by(self, *keys: str):
+        self._group_by = list(keys)
+        return self
+
     def eq(self, key: str, value):
-        self._filters.append((key, value))
+        self._filters.append((key, "eq", value))
+        return self
+
+    def in_(self, key: str, values):
+        self._filters.append((key, "in", list(values)))
+        return self
+
+    def gt(self, key: str, value):
+        self._filters.append((key, "gt", value))
+        return self
+
+    def lt(self, key: str, value):
+        self._filters.append((key, "lt", value))
         return self
 
     def order(self, key: str, desc: bool = False):
-        self._order_key = key
-        self._order_desc = desc
+        self._orders.append((key, desc))
+        return self
+
+    def after(self, values: list):
+        self._after = list(values)
         return self
 
     def limit(self, n: int):
@@ -423,16 +978,27 @@ class _MemTable:
     def execute(self):
         if hasattr(self, '_insert_data'):
             now = datetime.now(timezone.utc).isoformat()
-            row = {**self._insert_data}
-            if "id" not in row:
-                row["id"] = str(uuid.uuid4())
-            if "created_at" not in row:
-                row["created_at"] = now
-            if "updated_at" not in row:
-                row["updated_at"] = now
-            self._rows.append(row)
-            self._persist()
-            return _MemResult([row])
+            on_conflict = getattr(self, '_on_conflict', None)
+            existing = {}
+            if on_conflict:
+                existing = {r.get(on_conflict): r for r in self._rows}
+            written = []
+            for data in self._insert_data:
+                data = {k: now if v == "now()" else v for k, v in data.items()}
+                current = existing.get(data.get(on_conflict)) if on_conflict else None
+                if current is not None:
+                    # Like ON CONFLICT DO UPDATE, the existing row keeps its id
+                    current.update({k: v for k, v in data.items() if k != "id"})
+                    written.append(current)
+                    continue
+                row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **data}
+                self._rows.append(row)
+                if on_conflict:
+                    existing[row.get(on_conflict)] = row
+                written.append(row)
+            if written:
+                self._persist()
+            return _MemResult(written)
 
         if hasattr(self, '_is_delete'):
             deleted = [r for r in self._rows if self._matches(r)]
@@ -457,21 +1023,53 @@ class _MemTable:
                 self._persist()
             return _MemResult(updated)
 
+        if hasattr(self, '_count'):
+            # Count without copying or sorting rows
+            keys = self._group_by
+            if not keys:
+                return _MemResult(sum(1 for r in self._rows if self._matches(r)))
+            counts = Counter(
+                tuple(r.get(k) for k in keys) for r in self._rows if self._matches(r)
+            )
+            return _MemResult([
+                {**dict(zip(keys, group)), "count": n} for group, n in counts.items()
+            ])
+
         results = [r for r in self._rows if self._matches(r)]
-        if self._order_key:
+        if hasattr(self, '_after'):
+            keys, op = _keyset(self._orders, self._after)
+            after = tuple(self._after)
+            position = [(tuple(r.get(k) for k in keys), r) for r in results]
+            if op == ">":
+                results = [r for key, r in position if key > after]
+            else:
+                results = [r for key, r in position if key < after]
+        # Stable sorts, least significant key first; NULLs sort as the
+        # largest value, as in PostgreSQL
+        for key, desc in reversed(self._orders):
             results.sort(
-                key=lambda r: r.get(self._order_key, ""),
-                reverse=self._order_desc,
+                key=lambda r: (r.get(key) is None, 0 if r.get(key) is None else r.get(key)),
+                reverse=desc,
             )
         if hasattr(self, '_limit'):
             results = results[:self._limit]
+        if self._selected.strip() != "*":
+            cols = [c.strip() for c in self._selected.split(",")]
+            results = [{c: r[c] for c in cols if c in r} for r in results]
         if hasattr(self, '_single') and self._single:
             return _MemResult(results[0] if results else None)
         return _MemResult(results)
 
     def _matches(self, row: dict) -> bool:
-        for key, value in self._filters:
-            if row.get(key) != value:
+        for key, op, value in self._filters:
+            if op in ("gt", "lt"):
+                current = row.get(key)
+                if current is None or not (current > value if op == "gt" else current < value):
+                    return False
+            elif op == "in":
+                if row.get(key) not in value:
+                    return False
+            elif row.get(key) != value:
                 return False
         return True
 
@@ -496,3 +1094,79 @@ def get_db():
         _store = _MemStore()
 
     return _store
+
+
+def get_async_db():
+    """
+    Returns a store whose queries are awaited:
+    ``await get_async_db().table(...).select(...).execute()``.
+
+    With PostgreSQL, queries run on asyncpg with a pool per event loop,
+    so async routes never block the loop on a database round-trip
+    (without asyncpg installed they run in worker threads instead). The
+    in-memory fallback is shared with ``get_db``.
+    """
+    store = get_db()
+    if isinstance(store, _PgStore):
+        if asyncpg is not None:
+            return _AsyncPgStore()
+        return _AsyncStore(store, offload=True)
+    return _AsyncStore(store, offload=False)
+
+
+def encode_cursor(row: dict, keys: list[str]) -> str:
+    """Opaque pagination cursor holding ``row``'s values of the order keys."""
+    payload = json.dumps([row.get(k) for k in keys], default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Order key values from ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    # Order keys are timestamps, ids or numbers; anything else was not
+    # produced by encode_cursor
+    if not isinstance(values, list) or not all(
+        isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in values
+    ):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return values
+
+
+def keyset_page(query, keys: list[str], limit: int, cursor: str | None = None, desc: bool = False):
+    """
+    Order ``query`` by ``keys`` (the last one must be unique, e.g. ``id``)
+    and limit it to the page after ``cursor``.
+
+    One extra row is fetched to tell whether another page follows; pass
+    the rows to ``page_result``.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    for key in keys:
+        query = query.order(key, desc=desc)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError(f"Invalid cursor: {cursor!r}")
+        query = query.after(values)
+    return query.limit(limit + 1)
+
+
+def page_result(rows: list[dict], keys: list[str], limit: int) -> tuple[list[dict], str | None]:
+    """
+    Split the rows of a ``keyset_page`` query into the page and the next
+    cursor (the query must select the order keys).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], keys)
@@ -2,12 +2,24 @@
 Document processing pipeline: parse, chunk, embed, store.
 
 Supports PDF, DOCX, XLSX, and plain text files.
-Stores the original file in MinIO and indexed chunks in Qdrant.
+Stores indexed chunks in Qdrant; the original is stored in MinIO by the
+upload route and ingested by a background job (``services.ingestion``).
+
+Ingestion is streamed: parsed pages are chunked as they arrive, and
+batches of chunks flow through bounded queues to concurrent embedding
+and Qdrant upsert stages.
 """
 
+import itertools
 import logging
-import uuid
-from services import vector_store, file_storage
+import threading
+from collections import deque
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from config import get_settings
+from services import vector_store, parse_pool
+from services.embedding_scheduler import count_tokens
+from services.pipeline import Stage, run_pipeline
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +28,13 @@ logger = logging.getLogger(__name__)
 # Parsing
 # ---------------------------------------------------------------------------
 
+class _Segment(NamedTuple):
+    """A piece of a document's text and the page it starts on (None if unknown)."""
+
+    page: int | None
+    text: str
+
+
 def _parse_file(filename: str, file_bytes: bytes, content_type: str) -> str:
     """
     Extract plain text from a file based on its content type.
@@ -28,80 +47,171 @@ def _parse_file(filename: str, file_bytes: bytes, content_type: str) -> str:
     Returns:
         Extracted text content as a single string.
 
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    return "\n\n".join(
+        segment.text for segment in _iter_segments(filename, file_bytes, content_type)
+    )
+
+
+def _file_kind(filename: str, content_type: str) -> str:
+    """
+    Classify a file as ``pdf``, ``docx``, ``xlsx`` or ``text``.
+
     Raises:
         ValueError: If the file type is not supported.
     """
     lower_name = filename.lower()
 
-    # PDF
     if content_type == "application/pdf" or lower_name.endswith(".pdf"):
-        return _parse_pdf(file_bytes)
-
-    # DOCX
+        return "pdf"
     if (
         content_type
         == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         or lower_name.endswith(".docx")
     ):
-        return _parse_docx(file_bytes)
-
-    # XLSX
+        return "docx"
     if (
         content_type
         == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         or lower_name.endswith(".xlsx")
     ):
-        return _parse_xlsx(file_bytes)
-
+        return "xlsx"
     # Plain text (txt, csv, md, json, xml, yaml, etc.)
     if content_type.startswith("text/") or lower_name.endswith(
         (".txt", ".csv", ".md", ".json", ".xml", ".yaml", ".yml")
     ):
-        return file_bytes.decode("utf-8", errors="replace")
-
+        return "text"
     raise ValueError(
         f"Unsupported file type: content_type={content_type}, filename={filename}"
     )
 
 
-def _parse_pdf(file_bytes: bytes) -> str:
-    """Extract text from a PDF using PyMuPDF (fitz)."""
+def _iter_segments(filename: str, source: bytes | str, content_type: str) -> Iterator[_Segment]:
+    """
+    Yield the text of a file in segments: pages for PDFs, sections for
+    DOCX, the whole text for other types.
+
+    Chunking can start on the first segment before the rest of the file
+    is parsed. Only non-empty segments are yielded; joined with blank
+    lines they form the document text that chunk offsets refer to.
+    ``source`` is the file's bytes or a path to it.
+
+    Raises:
+        ValueError: If the file type is not supported.
+    """
+    kind = _file_kind(filename, content_type)
+    if kind == "pdf":
+        yield from _iter_pdf_pages(source)
+    elif kind == "docx":
+        yield from _iter_docx_sections(source)
+    else:
+        if kind == "xlsx":
+            text = _parse_xlsx(source)
+        else:
+            if isinstance(source, str):
+                with open(source, "rb") as f:
+                    source = f.read()
+            text = source.decode("utf-8", errors="replace")
+        if text.strip():
+            yield _Segment(None, text)
+
+
+def _open_pdf(source: bytes | str):
     import fitz  # PyMuPDF
 
-    pages: list[str] = []
-    with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-        for page in doc:
-            text = page.get_text()
+    if isinstance(source, str):
+        return fitz.open(source)
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _pdf_page_count(source: bytes | str) -> int:
+    with _open_pdf(source) as doc:
+        return doc.page_count
+
+
+def _iter_pdf_pages(
+    source: bytes | str,
+    start: int = 0,
+    stop: int | None = None,
+) -> Iterator[_Segment]:
+    """
+    Yield the non-empty pages of a PDF one at a time using PyMuPDF (fitz).
+
+    Args:
+        source: The PDF bytes or a path to the file.
+        start: Index of the first page to read.
+        stop: Index after the last page to read (default: end).
+    """
+    with _open_pdf(source) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for index in range(start, stop):
+            text = doc[index].get_text()
             if text.strip():
-                pages.append(text)
-    return "\n\n".join(pages)
+                yield _Segment(index + 1, text)
 
 
-def _parse_docx(file_bytes: bytes) -> str:
-    """Extract text from a DOCX file using python-docx."""
-    import io
-    from docx import Document
+_DOCX_HEADING_STYLES = ("heading", "title", "überschrift", "titel")
 
-    doc = Document(io.BytesIO(file_bytes))
-    paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
-    return "\n\n".join(paragraphs)
 
+def _iter_docx_sections(source: bytes | str) -> Iterator[_Segment]:
+    """
+    Yield a DOCX file section by section using python-docx.
 
-def _parse_xlsx(file_bytes: bytes) -> str:
-    """Extract text from an XLSX file using openpyxl."""
+    A heading or a new page starts a new section. Page numbers come from
+    the page breaks Word recorded when it last laid out the file, or from
+    hard page breaks for files that were never laid out.
+    """
     import io
-    from openpyxl import load_workbook
-
-    wb = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    doc = Document(io.BytesIO(source) if isinstance(source, bytes) else source)
+    page = 1
+    section_page = 1
+    section: list[str] = []
+
+    for paragraph in doc.paragraphs:
+        rendered = paragraph.rendered_page_breaks
+        if rendered and rendered[0].preceding_paragraph_fragment is None:
+            # The paragraph starts on a new page
+            page += 1
+            rendered = rendered[1:]
+
+        style = (paragraph.style.name if paragraph.style is not None else "").lower()
+        is_heading = style.startswith(_DOCX_HEADING_STYLES)
+        if section and (is_heading or page != section_page):
+            yield _Segment(section_page, "\n\n".join(section))
+            section = []
+        if not section:
+            section_page = page
+
+        if paragraph.text.strip():
+            section.append(paragraph.text)
+
+        hard_breaks = sum(
+            1
+            for br in paragraph._p.iter(qn("w:br"))
+            if br.get(qn("w:type")) == "page"
+        )
+        page += max(len(rendered), hard_breaks)
+
+    if section:
+        yield _Segment(section_page, "\n\n".join(section))
+
+
+def _parse_xlsx(source: bytes | str) -> str:
+    """Extract text from an XLSX file using openpyxl (used for previews)."""
+    wb = _open_workbook(source)
     parts: list[str] = []
 
     for sheet_name in wb.sheetnames:
         ws = wb[sheet_name]
         parts.append(f"--- Sheet: {sheet_name} ---")
         for row in ws.iter_rows(values_only=True):
-            cells = [str(c) if c is not None else "" for c in row]
-            line = " | ".join(cells).strip()
-            if line and line != "|":
+            line = _row_line(row)
+            if line:
                 parts.append(line)
 
     wb.close()
@@ -112,160 +222,510 @@ def _parse_xlsx(file_bytes: bytes) -> str:
 # Chunking
 # ---------------------------------------------------------------------------
 
+class _Paragraph(NamedTuple):
+    text: str
+    page: int | None
+    start: int  # offset in the document text
+
+
+class _Chunk(NamedTuple):
+    """A chunk's text, the pages it spans and its offsets in the document text."""
+
+    text: str
+    page_start: int | None
+    page_end: int | None
+    char_start: int
+    char_end: int
+
+
 def _chunk_text(
     text: str,
     chunk_size: int = 800,
     overlap: int = 200,
+    unit: str = "chars",
 ) -> list[str]:
     """
     Split text into overlapping chunks, splitting on paragraph boundaries.
 
-    The algorithm first splits text into paragraphs (double newlines), then
-    greedily groups paragraphs into chunks that stay within ``chunk_size``
-    characters. If a single paragraph exceeds ``chunk_size``, it is split
-    on sentence boundaries or, as a last resort, by character count.
-
-    Consecutive chunks share approximately ``overlap`` characters to
-    preserve context at boundaries.
+    The text is split into paragraphs (double newlines), which are
+    greedily grouped into chunks of at most ``chunk_size``. Paragraphs
+    longer than that are first cut into pieces at sentence boundaries,
+    else at whitespace, else hard. Consecutive chunks share up to
+    ``overlap`` of trailing paragraphs/pieces to preserve context at
+    boundaries. See ``_iter_chunks``.
 
     Args:
         text: The full text to chunk.
-        chunk_size: Target maximum characters per chunk.
-        overlap: Approximate character overlap between consecutive chunks.
+        chunk_size: Target maximum size per chunk.
+        overlap: Maximum overlap between consecutive chunks.
+        unit: ``"chars"`` or ``"tokens"`` (embedding model tokens).
 
     Returns:
         A list of non-empty text chunks.
     """
     if not text.strip():
         return []
+    paragraphs = _split_paragraphs(text, chunk_size)
+    return [chunk.text for chunk in _iter_chunks(paragraphs, chunk_size, overlap, unit)]
+
+
+def _stripped_parts(text: str, sep: str) -> list[tuple[int, str]]:
+    """Non-empty stripped parts of ``text`` split on ``sep``, with their offsets."""
+    parts = []
+    pos = 0
+    for part in text.split(sep):
+        stripped = part.strip()
+        if stripped:
+            parts.append((pos + len(part) - len(part.lstrip()), stripped))
+        pos += len(part) + len(sep)
+    return parts
 
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
+
+def _split_paragraphs(
+    text: str,
+    chunk_size: int,
+    page: int | None = None,
+    base: int = 0,
+) -> list[_Paragraph]:
+    parts = _stripped_parts(text, "\n\n")
 
     # If there are no paragraph breaks, fall back to single newline splits
-    if len(paragraphs) <= 1 and len(text) > chunk_size:
-        paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    if len(parts) <= 1 and len(text) > chunk_size:
+        parts = _stripped_parts(text, "\n")
+    return [_Paragraph(para, page, base + offset) for offset, para in parts]
 
-    chunks: list[str] = []
-    current_chunk = ""
 
-    for para in paragraphs:
-        # If adding this paragraph would exceed chunk_size, flush current chunk
-        if current_chunk and len(current_chunk) + len(para) + 2 > chunk_size:
-            chunks.append(current_chunk.strip())
-            # Start new chunk with overlap from the end of the previous chunk
-            if overlap > 0 and len(current_chunk) > overlap:
-                current_chunk = current_chunk[-overlap:] + "\n\n" + para
+def _stream_paragraphs(segments: Iterable[_Segment], chunk_size: int) -> Iterator[_Paragraph]:
+    """
+    Paragraphs of text arriving in segments, split exactly as
+    ``_chunk_text`` splits the segments joined with blank lines, with
+    their page and offset in that joined text.
+    """
+    segments = iter(segments)
+    first = next(segments, None)
+    if first is None:
+        return
+    second = next(segments, None)
+    if second is None:
+        # Single segment: the newline fallback may apply
+        yield from _split_paragraphs(first.text, chunk_size, first.page)
+        return
+    base = 0
+    for segment in itertools.chain((first, second), segments):
+        for offset, para in _stripped_parts(segment.text, "\n\n"):
+            yield _Paragraph(para, segment.page, base + offset)
+        base += len(segment.text) + 2
+
+
+class _Unit(NamedTuple):
+    """A paragraph, or a piece of a long one, as a range of the document text."""
+
+    text: str
+    page: int | None
+    start: int
+    size: int  # in the chunker's unit
+    sep: str  # joiner to the previous unit: "\n\n", or "" inside a paragraph
+
+
+# Conservative characters per token when cutting long paragraphs by tokens
+_CHARS_PER_TOKEN = 3
+
+_SENTENCE_ENDS = (". ", "! ", "? ", ".\n", ":\n")
+
+
+def _iter_units(
+    para: _Paragraph,
+    piece_size: int,
+    measure: Callable[[str], int],
+    chars_per_unit: int,
+) -> Iterator[_Unit]:
+    """
+    Yield a paragraph as one unit, or as contiguous pieces of at most
+    about ``piece_size`` if it is longer than that.
+
+    Each cut is searched backwards over at most half a window, so the
+    paragraph is scanned a bounded number of times.
+    """
+    text = para.text
+    size = measure(text)
+    if size <= piece_size:
+        yield _Unit(text, para.page, para.start, size, "\n\n")
+        return
+
+    window = max(2, piece_size * chars_per_unit)
+    pos = 0
+    sep = "\n\n"
+    while pos < len(text):
+        end = pos + window
+        if end < len(text):
+            floor = pos + window // 2
+            cut = max(text.rfind(mark, floor, end) for mark in _SENTENCE_ENDS)
+            if cut != -1:
+                cut += 2  # Keep the punctuation and the space
             else:
-                current_chunk = para
+                cut = max(text.rfind(" ", floor, end), text.rfind("\n", floor, end))
+                cut = end if cut == -1 else cut + 1
         else:
-            if current_chunk:
-                current_chunk += "\n\n" + para
-            else:
-                current_chunk = para
+            cut = len(text)
+        piece = text[pos:cut]
+        yield _Unit(piece, para.page, para.start + pos, measure(piece), sep)
+        sep = ""
+        pos = cut
 
-        # Handle single paragraphs that are larger than chunk_size
-        while len(current_chunk) > chunk_size * 1.5:
-            split_point = current_chunk.rfind(". ", 0, chunk_size)
-            if split_point == -1:
-                split_point = chunk_size
-            else:
-                split_point += 1  # Include the period
 
-            chunks.append(current_chunk[:split_point].strip())
-            remaining = current_chunk[split_point:].strip()
-            if overlap > 0 and len(current_chunk[:split_point]) > overlap:
-                current_chunk = current_chunk[split_point - overlap :].strip()
-            else:
-                current_chunk = remaining
+def _iter_chunks(
+    paragraphs: Iterable[_Paragraph],
+    chunk_size: int = 800,
+    overlap: int = 200,
+    unit: str = "chars",
+) -> Iterator[_Chunk]:
+    """
+    Group paragraphs into overlapping chunks in a single pass.
+
+    The chunk under construction is a window of units (paragraphs or
+    pieces of long paragraphs) with a running size. When the next unit
+    does not fit, the window is emitted and units are dropped from its
+    front until what is left fits into ``overlap``; every unit enters and
+    leaves the window once, so the work is linear in the text length.
+    Chunks are described by their offsets in the document text; their
+    text is only materialized when emitted.
+
+    Args:
+        paragraphs: Paragraphs with page and document offset.
+        chunk_size: Target maximum size per chunk.
+        overlap: Maximum overlap between consecutive chunks.
+        unit: ``"chars"`` or ``"tokens"`` (embedding model tokens).
+    """
+    if unit == "tokens":
+        measure, joiner_size, chars_per_unit = count_tokens, 1, _CHARS_PER_TOKEN
+    elif unit == "chars":
+        measure, joiner_size, chars_per_unit = len, 2, 1
+    else:
+        raise ValueError(f"Unknown chunk unit: {unit}")
+
+    piece_size = max(1, overlap, chunk_size // 4)
+    window: deque[_Unit] = deque()
+    size = 0
+
+    def cost(u: _Unit, first: bool) -> int:
+        return u.size if first or not u.sep else u.size + joiner_size
+
+    def drop_front() -> None:
+        nonlocal size
+        dropped = window.popleft()
+        size -= dropped.size
+        if window:
+            # The new first unit no longer pays for its joiner
+            size -= cost(window[0], False) - cost(window[0], True)
+
+    for para in paragraphs:
+        for u in _iter_units(para, piece_size, measure, chars_per_unit):
+            if window and size + cost(u, False) > chunk_size:
+                chunk = _make_chunk(window)
+                if chunk is not None:
+                    yield chunk
+                while window and (
+                    size > overlap or size + cost(u, False) > chunk_size
+                ):
+                    drop_front()
+            size += cost(u, not window)
+            window.append(u)
+
+    if window:
+        chunk = _make_chunk(window)
+        if chunk is not None:
+            yield chunk
+
+
+def _make_chunk(window: Iterable[_Unit]) -> _Chunk | None:
+    units = list(window)
+    raw = units[0].text + "".join(u.sep + u.text for u in units[1:])
+    text = raw.strip()
+    if not text:
+        return None
+    char_start = units[0].start + len(raw) - len(raw.lstrip())
+    last = units[-1]
+    char_end = last.start + len(last.text.rstrip())
+    pages = [u.page for u in units if u.page is not None]
+    return _Chunk(
+        text,
+        min(pages) if pages else None,
+        max(pages) if pages else None,
+        char_start,
+        char_end,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Spreadsheets
+# ---------------------------------------------------------------------------
 
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+class _TableChunk(NamedTuple):
+    """A group of consecutive rows of one sheet, with the sheet's header."""
 
-    return chunks
+    text: str
+    sheet: str
+    row_start: int
+    row_end: int
+
+
+def _open_workbook(source: bytes | str):
+    import io
+    from openpyxl import load_workbook
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    # read_only streams rows from the sheet XML instead of building cells
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _row_line(row: tuple) -> str:
+    cells = [str(c).strip() if c is not None else "" for c in row]
+    while cells and not cells[-1]:
+        cells.pop()
+    return " | ".join(cells)
+
+
+def _xlsx_sheets(source: bytes | str) -> list[str]:
+    """Names of a workbook's sheets, in order."""
+    wb = _open_workbook(source)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _iter_xlsx_chunks(
+    source: bytes | str,
+    sheet: str,
+    max_rows: int = 50,
+    chunk_size: int = 800,
+    unit: str = "chars",
+) -> Iterator[_TableChunk]:
+    """
+    Stream the rows of one sheet as row-group chunks, in a single pass.
+
+    The first non-empty row of the sheet is taken as its header. Every
+    chunk repeats the sheet name and the header and holds at most
+    ``max_rows`` data rows and about ``chunk_size`` chars/tokens, so rows
+    of different sheets are never mixed and every chunk is readable on
+    its own. A sheet with nothing but a header still yields one chunk, so
+    its column names are searchable. Only one chunk is held in memory at
+    a time.
+    """
+    measure = count_tokens if unit == "tokens" else len
+    wb = _open_workbook(source)
+    try:
+        preamble = ""
+        preamble_size = 0
+        lines: list[str] = []
+        size = 0
+        row_start = row_end = 0
+
+        def flush() -> _TableChunk:
+            return _TableChunk(
+                preamble + "\n" + "\n".join(lines), sheet, row_start, row_end
+            )
+
+        for number, row in enumerate(wb[sheet].iter_rows(values_only=True), start=1):
+            line = _row_line(row)
+            if not line:
+                continue
+            if not preamble:
+                preamble = f"--- Sheet: {sheet} ---\n{line}"
+                preamble_size = size = measure(preamble)
+                row_start = row_end = number
+                continue
+            line_size = measure(line) + 1
+            if lines and (len(lines) >= max_rows or size + line_size > chunk_size):
+                yield flush()
+                lines, size = [], preamble_size
+            if not lines:
+                row_start = number
+            lines.append(line)
+            size += line_size
+            row_end = number
+        if lines:
+            yield flush()
+        elif preamble:
+            yield _TableChunk(preamble, sheet, row_start, row_end)
+    finally:
+        wb.close()
+
+
+def _iter_workbook_chunks(source: bytes | str) -> Iterator[_TableChunk]:
+    """Row-group chunks of every sheet of a workbook, in order."""
+    settings = get_settings()
+    for sheet in _xlsx_sheets(source):
+        yield from _iter_xlsx_chunks(
+            source,
+            sheet,
+            settings.xlsx_chunk_rows,
+            settings.chunk_size,
+            settings.chunk_unit,
+        )
 
 
 # ---------------------------------------------------------------------------
 # Main pipeline
 # ---------------------------------------------------------------------------
 
-def process_document(
+def _iter_document_chunks(
     filename: str,
-    file_bytes: bytes,
+    source: bytes | str,
     content_type: str,
+) -> Iterator[tuple[str, dict]]:
+    """Yield ``(text, location metadata)`` for each chunk of a file."""
+    if _file_kind(filename, content_type) == "xlsx":
+        for table in parse_pool.iter_table_chunks(source):
+            yield table.text, {
+                "page": None,
+                "sheet": table.sheet,
+                "row_start": table.row_start,
+                "row_end": table.row_end,
+            }
+        return
+
+    settings = get_settings()
+    paragraphs = _stream_paragraphs(
+        parse_pool.iter_segments(filename, source, content_type),
+        chunk_size=settings.chunk_size,
+    )
+    chunks = _iter_chunks(
+        paragraphs, settings.chunk_size, settings.chunk_overlap, settings.chunk_unit
+    )
+    for chunk in chunks:
+        yield chunk.text, {
+            "page": chunk.page_start,
+            "page_end": chunk.page_end,
+            "char_start": chunk.char_start,
+            "char_end": chunk.char_end,
+        }
+
+
+def _iter_chunk_batches(
+    filename: str,
+    source: bytes | str,
+    content_type: str,
+    batch_size: int,
+) -> Iterator[list[dict]]:
+    """Parse and chunk a file lazily, yielding chunk records in batches."""
+    batch: list[dict] = []
+    for idx, (text, metadata) in enumerate(_iter_document_chunks(filename, source, content_type)):
+        batch.append({
+            "text": text,
+            "metadata": {"document_name": filename, "chunk_index": idx, **metadata},
+        })
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_document(
+    document_id: str,
+    filename: str,
+    source: bytes | str,
+    content_type: str,
+    on_progress: Callable[[str, int], None] | None = None,
+    cancel: threading.Event | None = None,
 ) -> dict:
     """
-    Full document ingestion pipeline:
+    Parse, chunk, embed and store a document's chunks under ``document_id``.
 
-    1. Parse the file to extract plain text.
-    2. Chunk the text with overlap.
-    3. Embed all chunks via OpenAI.
-    4. Upsert chunks with embeddings into Qdrant.
-    5. Store the original file in MinIO.
+    Runs as a pipeline: the file is parsed and chunked lazily, and batches
+    of chunks pass through bounded queues to concurrent embedding and
+    Qdrant upsert stages, so the first batches are embedded while later
+    pages are still being parsed and at most a few batches of vectors are
+    held in memory.
+
+    The chunks are diffed against the points already stored for the
+    document, so this serves both first ingestion and new versions:
+    unchanged chunks are kept, only new or changed ones are embedded,
+    and the new chunk set is written before the old points are deleted,
+    so searches never see the document disappear. The original file is
+    not stored; callers handle MinIO.
 
     Args:
+        document_id: Id of the document.
         filename: Original filename.
-        file_bytes: Raw file bytes.
+        source: Raw file bytes, or the path of the file (parsed from
+            disk without loading it into memory).
         content_type: MIME type of the file.
+        on_progress: Optional callback ``(stage, percent)`` invoked as
+            the pipeline advances.
+        cancel: Optional event that stops the pipeline; once it is set no
+            further chunks are written and stale points are not deleted.
 
     Returns:
-        A dict with document_id, filename, and chunks_count.
-    """
-    document_id = str(uuid.uuid4())
-    logger.info(
-        "Processing document: %s (id=%s, type=%s, size=%d bytes)",
-        filename,
-        document_id,
-        content_type,
-        len(file_bytes),
-    )
-
-    # 1. Parse
-    text = _parse_file(filename, file_bytes, content_type)
-    if not text.strip():
-        logger.warning("No text extracted from %s", filename)
-        return {
-            "document_id": document_id,
-            "filename": filename,
-            "chunks_count": 0,
-        }
-
-    logger.info("Extracted %d characters from %s", len(text), filename)
-
-    # 2. Chunk
-    chunks_text = _chunk_text(text, chunk_size=800, overlap=200)
-    logger.info("Created %d chunks from %s", len(chunks_text), filename)
+        A dict with document_id, filename, chunks_count and the diff
+        counts (upserted, deleted, unchanged, embedded).
 
-    # 3. Embed
-    embeddings = vector_store.embed_texts(chunks_text)
+    Raises:
+        Cancelled: If ``cancel`` was set before the document was stored.
+    """
+    settings = get_settings()
 
-    # 4. Upsert to Qdrant
-    chunk_records = []
-    for idx, (chunk_text_item, embedding) in enumerate(
-        zip(chunks_text, embeddings)
-    ):
-        chunk_records.append({
-            "text": chunk_text_item,
-            "embedding": embedding,
-            "metadata": {
-                "document_name": filename,
-                "chunk_index": idx,
-                "page": idx + 1,  # Approximate page mapping
-            },
-        })
+    def progress(stage: str, percent: int) -> None:
+        if on_progress is not None:
+            on_progress(stage, percent)
 
+    progress("parsing", 5)
     vector_store.ensure_collection()
-    vector_store.upsert_chunks(document_id, chunk_records)
-
-    # 5. Store original in MinIO
-    object_name = f"{document_id}/{filename}"
-    file_storage.upload_file(object_name, file_bytes, content_type)
+    sync = vector_store.DocumentSync(document_id)
+
+    counts = {"produced": 0, "written": 0}
+    parsed = threading.Event()
+    counts_lock = threading.Lock()
+
+    def batches() -> Iterator[list[dict]]:
+        for batch in _iter_chunk_batches(
+            filename, source, content_type, settings.ingest_batch_chunks
+        ):
+            with counts_lock:
+                counts["produced"] += len(batch)
+            yield batch
+        parsed.set()
+
+    def embed(batch: list[dict]) -> tuple[int, list[dict]]:
+        return len(batch), sync.embed(batch)
+
+    def upsert(item: tuple[int, list[dict]]) -> None:
+        size, changed = item
+        sync.upsert(changed)
+        with counts_lock:
+            counts["written"] += size
+            percent = 10 + 80 * counts["written"] // max(counts["produced"], 1)
+            if not parsed.is_set():
+                # The total is still growing
+                percent = min(percent, 50)
+        progress("embedding", percent)
+
+    run_pipeline(
+        batches(),
+        [
+            Stage("embed", embed, workers=max(1, settings.embed_max_concurrency)),
+            Stage("upsert", upsert, workers=2),
+        ],
+        maxsize=settings.ingest_queue_batches,
+        cancel=cancel,
+    )
+    result = sync.finish()
 
+    if not result["chunks_count"]:
+        logger.warning("No text extracted from %s", filename)
     logger.info(
-        "Document processing complete: %s (%d chunks)", filename, len(chunks_text)
+        "Document ingested: %s (%d chunks, %d embedded, %d deleted)",
+        filename, result["chunks_count"], result["embedded"], result["deleted"],
     )
 
     return {
         "document_id": document_id,
         "filename": filename,
-        "chunks_count": len(chunks_text),
+        "chunks_count": result["chunks_count"],
+        "upserted": result["upserted"],
+        "deleted": result["deleted"],
+        "unchanged": result["unchanged"],
+        "embedded": result["embedded"],
     }
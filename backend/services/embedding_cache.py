@@ -0,0 +1,214 @@
+"""
+Persistent, content-addressed cache for embedding vectors.
+
+Vectors are keyed by SHA-256 of (model, text) and stored as compact
+float16 (or float32) blobs in a local SQLite file, so re-uploads,
+re-indexing and repeated questions do not pay for embeddings twice.
+Least recently used entries are evicted once the file exceeds its cap.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import get_settings, resolve_data_path
+
+logger = logging.getLogger(__name__)
+
+# SQLite's default bound-parameter limit is 999 on older builds
+_QUERY_BATCH = 500
+
+# Fraction of entries dropped per eviction round
+_EVICT_FRACTION = 0.1
+
+
+class EmbeddingCache:
+    """LRU-evicting on-disk embedding cache (safe across threads and processes)."""
+
+    def __init__(self, path: Path, max_bytes: int, dtype: str = "float16") -> None:
+        self._path = Path(path)
+        self._max_bytes = max_bytes
+        self._dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            self._path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " dtype TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: list[str]) -> dict[str, list[float]]:
+        """
+        Look up cached vectors and mark them as recently used.
+
+        A failing cache file (locked, full, corrupt) turns the lookup into
+        a miss instead of failing the caller.
+
+        Returns:
+            A dict mapping each cached text to its vector.
+        """
+        keys = {self.key(model, text): text for text in set(texts)}
+        found: dict[str, list[float]] = {}
+        now = time.time()
+
+        with self._lock:
+            key_list = list(keys)
+            try:
+                for start in range(0, len(key_list), _QUERY_BATCH):
+                    batch = key_list[start:start + _QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                    for key, dtype, blob in rows:
+                        found[keys[key]] = np.frombuffer(blob, dtype=dtype).astype(np.float32).tolist()
+                    if rows:
+                        hit_keys = [row[0] for row in rows]
+                        self._conn.execute(
+                            f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                            [now, *hit_keys],
+                        )
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("Embedding cache lookup failed (%s), treating as miss", e)
+
+            hit_count = sum(1 for text in texts if text in found)
+            self.hits += hit_count
+            self.misses += len(texts) - hit_count
+        return found
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """
+        Store vectors for texts, then evict old entries if over the cap.
+
+        A failing cache file skips the write; the vectors are just not cached.
+        """
+        now = time.time()
+        rows = [
+            (
+                self.key(model, text),
+                self._dtype.str,
+                np.asarray(vector, dtype=self._dtype).tobytes(),
+                now,
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, dtype, vector, last_used) "
+                        "VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    raise
+                self._evict_if_needed()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning("Embedding cache write failed (%s), not caching", e)
+
+    def _used_bytes(self) -> int:
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict_if_needed(self) -> None:
+        while self._used_bytes() > self._max_bytes:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if not count:
+                return
+            n = max(1, int(count * _EVICT_FRACTION))
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (n,),
+            )
+            self.evictions += n
+            logger.debug("Evicted %d embeddings from cache", n)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            used = self._used_bytes()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+_cache: EmbeddingCache | None = None
+_cache_disabled = False
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> EmbeddingCache | None:
+    """Return the process-wide cache, or None if disabled/unavailable."""
+    global _cache, _cache_disabled
+    if _cache is not None or _cache_disabled:
+        return _cache
+
+    with _cache_lock:
+        if _cache is not None or _cache_disabled:
+            return _cache
+        settings = get_settings()
+        if not settings.embedding_cache_path:
+            _cache_disabled = True
+            return None
+        try:
+            _cache = EmbeddingCache(
+                resolve_data_path(settings.embedding_cache_path),
+                max_bytes=settings.embedding_cache_max_mb * 1024 * 1024,
+                dtype=settings.embedding_cache_dtype,
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Embedding cache unavailable (%s), continuing without", e)
+            _cache_disabled = True
+        return _cache
+
+
+def stats() -> dict:
+    """Hit/miss counters and size of the embedding cache."""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    return cache.stats()
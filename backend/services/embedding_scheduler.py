@@ -0,0 +1,272 @@
+"""
+Token-aware, concurrent scheduling of embedding requests.
+
+Large inputs are split into batches bounded by an estimated token budget
+and an input count, sent concurrently up to an in-flight limit shared by
+the whole process, and reassembled in input order. The in-flight limit
+adapts to the provider: a 429 halves it (after backing off with the
+gateway's policy), every successful batch raises it again by one.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable
+
+from openai import RateLimitError
+
+from config import get_settings
+from services.llm_gateway import RETRYABLE_ERRORS, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # pragma: no cover - depends on optional package/network
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or, without tiktoken, conservatively estimate) tokens of ``text``.
+
+    The fallback assumes ~3 characters per token, which overestimates
+    for English and roughly matches German technical text.
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, math.ceil(len(text) / 3))
+
+
+def plan_batches(texts: list[str], max_tokens: int, max_inputs: int) -> list[tuple[int, int]]:
+    """
+    Split ``texts`` into contiguous batches.
+
+    Each batch stays within ``max_tokens`` estimated tokens and
+    ``max_inputs`` inputs; a single text larger than the token budget
+    forms a batch of its own.
+
+    Returns:
+        A list of ``(start, end)`` slices into ``texts``.
+    """
+    batches: list[tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        n = count_tokens(text)
+        if i > start and (tokens + n > max_tokens or i - start >= max_inputs):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that shrinks on rate limiting and recovers on success.
+
+    Threads (``slot``) and coroutines on any event loop (``aslot``) draw
+    from the same in-flight count, so one limit throttles every caller.
+    """
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self._active = 0
+        self._cond = threading.Condition()
+        # Coroutines waiting for a slot: (their loop, future to resolve)
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def _wake(self) -> None:
+        """Wake every waiter to retry; called with ``_cond`` held."""
+        self._cond.notify_all()
+        waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(
+                lambda w=waiter: w.done() or w.set_result(None)
+            )
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._wake()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._active < self.limit:
+                    self._active += 1
+                    break
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+        try:
+            yield
+        finally:
+            self._release()
+
+    def throttle(self) -> None:
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+
+    def recover(self) -> None:
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit += 1
+                self._wake()
+
+
+_limiter: AdaptiveLimiter | None = None
+_executor: ThreadPoolExecutor | None = None
+_init_lock = threading.Lock()
+
+
+def _shared() -> tuple[AdaptiveLimiter, ThreadPoolExecutor]:
+    global _limiter, _executor
+    if _limiter is None or _executor is None:
+        with _init_lock:
+            limit = get_settings().embed_max_concurrency
+            if _limiter is None:
+                _limiter = AdaptiveLimiter(limit)
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, limit), thread_name_prefix="embed"
+                )
+    return _limiter, _executor
+
+
+def _backoff_delay(error: Exception, attempt: int, limiter: AdaptiveLimiter) -> float:
+    if isinstance(error, RateLimitError):
+        limiter.throttle()
+    return backoff_delay(error, attempt)
+
+
+def _run_batch(
+    embed: Callable[[list[str]], list[list[float]]],
+    batch: list[str],
+    limiter: AdaptiveLimiter,
+    max_retries: int,
+) -> list[list[float]]:
+    attempt = 0
+    while True:
+        try:
+            with limiter.slot():
+                vectors = embed(batch)
+            limiter.recover()
+            return vectors
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            delay = _backoff_delay(e, attempt, limiter)
+            logger.warning(
+                "Embedding batch of %d failed (%s), retry %d/%d in %.1fs",
+                len(batch), type(e).__name__, attempt, max_retries, delay,
+            )
+            time.sleep(delay)
+
+
+def embed_batched(
+    texts: list[str],
+    embed: Callable[[list[str]], list[list[float]]],
+) -> list[list[float]]:
+    """
+    Embed ``texts`` in token-bounded batches, concurrently.
+
+    Args:
+        texts: The texts to embed.
+        embed: Callable embedding one batch (one API request) and
+            returning its vectors in order.
+
+    Returns:
+        One vector per input text, in input order.
+    """
+    if not texts:
+        return []
+
+    settings = get_settings()
+    limiter, executor = _shared()
+    batches = plan_batches(
+        texts, settings.embed_batch_max_tokens, settings.embed_batch_max_inputs
+    )
+
+    if len(batches) == 1:
+        return _run_batch(embed, texts, limiter, settings.embed_max_retries)
+
+    logger.info("Embedding %d texts in %d batches", len(texts), len(batches))
+    futures = [
+        executor.submit(
+            _run_batch, embed, texts[start:end], limiter, settings.embed_max_retries
+        )
+        for start, end in batches
+    ]
+    vectors: list[list[float]] = []
+    for future in futures:
+        vectors.extend(future.result())
+    return vectors
+
+
+async def aembed_batched(
+    texts: list[str],
+    embed: Callable[[list[str]], Awaitable[list[list[float]]]],
+) -> list[list[float]]:
+    """
+    Async counterpart of ``embed_batched`` for use on the event loop.
+
+    Batches are planned the same way and sent concurrently within the
+    shared limiter's current limit (together with every other caller in
+    the process); rate-limited batches back off with ``asyncio.sleep``
+    and throttle it.
+    """
+    if not texts:
+        return []
+
+    settings = get_settings()
+    limiter, _ = _shared()
+    batches = plan_batches(
+        texts, settings.embed_batch_max_tokens, settings.embed_batch_max_inputs
+    )
+
+    async def run(batch: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                async with limiter.aslot():
+                    vectors = await embed(batch)
+                limiter.recover()
+                return vectors
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > settings.embed_max_retries:
+                    raise
+                delay = _backoff_delay(e, attempt, limiter)
+                logger.warning(
+                    "Embedding batch of %d failed (%s), retry %d/%d in %.1fs",
+                    len(batch), type(e).__name__, attempt,
+                    settings.embed_max_retries, delay,
+                )
+                await asyncio.sleep(delay)
+
+    results = await asyncio.gather(*(run(texts[start:end]) for start, end in batches))
+    return [vector for batch in results for vector in batch]
@@ -3,11 +3,18 @@ MinIO file storage service.
 
 Provides upload, download, and delete operations for document files.
 Auto-creates the configured bucket on first use.
+
+Uploads and downloads of originals are streamed between MinIO and temp
+files, so large documents are never held in memory as a whole.
 """
 
-import io
+import hashlib
 import logging
+import os
+import tempfile
+from contextlib import contextmanager
 from functools import lru_cache
+from typing import BinaryIO, Iterator
 from minio import Minio
 from minio.error import S3Error
 from config import get_settings
@@ -49,57 +56,97 @@ def ensure_bucket() -> None:
         raise
 
 
-def upload_file(filename: str, data: bytes, content_type: str) -> str:
+class UploadTooLarge(ValueError):
+    """The uploaded stream exceeded the allowed size."""
+
+
+class _HashingReader:
+    """Read-through wrapper that counts and hashes what MinIO reads."""
+
+    def __init__(self, stream: BinaryIO, max_bytes: int | None) -> None:
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.size += len(data)
+        if self._max_bytes is not None and self.size > self._max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self._max_bytes} bytes")
+        self._hash.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def upload_stream(
+    filename: str,
+    stream: BinaryIO,
+    content_type: str,
+    max_bytes: int | None = None,
+) -> tuple[int, str]:
     """
-    Upload a file to MinIO.
+    Upload a file-like object to MinIO without knowing its length.
+
+    The stream is sent as a multipart upload in parts of
+    ``upload_part_size`` bytes and hashed on the way, so only one part is
+    in memory at a time.
 
     Args:
         filename: The object name to store the file under.
-        data: Raw file bytes.
-        content_type: MIME type of the file (e.g. 'application/pdf').
+        stream: Binary file-like object positioned at the start.
+        content_type: MIME type of the file.
+        max_bytes: Abort the upload once more bytes than this were read.
 
     Returns:
-        The object name that was stored (same as filename).
+        ``(size in bytes, SHA-256 hex digest)`` of the uploaded data.
+
+    Raises:
+        UploadTooLarge: If the stream is longer than ``max_bytes``; the
+            multipart upload is aborted and no object is stored.
     """
     ensure_bucket()
     settings = get_settings()
     client = get_minio_client()
 
+    reader = _HashingReader(stream, max_bytes)
     client.put_object(
         bucket_name=settings.minio_bucket,
         object_name=filename,
-        data=io.BytesIO(data),
-        length=len(data),
+        data=reader,
+        length=-1,
         content_type=content_type,
+        part_size=settings.upload_part_size,
     )
-    logger.info("Uploaded file to MinIO: %s (%d bytes)", filename, len(data))
-    return filename
+    logger.info("Uploaded file to MinIO: %s (%d bytes)", filename, reader.size)
+    return reader.size, reader.hexdigest()
 
 
-def download_file(object_name: str) -> bytes:
+@contextmanager
+def download_to_temp(object_name: str, suffix: str = "") -> Iterator[str]:
     """
-    Download a file from MinIO.
+    Download a file from MinIO into a temp file, removed on exit.
 
     Args:
         object_name: The object name in the bucket.
+        suffix: File name suffix of the temp file (parsers that go by the
+            extension need it).
 
-    Returns:
-        Raw file bytes.
-
-    Raises:
-        S3Error: If the object does not exist or cannot be retrieved.
+    Yields:
+        The path of the downloaded file.
     """
     settings = get_settings()
     client = get_minio_client()
 
-    response = None
+    fd, path = tempfile.mkstemp(prefix="original-", suffix=suffix)
+    os.close(fd)
     try:
-        response = client.get_object(settings.minio_bucket, object_name)
-        return response.read()
+        client.fget_object(settings.minio_bucket, object_name, path)
+        yield path
     finally:
-        if response is not None:
-            response.close()
-            response.release_conn()
+        os.unlink(path)
 
 
 def delete_file(object_name: str) -> None:
@@ -114,3 +161,17 @@ def delete_file(object_name: str) -> None:
 
     client.remove_object(settings.minio_bucket, object_name)
     logger.info("Deleted file from MinIO: %s", object_name)
+
+
+def discard_file(object_name: str) -> None:
+    """
+    Delete a file that is no longer needed, logging instead of raising
+    on failure (a leftover object is harmless).
+
+    Args:
+        object_name: The object name to delete.
+    """
+    try:
+        delete_file(object_name)
+    except Exception as e:
+        logger.warning("Could not remove original %s: %s", object_name, e)
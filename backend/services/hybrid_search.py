@@ -6,105 +6,429 @@ Combines lexical precision with semantic understanding for
 higher-quality retrieval.
 """
 
+import asyncio
+import fcntl
 import logging
-import re
-from rank_bm25 import BM25Okapi
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable
+from config import get_settings
 from services import vector_store
+from services.lexical_index import LexicalIndex, read_snapshot_header, tokenize
 
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _snapshot_lock(path: Path):
+    """Exclusive cross-process lock guarding snapshot read-modify-write."""
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 class HybridSearcher:
     """
     Performs hybrid retrieval by running BM25 and semantic search
     in parallel, then fusing results via Reciprocal Rank Fusion.
+
+    The BM25 index is maintained by a single background builder: full
+    rebuilds and snapshot writes never run on the query path. Queries
+    keep using the current index until a rebuilt one is swapped in
+    atomically; they only wait for the builder if there is no index yet
+    or the index has been stale for longer than ``BM25_MAX_STALENESS``.
+
+    If ``snapshot_path`` is given, the BM25 index is persisted there
+    (stamped with a generation number and the collection name) and
+    memory-mapped on startup instead of being rebuilt from Qdrant.
+    Workers pick up newer generations written by other workers and
+    replay their own not-yet-persisted changes on top. Uploads and
+    deletions are applied in memory at once but written to the snapshot
+    in batches (``BM25_PERSIST_INTERVAL``), since each write freezes and
+    saves the whole index.
+
+    The index also records how far it has been synced with the
+    ``documents`` table (``synced``: the last position applied, see
+    ``rag_service.sync_index``). ``watermark`` returns the current end of
+    that table; it is taken before a full build so documents finished
+    during the build are synced afterwards.
     """
 
-    def __init__(self) -> None:
-        self._corpus: list[dict] = []
-        self._tokenized_corpus: list[list[str]] = []
-        self._bm25: BM25Okapi | None = None
-        self._dirty: bool = True
+    def __init__(
+        self,
+        snapshot_path: Path | None = None,
+        collection: str = "",
+        watermark: Callable[[], list | None] | None = None,
+    ) -> None:
+        self._index: LexicalIndex | None = None
+        self._dirty: bool = False
+        self._stale_since: float | None = None
+        self._lock = threading.RLock()
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25-builder")
+        self._build_future: Future | None = None
+        # Pending snapshot write: changes are persisted in batches, at most
+        # once per BM25_PERSIST_INTERVAL, not once per document
+        self._persist_timer: threading.Timer | None = None
+        self._snapshot_path = snapshot_path
+        self._collection = collection
+        self._generation = 0
+        self._snapshot_mtime: int | None = None
+        self._watermark = watermark
+        self._synced: list | None = None
+        # Changes not yet contained in a persisted snapshot
+        self._pending: list[tuple[str, str, list[dict]]] = []
+        # Changes made while a full rebuild is running (replayed before swap)
+        self._during_build: list[tuple[str, str, list[dict]]] | None = None
 
     def _tokenize(self, text: str) -> list[str]:
         """Simple whitespace + punctuation tokenizer with lowercasing."""
-        text = text.lower()
-        tokens = re.findall(r"\w+", text)
-        return tokens
+        return tokenize(text)
+
+    # ── Background builder ─────────────────────────────────────────
 
     def _build_bm25_index(self) -> None:
         """
-        Load all chunks from Qdrant via scroll and build the BM25 index.
+        Stream all chunks from Qdrant into a new index and swap it in.
 
-        Sets the dirty flag to False after a successful rebuild.
+        Runs on the builder thread. The current index keeps serving
+        queries meanwhile; uploads and deletions made during the build
+        are replayed onto the new index before the atomic swap.
         """
-        logger.info("Building BM25 index from Qdrant corpus...")
-        self._corpus = vector_store.scroll_all()
+        with self._lock:
+            self._dirty = False
+            self._during_build = []
 
-        if not self._corpus:
+        watermark = None
+        if self._watermark is not None:
+            try:
+                watermark = self._watermark()
+            except Exception as e:
+                logger.warning("Could not read the BM25 sync watermark: %s", e)
+
+        logger.info("Building BM25 index from Qdrant corpus...")
+        try:
+            index = LexicalIndex()
+            index.add_many(vector_store.iter_payloads())
+            index.freeze()
+        except Exception:
+            with self._lock:
+                self._during_build = None
+                self._dirty = True
+            raise
+
+        with self._lock:
+            for op in self._during_build:
+                self._apply(index, op)
+            self._pending = self._during_build
+            self._during_build = None
+            self._index = index
+            self._synced = watermark
+            if not self._dirty:
+                self._stale_since = None
+
+        if not len(index):
             logger.warning("No documents found in Qdrant -- BM25 index is empty")
-            self._tokenized_corpus = []
-            self._bm25 = None
-            self._dirty = False
+        else:
+            logger.info(
+                "BM25 index built with %d documents, %d terms (%.1f MiB)",
+                len(index),
+                index.vocabulary_size,
+                index.memory_usage()["total"] / (1024 * 1024),
+            )
+        self._persist(rebase=False)
+
+    def _request_rebuild(self) -> Future:
+        """Schedule a full rebuild unless one is already queued or running."""
+        with self._lock:
+            if self._build_future is None or self._build_future.done():
+                self._build_future = self._builder.submit(self._build_bm25_index)
+            return self._build_future
+
+    def _request_persist(self) -> None:
+        """
+        Schedule a snapshot write ``bm25_persist_interval`` seconds from
+        now, coalesced with one already scheduled.
+        """
+        if self._snapshot_path is None:
+            self._pending = []
+            return
+        if self._persist_timer is None:
+            self._persist_timer = threading.Timer(
+                get_settings().bm25_persist_interval,
+                lambda: self._builder.submit(self._run_persist),
+            )
+            self._persist_timer.daemon = True
+            self._persist_timer.start()
+
+    def _run_persist(self) -> None:
+        with self._lock:
+            timer, self._persist_timer = self._persist_timer, None
+            if timer is None or not self._pending:
+                return
+        timer.cancel()
+        self._persist()
+
+    def flush(self) -> None:
+        """
+        Write changes still waiting for a snapshot write and block until
+        all queued rebuilds and snapshot writes are done.
+        """
+        self._builder.submit(self._run_persist)
+        self._builder.submit(lambda: None).result()
+
+    # ── Snapshot persistence ────────────────────────────────────────
+
+    def _snapshot_generation(self) -> int:
+        try:
+            return read_snapshot_header(self._snapshot_path)["generation"]
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _apply(index: LexicalIndex, op: tuple[str, str, list[dict]]) -> None:
+        kind, document_id, chunks = op
+        index.remove_document(document_id)
+        if kind == "add":
+            index.add_many(chunks)
+
+    def _load_snapshot(self) -> bool:
+        """Map the on-disk snapshot and replay pending changes onto it."""
+        try:
+            index, generation = LexicalIndex.load(self._snapshot_path, self._collection)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unusable BM25 snapshot %s: %s", self._snapshot_path, e)
+            return False
+
+        for op in self._pending:
+            self._apply(index, op)
+        self._index = index
+        self._generation = generation
+        # Our own pending changes were replayed on top, so the snapshot is
+        # synced at least as far as the later of the two positions
+        synced = read_snapshot_header(self._snapshot_path).get("synced")
+        if self._synced is None or (synced is not None and synced > self._synced):
+            self._synced = synced
+        self._snapshot_mtime = os.stat(self._snapshot_path).st_mtime_ns
+        logger.info(
+            "Loaded BM25 snapshot generation %d (%d documents)", generation, len(index)
+        )
+        return True
+
+    def _persist(self, rebase: bool = True) -> None:
+        """
+        Write the index as the next snapshot generation and re-map it.
+
+        Runs on the builder thread. Under the cross-process lock, a newer
+        generation written by another worker is loaded first (``rebase``)
+        so its changes are not lost. The snapshot is written from a clone,
+        so queries are not blocked while it is frozen and saved.
+        """
+        if self._snapshot_path is None or self._index is None:
+            return
+        try:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            with _snapshot_lock(self._snapshot_path):
+                with self._lock:
+                    disk_generation = self._snapshot_generation()
+                    if rebase and disk_generation > self._generation:
+                        self._load_snapshot()
+                    clone = self._index.clone()
+                    persisted = len(self._pending)
+                    synced = self._synced
+
+                generation = max(disk_generation, self._generation) + 1
+                clone.save(self._snapshot_path, generation, self._collection, synced)
+
+                with self._lock:
+                    del self._pending[:persisted]
+                    self._load_snapshot()
+        except OSError as e:
+            logger.warning("Could not write BM25 snapshot %s: %s", self._snapshot_path, e)
+
+    def _refresh_from_snapshot(self) -> None:
+        """Switch to a newer snapshot generation written by another worker."""
+        if self._snapshot_path is None:
             return
+        try:
+            mtime = os.stat(self._snapshot_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._snapshot_mtime:
+            return
+        self._snapshot_mtime = mtime
+        if self._snapshot_generation() > self._generation:
+            self._load_snapshot()
 
-        self._tokenized_corpus = [
-            self._tokenize(doc.get("text", "")) for doc in self._corpus
-        ]
-        self._bm25 = BM25Okapi(self._tokenized_corpus)
-        self._dirty = False
-        logger.info("BM25 index built with %d documents", len(self._corpus))
+    # ── Index maintenance ──────────────────────────────────────────
 
     def mark_dirty(self) -> None:
-        """Mark the BM25 index as stale so it is rebuilt on next search."""
-        self._dirty = True
+        """
+        Mark the BM25 index as stale and rebuild it in the background.
 
-    def _ensure_index(self) -> None:
-        """Rebuild the BM25 index if it is marked dirty or uninitialized."""
-        if self._dirty or self._bm25 is None:
-            self._build_bm25_index()
+        Queries keep using the current index until the rebuild is done.
+        """
+        with self._lock:
+            self._dirty = True
+            if self._stale_since is None:
+                self._stale_since = time.monotonic()
+        self._request_rebuild()
+
+    def _record(self, op: tuple[str, str, list[dict]]) -> None:
+        if self._during_build is not None:
+            self._during_build.append(op)
+        if self._index is None and self._snapshot_path is not None:
+            # Mapping the snapshot is cheap; changes are applied to it rather
+            # than buffered until a query happens to load it
+            self._load_snapshot()
+        if self._index is None:
+            # A build from Qdrant picks the change up by itself
+            return
+        self._pending.append(op)
+        self._apply(self._index, op)
+        self._request_persist()
 
-    def _bm25_search(self, query: str, limit: int) -> list[dict]:
+    def add_document(
+        self, document_id: str, chunks: list[dict], synced: list | None = None
+    ) -> None:
+        """
+        Add the chunks of a newly stored document to the BM25 index
+        (replacing its previous chunks), and advance ``synced`` if given.
+
+        If there is neither an index nor a snapshot yet the change is
+        dropped: the initial build scrolls Qdrant and picks the chunks up.
+        """
+        with self._lock:
+            self._record(
+                ("add", document_id, [{**chunk, "document_id": document_id} for chunk in chunks])
+            )
+            if synced is not None and self._index is not None:
+                self._synced = synced
+            if self._index is not None:
+                logger.debug(
+                    "Indexed %d chunks for document %s (BM25 size=%d)",
+                    len(chunks), document_id, len(self._index),
+                )
+
+    def remove_document(self, document_id: str) -> None:
+        """Drop all chunks of a document from the BM25 index."""
+        with self._lock:
+            self._record(("remove", document_id, []))
+            logger.debug("Removed document %s from BM25", document_id)
+
+    def sync_position(self) -> tuple[bool, list | None]:
         """
-        Run BM25 keyword search over the in-memory corpus.
+        Load the index if needed and report where syncing has to resume.
 
-        Returns results sorted by BM25 score (descending).
+        Returns:
+            ``(ready, synced)``; not ready while a full build is running
+            (the build sets the position itself).
         """
         self._ensure_index()
+        with self._lock:
+            building = self._build_future is not None and not self._build_future.done()
+            return self._index is not None and not building, self._synced
+
+    def _ensure_index(self) -> None:
+        """
+        Make sure a BM25 index is available for the current query.
+
+        Prefers the persisted snapshot; otherwise a build from Qdrant is
+        scheduled on the builder. The caller only waits for it if there
+        is no index at all or the staleness bound has been exceeded.
+        """
+        with self._lock:
+            if self._index is None:
+                if self._snapshot_path is not None:
+                    self._load_snapshot()
+            else:
+                self._refresh_from_snapshot()
+            needs_build = self._index is None or self._dirty
+            must_wait = self._index is None or (
+                self._stale_since is not None
+                and time.monotonic() - self._stale_since > get_settings().bm25_max_staleness
+            )
+
+        if needs_build:
+            future = self._request_rebuild()
+            if must_wait:
+                future.result()
+
+    def stats(self) -> dict:
+        """Size, age and memory report of the BM25 index (for worker sizing)."""
+        with self._lock:
+            rebuilding = self._build_future is not None and not self._build_future.done()
+            if self._index is None:
+                return {
+                    "built": False,
+                    "rebuilding": rebuilding,
+                    "chunks": 0,
+                    "terms": 0,
+                    "memory_bytes": {},
+                }
+            return {
+                "built": True,
+                "stale": self._dirty,
+                "rebuilding": rebuilding,
+                "generation": self._generation,
+                "age_seconds": round(time.time() - self._index.built_at, 3),
+                "stale_seconds": (
+                    round(time.monotonic() - self._stale_since, 3)
+                    if self._stale_since is not None else 0.0
+                ),
+                "chunks": len(self._index),
+                "terms": self._index.vocabulary_size,
+                "memory_bytes": self._index.memory_usage(),
+            }
 
-        if self._bm25 is None or not self._corpus:
-            return []
+    @staticmethod
+    def _fetch_texts(point_ids: list[str]) -> dict[str, str]:
+        """Load chunk texts for the final hits from Qdrant by point id."""
+        ids = [pid for pid in point_ids if pid]
+        if not ids:
+            return {}
+        return {p["id"]: p.get("text", "") for p in vector_store.retrieve(ids)}
+
+    def _bm25_search(self, query: str, limit: int) -> list[dict]:
+        """
+        Run BM25 keyword search over the in-memory index.
 
-        tokenized_query = self._tokenize(query)
-        scores = self._bm25.get_scores(tokenized_query)
+        The index holds no chunk text; it is fetched by point id for the
+        returned hits only. Returns results sorted by BM25 score (descending).
+        """
+        self._ensure_index()
+        with self._lock:
+            hits = self._index.search(query, limit)
 
-        scored = list(zip(self._corpus, scores))
-        scored.sort(key=lambda x: x[1], reverse=True)
+        texts = self._fetch_texts([hit["id"] for hit, _ in hits])
 
         results = []
-        for doc, score in scored[:limit]:
+        for hit, score in hits:
             results.append({
-                "text": doc.get("text", ""),
-                "document_id": doc.get("document_id", ""),
-                "document_name": doc.get("document_name", ""),
-                "page": doc.get("page"),
+                "id": hit["id"],
+                "text": texts.get(hit["id"], ""),
+                "document_id": hit["document_id"],
+                "document_name": hit["document_name"],
+                "page": hit["page"],
                 "score": float(score),
                 "source": "bm25",
             })
         return results
 
-    def _semantic_search(self, query: str, limit: int) -> list[dict]:
-        """
-        Run semantic similarity search via Qdrant.
-
-        Embeds the query with OpenAI and retrieves nearest neighbours.
-        """
-        query_embedding = vector_store.embed_texts([query])[0]
-        hits = vector_store.search(query_embedding, limit=limit)
-
+    @staticmethod
+    def _semantic_results(hits: list[dict]) -> list[dict]:
         results = []
         for hit in hits:
             results.append({
+                "id": hit.get("id"),
                 "text": hit.get("text", ""),
                 "document_id": hit.get("document_id", ""),
                 "document_name": hit.get("document_name", ""),
@@ -114,6 +438,17 @@ class HybridSearcher:
             })
         return results
 
+    async def _asemantic_search(self, query: str, limit: int) -> list[dict]:
+        """
+        Run semantic similarity search via Qdrant.
+
+        Embeds the query with OpenAI and retrieves nearest neighbours, both
+        through the async clients.
+        """
+        query_embedding = (await vector_store.aembed_texts([query]))[0]
+        hits = await vector_store.asearch(query_embedding, limit=limit)
+        return self._semantic_results(hits)
+
     @staticmethod
     def _reciprocal_rank_fusion(
         result_lists: list[list[dict]],
@@ -138,8 +473,9 @@ class HybridSearcher:
 
         for result_list in result_lists:
             for rank, doc in enumerate(result_list):
-                # Use text content as dedup key (chunks may not have stable IDs)
-                key = doc.get("text", "")[:200]
+                # Point ids are stable across both legs; text is only a
+                # fallback for results without one
+                key = doc.get("id") or doc.get("text", "")[:200]
                 rrf_score = 1.0 / (k + rank + 1)
                 fused_scores[key] = fused_scores.get(key, 0.0) + rrf_score
 
@@ -158,10 +494,38 @@ class HybridSearcher:
 
         return results
 
-    def search(self, query: str, limit: int = 5) -> list[dict]:
+    @staticmethod
+    async def _acollect_leg(
+        leg_call: Awaitable[list[dict]],
+        leg: str,
+        timeout: float,
+    ) -> tuple[list[dict], Exception | None]:
+        """
+        Await one retrieval leg until its timeout.
+
+        Returns:
+            ``(results, error)`` -- on timeout or failure the results are
+            empty and the error is returned instead of raised.
+        """
+        try:
+            return await asyncio.wait_for(leg_call, timeout=timeout), None
+        except asyncio.TimeoutError:
+            logger.warning("%s search timed out after %.1fs", leg, timeout)
+            return [], TimeoutError(f"{leg} search timed out after {timeout}s")
+        except Exception as e:
+            logger.warning("%s search failed: %s", leg, e)
+            return [], e
+
+    async def asearch(self, query: str, limit: int = 5) -> list[dict]:
         """
         Execute hybrid search: BM25 + semantic, fused with RRF.
 
+        Both legs run concurrently: the BM25 leg (CPU-bound) in a worker
+        thread, the semantic leg on the async OpenAI and Qdrant clients.
+        Each leg has its own timeout; if one leg fails or times out the
+        other leg's results are used alone, and only if both fail is the
+        error raised.
+
         Args:
             query: The search query string.
             limit: Maximum number of results to return.
@@ -170,11 +534,24 @@ class HybridSearcher:
             Fused and ranked results. Each dict contains: text,
             document_name, score, page, document_id, source.
         """
+        settings = get_settings()
         # Fetch more candidates from each source to improve fusion quality
         candidate_limit = limit * 3
 
-        bm25_results = self._bm25_search(query, limit=candidate_limit)
-        semantic_results = self._semantic_search(query, limit=candidate_limit)
+        (bm25_results, bm25_error), (semantic_results, semantic_error) = await asyncio.gather(
+            self._acollect_leg(
+                asyncio.to_thread(self._bm25_search, query, candidate_limit),
+                "BM25",
+                settings.bm25_search_timeout,
+            ),
+            self._acollect_leg(
+                self._asemantic_search(query, candidate_limit),
+                "Semantic",
+                settings.semantic_search_timeout,
+            ),
+        )
+        if bm25_error is not None and semantic_error is not None:
+            raise semantic_error
 
         fused = self._reciprocal_rank_fusion(
             [bm25_results, semantic_results], k=60
@@ -0,0 +1,85 @@
+"""
+Standalone ingestion worker.
+
+Runs ingestion workers outside the API servers so bulk loads can be
+spread over dedicated machines; every worker pulls from the shared
+PostgreSQL job queue, so throughput scales with the number of workers.
+
+Usage (from the backend directory):
+
+    python -m services.ingest_worker --concurrency 4
+
+Set ``INGEST_WORKERS=0`` on the API servers to leave all ingestion to
+these workers. Workers write Qdrant and the document rows only; the API
+servers add finished documents to their BM25 index themselves
+(``rag_service.sync_index``).
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+
+from config import get_settings
+from services import ingestion
+from services.db import _PgStore, get_db
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Streamworks-KI ingestion worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="jobs processed in parallel by this process (default: 1)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    if not isinstance(get_db(), _PgStore):
+        logger.warning(
+            "DATABASE_URL not set: the in-memory queue is not shared with the API, "
+            "this worker only sees jobs queued in its own process"
+        )
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [
+        ingestion.IngestWorker(f"{base_id}:{n}") for n in range(max(1, args.concurrency))
+    ]
+
+    def shutdown(signum, frame):
+        logger.info("Received signal %d, finishing current jobs", signum)
+        for worker in workers:
+            worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    threads = [
+        threading.Thread(target=worker.run, name=f"ingest-{n}")
+        for n, worker in enumerate(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(
+        "Ingestion worker %s running %d job slot(s), lease %ss",
+        base_id,
+        len(workers),
+        get_settings().ingest_lease_seconds,
+    )
+    # Wait with a timeout so the main thread stays responsive to signals
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(timeout=1.0)
+
+
+if __name__ == "__main__":
+    main()
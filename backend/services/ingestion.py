@@ -0,0 +1,340 @@
+"""
+Background ingestion jobs for uploaded documents.
+
+Uploads are accepted immediately: the original goes to MinIO, the
+document row is created with status ``queued`` and the document is
+pushed onto the durable job queue (``services.job_queue``). Workers
+claim jobs from the queue, run the ingestion pipeline and record stage
+and progress on the document row, so job state survives restarts and is
+visible to every API worker.
+
+Workers run as threads inside the API process (``ingest_workers``) and/or
+as standalone processes (``python -m services.ingest_worker``) on other
+machines; they all pull from the same queue.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from config import get_settings
+from services import document_processor, file_storage, job_queue, vector_store
+from services.db import get_db
+from services.pipeline import Cancelled
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+ACTIVE_STATES = (QUEUED, PROCESSING)
+TERMINAL_STATES = (READY, FAILED)
+
+# Set when a job is queued in this process, so idle local workers claim
+# it without waiting for their next poll
+_wake = threading.Event()
+
+_workers: list["IngestWorker"] = []
+_workers_lock = threading.Lock()
+
+
+def _update(document_id: str, **fields) -> bool:
+    """Write job fields to the document row; False if the row is gone."""
+    result = (
+        get_db()
+        .table("documents")
+        .update({**fields, "updated_at": "now()"})
+        .eq("id", document_id)
+        .execute()
+    )
+    return bool(result.data)
+
+
+def _load(document_id: str) -> dict | None:
+    result = get_db().table("documents").select("*").eq("id", document_id).execute()
+    return result.data[0] if result.data else None
+
+
+def _discard_pending(document_id: str) -> None:
+    """Drop a new version that failed for good; the indexed one stays current."""
+    doc = _load(document_id)
+    if doc and doc.get("pending_object_name"):
+        file_storage.discard_file(doc["pending_object_name"])
+        _update(document_id, pending_object_name=None)
+
+
+def enqueue(document_id: str) -> None:
+    """Queue ingestion of a document whose row and original already exist."""
+    job_queue.push(document_id)
+    _wake.set()
+
+
+class LeaseLost(RuntimeError):
+    """The job was reclaimed by another worker while this one ran it."""
+
+
+def run_job(document_id: str, worker_id: str, lost: threading.Event | None = None) -> None:
+    """
+    Ingest one document: download the original, run the pipeline and
+    mark it ready.
+
+    A re-uploaded version waits under ``pending_object_name`` and only
+    becomes the document's ``object_name`` once it has been ingested, so
+    a failed job never leaves the stored original out of step with the
+    index. The ready status is only written while ``worker_id`` still
+    holds the job's lease, and the pipeline stops once ``lost`` is set.
+
+    Raises:
+        LeaseLost: If another worker took the job over.
+        Any pipeline error; the caller decides whether the job is retried.
+    """
+    doc = _load(document_id)
+    if doc is None:
+        logger.info("Ingestion job %s skipped: document was deleted", document_id)
+        return
+
+    _update(document_id, status=PROCESSING, stage="download", progress=0, error=None)
+    # Parsers read the original from disk; it is never loaded as a whole
+    suffix = os.path.splitext(doc["filename"])[1]
+    object_name = doc.get("pending_object_name") or doc["object_name"]
+    with file_storage.download_to_temp(object_name, suffix) as path:
+        result = document_processor.ingest_document(
+            document_id,
+            doc["filename"],
+            path,
+            doc.get("mime_type", ""),
+            on_progress=lambda stage, percent: _update(
+                document_id, stage=stage, progress=percent
+            ),
+            cancel=lost,
+        )
+
+    fields = {
+        "status": READY,
+        "stage": None,
+        "progress": 100,
+        "chunks": result["chunks_count"],
+    }
+    if object_name != doc["object_name"]:
+        fields.update(object_name=object_name, pending_object_name=None)
+    # The API's BM25 index picks the document up once it is ready
+    # (rag_service.sync_index), wherever this job runs
+    if not job_queue.finish(document_id, worker_id, fields):
+        if _load(document_id) is not None:
+            raise LeaseLost(f"Lost lease on ingestion job {document_id}")
+        # Deleted while it was being processed: drop what we wrote
+        vector_store.delete_document(document_id)
+        return
+    if object_name != doc["object_name"] and doc["object_name"]:
+        file_storage.discard_file(doc["object_name"])
+    logger.info(
+        "Ingestion job %s finished (%d chunks)", document_id, result["chunks_count"]
+    )
+
+
+class _Lease:
+    """
+    Keeps a claimed job's lease alive from a background thread and sets
+    ``lost`` once another worker holds it.
+    """
+
+    def __init__(self, document_id: str, worker_id: str, lease_seconds: float) -> None:
+        self._document_id = document_id
+        self._worker_id = worker_id
+        self._lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self.lost = threading.Event()
+        self._thread = threading.Thread(
+            target=self._beat, name=f"lease-{document_id[:8]}", daemon=True
+        )
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self._lease_seconds / 3):
+            try:
+                if not job_queue.heartbeat(
+                    self._document_id, self._worker_id, self._lease_seconds
+                ):
+                    logger.warning("Lost lease on ingestion job %s", self._document_id)
+                    self.lost.set()
+                    return
+            except Exception as e:
+                logger.warning("Heartbeat for job %s failed: %s", self._document_id, e)
+
+    def __enter__(self) -> "_Lease":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def process_job(job: dict, worker_id: str) -> bool:
+    """
+    Run a job claimed from the queue and settle it.
+
+    Failures are recorded on the document row rather than raised, so one
+    bad file never takes a worker down: the document goes back to
+    ``queued`` while the job has attempts left, otherwise to ``failed``.
+
+    Returns:
+        True if the document was ingested.
+    """
+    settings = get_settings()
+    document_id = job["document_id"]
+    try:
+        with _Lease(document_id, worker_id, settings.ingest_lease_seconds) as lease:
+            run_job(document_id, worker_id, lease.lost)
+    except (LeaseLost, Cancelled):
+        # The worker that reclaimed the job owns its status now
+        logger.warning("Ingestion job %s abandoned: lease lost", document_id)
+        return False
+    except Exception as e:
+        logger.exception(
+            "Ingestion job %s failed (attempt %d)", document_id, job["attempts"]
+        )
+        error = str(e)[:1000]
+        retry = job_queue.fail(
+            document_id,
+            worker_id,
+            error,
+            settings.ingest_max_attempts,
+            settings.ingest_retry_delay,
+        )
+        _update(document_id, status=QUEUED if retry else FAILED, stage=None, error=error)
+        if not retry:
+            _discard_pending(document_id)
+        return False
+
+    return True
+
+
+def reap_dead_jobs() -> int:
+    """Mark documents whose worker died on the job's last attempt as failed."""
+    dead = job_queue.reap(get_settings().ingest_max_attempts)
+    for document_id in dead:
+        _update(
+            document_id,
+            status=FAILED,
+            stage=None,
+            error="Verarbeitung abgebrochen (Worker nicht mehr erreichbar)",
+        )
+        _discard_pending(document_id)
+    return len(dead)
+
+
+class IngestWorker:
+    """Claims jobs from the queue and processes them one at a time."""
+
+    def __init__(self, worker_id: str | None = None) -> None:
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def run_once(self) -> bool:
+        """
+        Process at most one job.
+
+        Returns:
+            True if a job was claimed.
+        """
+        reap_dead_jobs()
+        job = job_queue.claim(self.worker_id, get_settings().ingest_lease_seconds)
+        if job is None:
+            return False
+        process_job(job, self.worker_id)
+        return True
+
+    def run(self) -> None:
+        """Process jobs until ``stop`` is called."""
+        logger.info("Ingestion worker %s started", self.worker_id)
+        poll_interval = get_settings().ingest_poll_interval
+        while not self._stop.is_set():
+            _wake.clear()
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logger.warning("Ingestion worker %s: queue error: %s", self.worker_id, e)
+                claimed = False
+            if not claimed:
+                _wake.wait(poll_interval)
+        logger.info("Ingestion worker %s stopped", self.worker_id)
+
+    def stop(self) -> None:
+        self._stop.set()
+        _wake.set()
+
+
+def start_workers(count: int) -> None:
+    """Run ``count`` worker threads in this process."""
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    with _workers_lock:
+        for n in range(len(_workers), len(_workers) + count):
+            worker = IngestWorker(f"{base_id}:{n}")
+            threading.Thread(
+                target=worker.run, name=f"ingest-{n}", daemon=True
+            ).start()
+            _workers.append(worker)
+
+
+def stop_workers() -> None:
+    """Ask this process's worker threads to stop after their current job."""
+    with _workers_lock:
+        for worker in _workers:
+            worker.stop()
+        _workers.clear()
+
+
+def job_status(document_id: str) -> dict | None:
+    """Return the job state of a document, or None if it does not exist."""
+    doc = _load(document_id)
+    if doc is None:
+        return None
+    return {
+        "document_id": doc["id"],
+        "filename": doc["filename"],
+        "status": doc.get("status") or READY,
+        "stage": doc.get("stage"),
+        "progress": doc.get("progress", 100),
+        "error": doc.get("error"),
+        "chunks": doc.get("chunks", 0),
+    }
+
+
+def resume_pending() -> int:
+    """
+    Re-queue documents left queued or processing by a previous process.
+
+    Jobs still leased by a live worker are left alone.
+
+    Returns:
+        The number of documents re-queued.
+    """
+    rows = get_db().table("documents").select("id").in_("status", ACTIVE_STATES).execute()
+    document_ids = [doc["id"] for doc in rows.data or []]
+    if document_ids:
+        job_queue.push_many(document_ids)
+        _wake.set()
+        logger.info("Resumed %d pending ingestion jobs", len(document_ids))
+    return len(document_ids)
+
+
+def wait(document_id: str, timeout: float | None = None, poll: float = 0.05) -> None:
+    """
+    Block until the document's job has finished or failed, whichever
+    worker runs it.
+
+    Raises:
+        TimeoutError: If it is still pending after ``timeout`` seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = job_status(document_id)
+        if status is None or status["status"] in TERMINAL_STATES:
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"Ingestion of {document_id} still {status['status']}")
+        time.sleep(poll)
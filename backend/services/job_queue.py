@@ -0,0 +1,360 @@
+"""
+Durable queue of document ingestion jobs.
+
+With PostgreSQL, jobs live in the ``ingest_jobs`` table and are claimed
+with ``FOR UPDATE SKIP LOCKED``, so any number of workers on any number
+of machines can pull from the same queue without handing out a job
+twice. A claim is a lease: the worker extends it with heartbeats while
+it runs, and a job whose lease runs out (the worker crashed) becomes
+claimable again until it has used up its attempts.
+
+Without PostgreSQL the in-memory store stands in for the table, which is
+only correct within a single process.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+
+from services.db import _PgStore, _PgTable, get_db, pg_connection
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+FAILED = "failed"
+
+_TABLE = "ingest_jobs"
+
+
+class _PgQueue:
+    def push(self, document_ids: list[str]) -> None:
+        with pg_connection() as conn, conn.cursor() as cur:
+            # A job another worker is running keeps its lease and attempts
+            psycopg2.extras.execute_values(
+                cur,
+                f"""
+                INSERT INTO {_TABLE} (document_id) VALUES %s
+                ON CONFLICT (document_id) DO UPDATE
+                SET status = 'queued', attempts = 0, locked_by = NULL,
+                    locked_until = NULL, last_error = NULL,
+                    available_at = now(), updated_at = now()
+                WHERE {_TABLE}.status <> 'running'
+                """,
+                [(document_id,) for document_id in document_ids],
+            )
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        with pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {_TABLE}
+                SET status = 'running', attempts = attempts + 1, locked_by = %s,
+                    locked_until = now() + make_interval(secs => %s),
+                    updated_at = now()
+                WHERE document_id = (
+                    SELECT document_id FROM {_TABLE}
+                    WHERE (status = 'queued' AND available_at <= now())
+                       OR (status = 'running' AND locked_until < now())
+                    ORDER BY available_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING document_id::text, attempts
+                """,
+                (worker_id, lease_seconds),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return {"document_id": row[0], "attempts": row[1]}
+
+    def heartbeat(self, document_id: str, worker_id: str, lease_seconds: float) -> bool:
+        with pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {_TABLE}
+                SET locked_until = now() + make_interval(secs => %s), updated_at = now()
+                WHERE document_id = %s AND locked_by = %s AND status = 'running'
+                """,
+                (lease_seconds, document_id, worker_id),
+            )
+            return cur.rowcount > 0
+
+    def finish(self, document_id: str, worker_id: str, fields: dict) -> bool:
+        with pg_connection() as conn, conn.cursor() as cur:
+            # The row lock keeps the lease from being reclaimed until the
+            # document row is written and the job removed
+            cur.execute(
+                f"""
+                SELECT 1 FROM {_TABLE}
+                WHERE document_id = %s AND locked_by = %s AND status = 'running'
+                FOR UPDATE
+                """,
+                (document_id, worker_id),
+            )
+            if cur.fetchone() is None:
+                return False
+            sql, values = (
+                _PgTable("documents", None)
+                .update({**fields, "updated_at": "now()"})
+                .eq("id", document_id)
+                ._statement()
+            )
+            cur.execute(sql, values)
+            cur.execute(f"DELETE FROM {_TABLE} WHERE document_id = %s", (document_id,))
+            return True
+
+    def fail(
+        self,
+        document_id: str,
+        worker_id: str,
+        error: str,
+        max_attempts: int,
+        retry_delay: float,
+    ) -> bool:
+        with pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {_TABLE}
+                SET status = CASE WHEN attempts < %s THEN 'queued' ELSE 'failed' END,
+                    available_at = now() + make_interval(secs => %s * attempts),
+                    locked_by = NULL, locked_until = NULL,
+                    last_error = %s, updated_at = now()
+                WHERE document_id = %s AND locked_by = %s
+                RETURNING status
+                """,
+                (max_attempts, retry_delay, error, document_id, worker_id),
+            )
+            row = cur.fetchone()
+        return row is not None and row[0] == QUEUED
+
+    def reap(self, max_attempts: int) -> list[str]:
+        with pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {_TABLE}
+                SET status = 'failed', locked_by = NULL, locked_until = NULL,
+                    last_error = coalesce(last_error, 'worker lease expired'),
+                    updated_at = now()
+                WHERE status = 'running' AND locked_until < now() AND attempts >= %s
+                RETURNING document_id::text
+                """,
+                (max_attempts,),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+_mem_lock = threading.Lock()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expired(job: dict, now: datetime) -> bool:
+    until = job.get("locked_until")
+    return until is None or datetime.fromisoformat(until) < now
+
+
+class _MemQueue:
+    """Single-process stand-in for ``_PgQueue`` on top of the in-memory store."""
+
+    def __init__(self, store) -> None:
+        self._store = store
+
+    def _jobs(self):
+        return self._store.table(_TABLE)
+
+    def _get(self, document_id: str) -> dict | None:
+        rows = self._jobs().select("*").eq("document_id", document_id).execute().data
+        return rows[0] if rows else None
+
+    def push(self, document_ids: list[str]) -> None:
+        with _mem_lock:
+            fields = {
+                "status": QUEUED,
+                "attempts": 0,
+                "locked_by": None,
+                "locked_until": None,
+                "last_error": None,
+                "available_at": _now().isoformat(),
+                "updated_at": "now()",
+            }
+            running = {
+                job["document_id"]
+                for job in self._jobs().select("*").in_("document_id", document_ids)
+                .eq("status", RUNNING).execute().data
+            }
+            self._jobs().upsert(
+                [
+                    {"document_id": document_id, **fields}
+                    for document_id in document_ids
+                    if document_id not in running
+                ],
+                on_conflict="document_id",
+            ).execute()
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        with _mem_lock:
+            now = _now()
+            candidates = [
+                job for job in self._jobs().select("*").execute().data
+                if (job["status"] == QUEUED and datetime.fromisoformat(job["available_at"]) <= now)
+                or (job["status"] == RUNNING and _expired(job, now))
+            ]
+            if not candidates:
+                return None
+            job = min(candidates, key=lambda j: j["available_at"])
+            attempts = job["attempts"] + 1
+            self._jobs().update({
+                "status": RUNNING,
+                "attempts": attempts,
+                "locked_by": worker_id,
+                "locked_until": (now + timedelta(seconds=lease_seconds)).isoformat(),
+                "updated_at": "now()",
+            }).eq("document_id", job["document_id"]).execute()
+            return {"document_id": job["document_id"], "attempts": attempts}
+
+    def heartbeat(self, document_id: str, worker_id: str, lease_seconds: float) -> bool:
+        with _mem_lock:
+            until = (_now() + timedelta(seconds=lease_seconds)).isoformat()
+            rows = (
+                self._jobs()
+                .update({"locked_until": until, "updated_at": "now()"})
+                .eq("document_id", document_id)
+                .eq("locked_by", worker_id)
+                .eq("status", RUNNING)
+                .execute()
+            )
+            return bool(rows.data)
+
+    def finish(self, document_id: str, worker_id: str, fields: dict) -> bool:
+        with _mem_lock:
+            job = self._get(document_id)
+            if job is None or job.get("locked_by") != worker_id or job["status"] != RUNNING:
+                return False
+            self._store.table("documents").update(
+                {**fields, "updated_at": "now()"}
+            ).eq("id", document_id).execute()
+            self._jobs().delete().eq("document_id", document_id).execute()
+            return True
+
+    def fail(
+        self,
+        document_id: str,
+        worker_id: str,
+        error: str,
+        max_attempts: int,
+        retry_delay: float,
+    ) -> bool:
+        with _mem_lock:
+            job = self._get(document_id)
+            if job is None or job.get("locked_by") != worker_id:
+                return False
+            retry = job["attempts"] < max_attempts
+            available = _now() + timedelta(seconds=retry_delay * job["attempts"])
+            self._jobs().update({
+                "status": QUEUED if retry else FAILED,
+                "available_at": available.isoformat(),
+                "locked_by": None,
+                "locked_until": None,
+                "last_error": error,
+                "updated_at": "now()",
+            }).eq("document_id", document_id).execute()
+            return retry
+
+    def reap(self, max_attempts: int) -> list[str]:
+        with _mem_lock:
+            now = _now()
+            dead = [
+                job["document_id"] for job in self._jobs().select("*").eq("status", RUNNING).execute().data
+                if _expired(job, now) and job["attempts"] >= max_attempts
+            ]
+            for document_id in dead:
+                job = self._get(document_id)
+                self._jobs().update({
+                    "status": FAILED,
+                    "locked_by": None,
+                    "locked_until": None,
+                    "last_error": job.get("last_error") or "worker lease expired",
+                    "updated_at": "now()",
+                }).eq("document_id", document_id).execute()
+            return dead
+
+
+def _queue() -> _PgQueue | _MemQueue:
+    store = get_db()
+    if isinstance(store, _PgStore):
+        return _PgQueue()
+    return _MemQueue(store)
+
+
+def push(document_id: str) -> None:
+    """Queue a document for ingestion (no-op while a worker is running it)."""
+    _queue().push([document_id])
+
+
+def push_many(document_ids: list[str]) -> None:
+    """Queue several documents in one statement, like ``push``."""
+    if document_ids:
+        _queue().push(list(document_ids))
+
+
+def claim(worker_id: str, lease_seconds: float) -> dict | None:
+    """
+    Lease the next runnable job to ``worker_id``.
+
+    Returns:
+        ``{"document_id", "attempts"}`` (attempts including this one),
+        or None if nothing is runnable.
+    """
+    return _queue().claim(worker_id, lease_seconds)
+
+
+def heartbeat(document_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """Extend a lease; False if the worker no longer holds it."""
+    return _queue().heartbeat(document_id, worker_id, lease_seconds)
+
+
+def finish(document_id: str, worker_id: str, fields: dict) -> bool:
+    """
+    Write a finished job's ``fields`` to its document row and remove the
+    job, in one transaction and only while ``worker_id`` holds its lease.
+
+    Returns:
+        False if the lease was lost (or the document deleted) and nothing
+        was written.
+    """
+    return _queue().finish(document_id, worker_id, fields)
+
+
+def fail(
+    document_id: str,
+    worker_id: str,
+    error: str,
+    max_attempts: int,
+    retry_delay: float,
+) -> bool:
+    """
+    Release a failed job.
+
+    It is re-queued after ``retry_delay * attempts`` seconds while it has
+    attempts left, otherwise it is parked as failed.
+
+    Returns:
+        True if the job will be retried.
+    """
+    return _queue().fail(document_id, worker_id, error, max_attempts, retry_delay)
+
+
+def reap(max_attempts: int) -> list[str]:
+    """
+    Park jobs whose worker died on their last attempt as failed.
+
+    Returns:
+        The document ids of the parked jobs.
+    """
+    return _queue().reap(max_attempts)
@@ -0,0 +1,708 @@
+"""
+Incrementally maintained BM25 index.
+
+Keeps an inverted index (term -> postings) plus the document-frequency
+and length statistics that BM25 needs, and updates them in place when
+chunks are added or removed. Unlike ``rank_bm25.BM25Okapi`` the index
+never has to be rebuilt from the full corpus after a single change.
+
+Queries are evaluated document-at-a-time with MaxScore dynamic pruning:
+only postings of the query terms are visited, and documents that cannot
+reach the current top-k threshold are skipped without being scored.
+
+Memory layout: the bulk of the postings lives in a frozen CSR segment
+(NumPy offset/slot/tf buffers); chunks added afterwards go to small
+per-term ``array`` buffers that are merged into the CSR segment once
+they grow large. Per-chunk data is kept in flat columns (length, page,
+document reference, 16-byte point id). Chunk text is not stored at all;
+callers fetch it by point id for the final hits.
+
+Persistence: ``save`` writes the frozen segment to a single snapshot
+file (JSON header + aligned raw arrays) and ``load`` maps it read-only,
+so every worker process shares one physical copy of the postings via
+the page cache. The vocabulary is stored sorted and binary-searched in
+the mapping instead of being rebuilt as a dict per process.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Merge the delta into the CSR segment once tombstones or delta chunks
+# outnumber the frozen ones (and exceed this floor)
+_COMPACT_MIN_DEAD = 1024
+
+# Term frequencies are stored as uint16; BM25 saturates long before this
+_MAX_TF = 0xFFFF
+
+_NO_ID = bytes(16)
+
+_SNAPSHOT_MAGIC = b"SWBM25\x00\x01"
+_SNAPSHOT_ALIGN = 64
+
+
+def tokenize(text: str) -> list[str]:
+    """Simple whitespace + punctuation tokenizer with lowercasing."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _id_bytes(point_id) -> bytes:
+    if not point_id:
+        return _NO_ID
+    return uuid.UUID(str(point_id)).bytes
+
+
+def _nbytes(buf) -> int:
+    if isinstance(buf, array):
+        return buf.buffer_info()[1] * buf.itemsize
+    if isinstance(buf, (np.ndarray, memoryview)):
+        return buf.nbytes
+    return len(buf)
+
+
+def _align(offset: int) -> int:
+    return (offset + _SNAPSHOT_ALIGN - 1) // _SNAPSHOT_ALIGN * _SNAPSHOT_ALIGN
+
+
+class _SortedTerms:
+    """Read-only, sorted vocabulary over a UTF-8 blob; term id == rank."""
+
+    def __init__(self, blob, offsets) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, term_id: int) -> str:
+        start, end = self._offsets[term_id], self._offsets[term_id + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def find(self, term: str) -> int | None:
+        pos = bisect_left(self, term)
+        if pos < len(self) and self[pos] == term:
+            return pos
+        return None
+
+
+_NO_TERMS = _SortedTerms(b"", [0])
+
+
+def read_snapshot_header(path) -> dict:
+    """Read only the JSON header of a snapshot file (cheap staleness check)."""
+    with open(path, "rb") as f:
+        if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a BM25 snapshot: {path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    header["_data_start"] = _align(len(_SNAPSHOT_MAGIC) + 8 + header_len)
+    return header
+
+
+class LexicalIndex:
+    """
+    BM25 (Okapi) index over chunk payloads with in-place updates.
+
+    Every indexed chunk occupies a slot. Slots are handed out in
+    increasing order, so each term's postings stay sorted by slot and
+    can be skipped through with binary search; frozen slots always
+    precede delta slots. Removing a chunk tombstones its slot and
+    adjusts the statistics; tombstones are dropped on the next merge.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        # Terms of a loaded snapshot (ids 0..n-1) plus terms added since
+        self._base_terms = _NO_TERMS
+        self._vocab: dict[str, int] = {}
+        self._df = array("I")
+        self._max_tf = array("I")
+
+        # Frozen CSR segment covering slots [0, _base_n)
+        self._base_n = 0
+        self._base_offsets = np.zeros(1, dtype=np.int64)
+        self._base_slots = np.zeros(0, dtype=np.uint32)
+        self._base_tfs = np.zeros(0, dtype=np.uint16)
+        self._base_fwd_offsets = np.zeros(1, dtype=np.int64)
+        self._base_fwd_terms = np.zeros(0, dtype=np.uint32)
+
+        # Delta postings for slots >= _base_n (term id -> slots, tfs)
+        self._delta: dict[int, tuple[array, array]] = {}
+        self._delta_fwd_offsets = array("Q", [0])
+        self._delta_fwd_terms = array("I")
+
+        # Per-slot columns
+        self._doc_lens = array("i")
+        self._pages = array("i")
+        self._doc_refs = array("I")
+        self._point_ids = bytearray()
+        self._live = bytearray()
+
+        # Interned document ids and names
+        self._documents: list[str] = []
+        self._document_names: list[str] = []
+        self._document_refs: dict[str, int] = {}
+        self._slots_by_document: dict[int, array] = {}
+
+        self._total_len = 0
+        self._num_docs = 0
+        self._num_dead = 0
+
+        # Snapshot mapping backing the base segment, if loaded from disk
+        self._mmap: mmap.mmap | None = None
+        self._mapped_bytes = 0
+
+        # Wall-clock time the content was last built from the source corpus
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_len / self._num_docs if self._num_docs else 0.0
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._df)
+
+    def _term_id(self, term: str) -> int | None:
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._base_terms.find(term)
+        return term_id
+
+    def _document_ref(self, document_id: str, document_name: str) -> int:
+        ref = self._document_refs.get(document_id)
+        if ref is None:
+            ref = len(self._documents)
+            self._document_refs[document_id] = ref
+            self._documents.append(document_id)
+            self._document_names.append(document_name)
+        elif document_name:
+            self._document_names[ref] = document_name
+        return ref
+
+    def add(self, doc: dict) -> None:
+        """
+        Index a single chunk payload.
+
+        Uses ``text`` for the postings and keeps only ``id``,
+        ``document_id``, ``document_name`` and ``page``; the text itself
+        is not retained.
+        """
+        tokens = tokenize(doc.get("text", ""))
+        tf: dict[int, int] = {}
+        for token in tokens:
+            term_id = self._term_id(token)
+            if term_id is None:
+                term_id = len(self._df)
+                self._vocab[token] = term_id
+                self._df.append(0)
+                self._max_tf.append(0)
+            tf[term_id] = tf.get(term_id, 0) + 1
+
+        slot = len(self._doc_lens)
+        for term_id, freq in tf.items():
+            freq = min(freq, _MAX_TF)
+            postings = self._delta.get(term_id)
+            if postings is None:
+                postings = self._delta[term_id] = (array("I"), array("H"))
+            postings[0].append(slot)
+            postings[1].append(freq)
+            self._df[term_id] += 1
+            if freq > self._max_tf[term_id]:
+                self._max_tf[term_id] = freq
+        self._delta_fwd_terms.extend(tf)
+        self._delta_fwd_offsets.append(len(self._delta_fwd_terms))
+
+        ref = self._document_ref(doc.get("document_id", ""), doc.get("document_name", ""))
+        page = doc.get("page")
+        self._doc_lens.append(len(tokens))
+        self._pages.append(int(page) if page is not None else -1)
+        self._doc_refs.append(ref)
+        self._point_ids += _id_bytes(doc.get("id"))
+        self._live.append(1)
+        self._slots_by_document.setdefault(ref, array("I")).append(slot)
+
+        self._total_len += len(tokens)
+        self._num_docs += 1
+
+    def add_many(self, docs) -> None:
+        for doc in docs:
+            self.add(doc)
+        self._maybe_freeze()
+
+    def _slot_terms(self, slot: int):
+        if slot < self._base_n:
+            offsets = self._base_fwd_offsets
+            return self._base_fwd_terms[offsets[slot]:offsets[slot + 1]].tolist()
+        rel = slot - self._base_n
+        offsets = self._delta_fwd_offsets
+        return self._delta_fwd_terms[offsets[rel]:offsets[rel + 1]]
+
+    def remove_document(self, document_id: str) -> int:
+        """
+        Remove every chunk belonging to ``document_id``.
+
+        Returns:
+            The number of chunks removed.
+        """
+        ref = self._document_refs.get(document_id)
+        slots = self._slots_by_document.pop(ref, ()) if ref is not None else ()
+        for slot in slots:
+            for term_id in self._slot_terms(slot):
+                self._df[term_id] -= 1
+            self._total_len -= self._doc_lens[slot]
+            self._num_docs -= 1
+            self._num_dead += 1
+            self._live[slot] = 0
+
+        self._maybe_freeze()
+        return len(slots)
+
+    def _maybe_freeze(self) -> None:
+        delta_n = len(self._doc_lens) - self._base_n
+        floor = max(_COMPACT_MIN_DEAD, self._base_n)
+        if self._num_dead > max(_COMPACT_MIN_DEAD, self._num_docs) or delta_n > floor:
+            self.freeze()
+
+    def freeze(self) -> None:
+        """
+        Merge the delta postings into the CSR segment and drop tombstones.
+
+        Live slots are renumbered densely; postings stay sorted by slot
+        because frozen slots always precede delta slots for every term.
+        """
+        n = len(self._doc_lens)
+        live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        n_live = int(live.sum())
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[live] = np.arange(n_live)
+
+        num_terms = len(self._df)
+        base_terms = np.repeat(
+            np.arange(len(self._base_offsets) - 1, dtype=np.uint32),
+            np.diff(self._base_offsets),
+        )
+        term_parts, slot_parts, tf_parts = [base_terms], [self._base_slots], [self._base_tfs]
+        for term_id, (slots, tfs) in self._delta.items():
+            term_parts.append(np.full(len(slots), term_id, dtype=np.uint32))
+            slot_parts.append(np.frombuffer(slots, dtype=np.uint32))
+            tf_parts.append(np.frombuffer(tfs, dtype=np.uint16))
+        terms = np.concatenate(term_parts)
+        slots = np.concatenate(slot_parts)
+        tfs = np.concatenate(tf_parts)
+
+        keep = live[slots] if len(slots) else np.zeros(0, dtype=bool)
+        terms, slots, tfs = terms[keep], remap[slots[keep]].astype(np.uint32), tfs[keep]
+
+        order = np.argsort(terms, kind="stable")
+        terms, slots, tfs = terms[order], slots[order], tfs[order]
+        counts = np.bincount(terms, minlength=num_terms)
+        offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        max_tf = np.zeros(num_terms, dtype=np.uint32)
+        nonempty = counts > 0
+        if nonempty.any():
+            max_tf[nonempty] = np.maximum.reduceat(tfs, offsets[:-1][nonempty])
+
+        fwd_order = np.argsort(slots, kind="stable")
+        fwd_offsets = np.zeros(n_live + 1, dtype=np.int64)
+        np.cumsum(np.bincount(slots, minlength=n_live), out=fwd_offsets[1:])
+
+        self._base_offsets = offsets
+        self._base_slots = slots
+        self._base_tfs = tfs
+        self._base_fwd_offsets = fwd_offsets
+        self._base_fwd_terms = terms[fwd_order]
+        self._base_n = n_live
+        self._df = array("I", counts.astype(np.uint32).tobytes())
+        self._max_tf = array("I", max_tf.tobytes())
+        self._delta = {}
+        self._delta_fwd_offsets = array("Q", [0])
+        self._delta_fwd_terms = array("I")
+
+        self._doc_lens = array("i", np.frombuffer(self._doc_lens, dtype=np.int32)[live].tobytes())
+        self._pages = array("i", np.frombuffer(self._pages, dtype=np.int32)[live].tobytes())
+        self._doc_refs = array("I", np.frombuffer(self._doc_refs, dtype=np.uint32)[live].tobytes())
+        self._point_ids = bytearray(
+            np.frombuffer(self._point_ids, dtype=np.uint8).reshape(-1, 16)[live].tobytes()
+        )
+        self._live = bytearray(b"\x01" * n_live)
+        self._slots_by_document = {}
+        for slot, ref in enumerate(self._doc_refs):
+            self._slots_by_document.setdefault(ref, array("I")).append(slot)
+        self._num_dead = 0
+        # Postings are private now; only the vocabulary may still be mapped
+        self._mapped_bytes = _nbytes(self._base_terms._blob) if self._mmap else 0
+
+    def clone(self) -> "LexicalIndex":
+        """
+        Return an independent copy that can be frozen or saved elsewhere.
+
+        The frozen segment is shared (it is never modified in place);
+        only the mutable delta, columns and tables are copied.
+        """
+        other = LexicalIndex.__new__(LexicalIndex)
+        other.__dict__.update(self.__dict__)
+        other._vocab = dict(self._vocab)
+        other._df = array("I", self._df)
+        other._max_tf = array("I", self._max_tf)
+        other._delta = {
+            term_id: (array("I", slots), array("H", tfs))
+            for term_id, (slots, tfs) in self._delta.items()
+        }
+        other._delta_fwd_offsets = array("Q", self._delta_fwd_offsets)
+        other._delta_fwd_terms = array("I", self._delta_fwd_terms)
+        other._doc_lens = array("i", self._doc_lens)
+        other._pages = array("i", self._pages)
+        other._doc_refs = array("I", self._doc_refs)
+        other._point_ids = bytearray(self._point_ids)
+        other._live = bytearray(self._live)
+        other._documents = list(self._documents)
+        other._document_names = list(self._document_names)
+        other._document_refs = dict(self._document_refs)
+        other._slots_by_document = {
+            ref: array("I", slots) for ref, slots in self._slots_by_document.items()
+        }
+        return other
+
+    def _all_terms(self) -> list[str]:
+        terms = [self._base_terms[i] for i in range(len(self._base_terms))]
+        terms.extend([""] * len(self._vocab))
+        for term, term_id in self._vocab.items():
+            terms[term_id] = term
+        return terms
+
+    def save(self, path, generation: int, collection: str, synced: list | None = None) -> None:
+        """
+        Write the index to a snapshot file (atomically, via rename).
+
+        Freezes the delta first and relabels term ids in sorted term
+        order so ``load`` can binary-search the vocabulary in place.
+        ``synced`` is stored in the header as is (see ``HybridSearcher``).
+        """
+        self.freeze()
+        terms = self._all_terms()
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        old_ids = np.asarray(order, dtype=np.int64)
+        perm = np.empty(len(terms), dtype=np.uint32)
+        perm[old_ids] = np.arange(len(terms), dtype=np.uint32)
+
+        counts = np.diff(self._base_offsets)[old_ids]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        gather = np.repeat(self._base_offsets[:-1][old_ids] - offsets[:-1], counts)
+        gather += np.arange(offsets[-1], dtype=np.int64)
+
+        encoded = [terms[i].encode("utf-8") for i in order]
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in encoded], out=term_offsets[1:])
+
+        arrays = {
+            "term_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            "term_offsets": term_offsets,
+            "df": np.frombuffer(self._df, dtype=np.uint32)[old_ids],
+            "max_tf": np.frombuffer(self._max_tf, dtype=np.uint32)[old_ids],
+            "offsets": offsets,
+            "slots": self._base_slots[gather],
+            "tfs": self._base_tfs[gather],
+            "fwd_offsets": self._base_fwd_offsets,
+            "fwd_terms": perm[self._base_fwd_terms],
+            "doc_lens": np.frombuffer(self._doc_lens, dtype=np.int32),
+            "pages": np.frombuffer(self._pages, dtype=np.int32),
+            "doc_refs": np.frombuffer(self._doc_refs, dtype=np.uint32),
+            "point_ids": np.frombuffer(self._point_ids, dtype=np.uint8),
+        }
+        layout, position = {}, 0
+        for name, arr in arrays.items():
+            position = _align(position)
+            layout[name] = [arr.dtype.str, len(arr), position]
+            position += arr.nbytes
+
+        header = json.dumps({
+            "version": 1,
+            "generation": generation,
+            "collection": collection,
+            "synced": synced,
+            "built_at": self.built_at,
+            "k1": self.k1,
+            "b": self.b,
+            "num_docs": self._num_docs,
+            "total_len": self._total_len,
+            "documents": self._documents,
+            "document_names": self._document_names,
+            "arrays": layout,
+        }).encode("utf-8")
+
+        path = os.fspath(path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data_start = _align(len(_SNAPSHOT_MAGIC) + 8 + len(header))
+        with open(tmp_path, "wb") as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, arr in arrays.items():
+                f.seek(data_start + layout[name][2])
+                f.write(arr.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, collection: str | None = None) -> tuple["LexicalIndex", int]:
+        """
+        Map a snapshot file read-only and wrap it as an index.
+
+        Postings, forward index and vocabulary stay in the shared mapping;
+        only the small per-chunk columns are copied so they can grow.
+
+        Returns:
+            ``(index, generation)``.
+
+        Raises:
+            ValueError: If the file is not a snapshot or belongs to a
+                different collection.
+        """
+        header = read_snapshot_header(path)
+        if collection is not None and header["collection"] != collection:
+            raise ValueError(
+                f"Snapshot belongs to collection '{header['collection']}', "
+                f"expected '{collection}'"
+            )
+
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        def view(name: str) -> np.ndarray:
+            dtype, count, offset = header["arrays"][name]
+            if not count:
+                return np.zeros(0, dtype=np.dtype(dtype))
+            return np.frombuffer(
+                mapping, dtype=np.dtype(dtype), count=count,
+                offset=header["_data_start"] + offset,
+            )
+
+        index = cls(k1=header["k1"], b=header["b"])
+        index._mmap = mapping
+        index._base_terms = _SortedTerms(
+            memoryview(view("term_blob")), memoryview(view("term_offsets"))
+        )
+        index._df = array("I", view("df").tobytes())
+        index._max_tf = array("I", view("max_tf").tobytes())
+        index._base_offsets = view("offsets")
+        index._base_slots = view("slots")
+        index._base_tfs = view("tfs")
+        index._base_fwd_offsets = view("fwd_offsets")
+        index._base_fwd_terms = view("fwd_terms")
+        index._doc_lens = array("i", view("doc_lens").tobytes())
+        index._pages = array("i", view("pages").tobytes())
+        index._doc_refs = array("I", view("doc_refs").tobytes())
+        index._point_ids = bytearray(view("point_ids").tobytes())
+
+        n = len(index._doc_lens)
+        index._base_n = n
+        index._live = bytearray(b"\x01" * n)
+        index._documents = header["documents"]
+        index._document_names = header["document_names"]
+        index._document_refs = {doc_id: ref for ref, doc_id in enumerate(index._documents)}
+        for slot, ref in enumerate(index._doc_refs):
+            index._slots_by_document.setdefault(ref, array("I")).append(slot)
+        index._total_len = header["total_len"]
+        index._num_docs = header["num_docs"]
+        index._mapped_bytes = len(mapping)
+        index.built_at = header.get("built_at", index.built_at)
+        return index, header["generation"]
+
+    def _postings(self, term_id: int):
+        """Yield the (slots, tfs) lists of a term: CSR slice, then delta."""
+        if term_id + 1 < len(self._base_offsets):
+            start, end = self._base_offsets[term_id], self._base_offsets[term_id + 1]
+            if end > start:
+                yield (
+                    memoryview(self._base_slots[start:end]),
+                    memoryview(self._base_tfs[start:end]),
+                )
+        delta = self._delta.get(term_id)
+        if delta is not None:
+            yield delta
+
+    def _hit(self, slot: int) -> dict:
+        ref = self._doc_refs[slot]
+        raw_id = bytes(self._point_ids[slot * 16:(slot + 1) * 16])
+        page = self._pages[slot]
+        return {
+            "id": str(uuid.UUID(bytes=raw_id)) if raw_id != _NO_ID else None,
+            "document_id": self._documents[ref],
+            "document_name": self._document_names[ref],
+            "page": page if page >= 0 else None,
+        }
+
+    def idf(self, df: int) -> float:
+        """Okapi IDF, floored at zero the way Lucene does it (log1p form)."""
+        return math.log(1.0 + (self._num_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int) -> list[tuple[dict, float]]:
+        """
+        Return the top ``limit`` chunks for ``query`` using MaxScore.
+
+        Query terms are ordered by their score upper bound. Terms whose
+        cumulative bound cannot lift a document above the current k-th
+        best score become "non-essential": they are only probed (via
+        binary search) for documents found through the essential terms,
+        and probing stops as soon as the remaining bound cannot help.
+
+        Returns:
+            Up to ``limit`` (hit, score) pairs, best first. Each hit has
+            id, document_id, document_name and page -- but no text.
+        """
+        if not self._num_docs or limit <= 0:
+            return []
+
+        weights: dict[int, int] = {}
+        for token in tokenize(query):
+            term_id = self._term_id(token)
+            if term_id is not None and self._df[term_id] > 0:
+                weights[term_id] = weights.get(term_id, 0) + 1
+        if not weights:
+            return []
+
+        k1 = self.k1
+        norm_base = k1 * (1 - self.b)
+        norm_len = k1 * self.b / self.avgdl
+
+        terms = []
+        for term_id, weight in weights.items():
+            idf = self.idf(self._df[term_id]) * weight * (k1 + 1)
+            max_tf = self._max_tf[term_id]
+            upper = idf * max_tf / (max_tf + norm_base)
+            for slots, tfs in self._postings(term_id):
+                terms.append((upper, idf, slots, tfs))
+        terms.sort(key=lambda t: t[0])
+        bounds = list(accumulate(t[0] for t in terms))
+
+        n = len(terms)
+        cursors = [0] * n
+        heap: list[tuple[float, int]] = []
+        threshold = 0.0
+        essential = 0
+        live = self._live
+        doc_lens = self._doc_lens
+
+        while essential < n:
+            candidate = -1
+            for i in range(essential, n):
+                slots = terms[i][2]
+                if cursors[i] < len(slots):
+                    slot = slots[cursors[i]]
+                    if candidate < 0 or slot < candidate:
+                        candidate = slot
+            if candidate < 0:
+                break
+
+            norm = norm_base + norm_len * doc_lens[candidate]
+            score = 0.0
+            for i in range(essential, n):
+                _, idf, slots, tfs = terms[i]
+                pos = cursors[i]
+                if pos < len(slots) and slots[pos] == candidate:
+                    freq = tfs[pos]
+                    score += idf * freq / (freq + norm)
+                    cursors[i] = pos + 1
+
+            if not live[candidate]:
+                continue
+
+            for i in range(essential - 1, -1, -1):
+                if score + bounds[i] <= threshold:
+                    break
+                _, idf, slots, tfs = terms[i]
+                pos = bisect_left(slots, candidate, cursors[i])
+                cursors[i] = pos
+                if pos < len(slots) and slots[pos] == candidate:
+                    freq = tfs[pos]
+                    score += idf * freq / (freq + norm)
+
+            if len(heap) < limit:
+                heapq.heappush(heap, (score, candidate))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, candidate))
+            else:
+                continue
+
+            if len(heap) == limit:
+                threshold = heap[0][0]
+                while essential < n and bounds[essential] <= threshold:
+                    essential += 1
+
+        heap.sort(key=lambda x: (-x[0], x[1]))
+        return [(self._hit(slot), score) for score, slot in heap]
+
+    def memory_usage(self) -> dict[str, int]:
+        """
+        Approximate heap usage of the index in bytes, by component.
+
+        Intended for sizing workers; Python object overheads of the
+        vocabulary and document tables are estimated via ``sys.getsizeof``.
+        ``mapped`` is the size of the snapshot mapping shared between
+        processes, which does not count against a single worker.
+        """
+        vocabulary = sys.getsizeof(self._vocab) + sum(
+            sys.getsizeof(term) for term in self._vocab
+        )
+        if len(self._base_terms):
+            vocabulary += _nbytes(self._base_terms._blob) + _nbytes(self._base_terms._offsets)
+        postings = (
+            _nbytes(self._base_offsets)
+            + _nbytes(self._base_slots)
+            + _nbytes(self._base_tfs)
+            + sys.getsizeof(self._delta)
+            + sum(_nbytes(s) + _nbytes(t) for s, t in self._delta.values())
+        )
+        forward = (
+            _nbytes(self._base_fwd_offsets)
+            + _nbytes(self._base_fwd_terms)
+            + _nbytes(self._delta_fwd_offsets)
+            + _nbytes(self._delta_fwd_terms)
+        )
+        columns = sum(
+            _nbytes(buf)
+            for buf in (
+                self._df, self._max_tf, self._doc_lens, self._pages,
+                self._doc_refs, self._point_ids, self._live,
+            )
+        )
+        documents = (
+            sys.getsizeof(self._documents)
+            + sys.getsizeof(self._document_refs)
+            + sum(sys.getsizeof(d) for d in self._documents)
+            + sum(sys.getsizeof(n) for n in self._document_names)
+            + sum(_nbytes(s) for s in self._slots_by_document.values())
+        )
+        usage = {
+            "vocabulary": vocabulary,
+            "postings": postings,
+            "forward_index": forward,
+            "columns": columns,
+            "documents": documents,
+        }
+        usage["total"] = sum(usage.values())
+        # Portion of the above backed by a shared, read-only snapshot mapping
+        usage["mapped"] = self._mapped_bytes
+        return usage
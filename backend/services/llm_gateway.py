@@ -0,0 +1,348 @@
+"""
+Process-wide gateway for all OpenAI traffic (chat completions and embeddings).
+
+Every call site goes through one sync and one async client that share
+pooled, keep-alive HTTP connections instead of building a fresh client
+(and TLS handshake) per request. Transient failures (429, 5xx,
+connection errors, timeouts) are retried with one backoff policy, and
+latency, token usage and errors are recorded per call site.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+import httpx
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors worth retrying (APITimeoutError is an APIConnectionError)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Backoff bounds (seconds) between retries
+_BACKOFF_BASE = 0.5
+_BACKOFF_MAX = 30.0
+
+# Latency samples kept per call site for percentiles
+_LATENCY_WINDOW = 512
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds the server asked us to wait (``Retry-After``), if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(error: Exception, attempt: int) -> float:
+    """
+    Delay before retry number ``attempt`` (1-based).
+
+    Honours ``Retry-After`` when present, otherwise exponential backoff;
+    both with up to 25% jitter so retries of parallel calls spread out.
+    """
+    delay = retry_after(error) or min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay * (1 + random.random() * 0.25)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class _SiteStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.error_types: dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_total = 0.0
+        self.latencies: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "error_types": dict(self.error_types),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms_avg": round(self.latency_total / self.calls * 1000, 1) if self.calls else 0.0,
+            "latency_ms_p50": percentile(0.5),
+            "latency_ms_p95": percentile(0.95),
+        }
+
+
+_stats: dict[str, _SiteStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _site(site: str) -> _SiteStats:
+    stats = _stats.get(site)
+    if stats is None:
+        with _stats_lock:
+            stats = _stats.setdefault(site, _SiteStats())
+    return stats
+
+
+def _record_usage(site: str, response) -> None:
+    usage = getattr(response, "usage", None)
+    prompt = getattr(usage, "prompt_tokens", 0)
+    completion = getattr(usage, "completion_tokens", 0)
+    stats = _site(site)
+    with _stats_lock:
+        if isinstance(prompt, int):
+            stats.prompt_tokens += prompt
+        if isinstance(completion, int):
+            stats.completion_tokens += completion
+
+
+@contextmanager
+def _track(site: str):
+    """Time one logical call (including retries) and count its outcome."""
+    stats = _site(site)
+    started = time.monotonic()
+    try:
+        yield stats
+    except Exception as e:
+        with _stats_lock:
+            stats.errors += 1
+            name = type(e).__name__
+            stats.error_types[name] = stats.error_types.get(name, 0) + 1
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        with _stats_lock:
+            stats.calls += 1
+            stats.latency_total += elapsed
+            stats.latencies.append(elapsed)
+
+
+def metrics() -> dict:
+    """Per-call-site latency, token and error counters of this worker."""
+    with _stats_lock:
+        return {site: stats.snapshot() for site, stats in sorted(_stats.items())}
+
+
+def reset_metrics() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+def _limits() -> httpx.Limits:
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive,
+        keepalive_expiry=settings.llm_keepalive_expiry,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(get_settings().llm_timeout, connect=10.0)
+
+
+_client: OpenAI | None = None
+_client_lock = threading.Lock()
+
+# httpx async connections are bound to the event loop that opened them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_client() -> OpenAI:
+    """
+    Return the process-wide OpenAI client.
+
+    SDK-level retries are disabled; ``chat``/``embed`` retry instead so
+    every call site follows the same policy and is counted.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                settings = get_settings()
+                _client = OpenAI(
+                    api_key=settings.openai_api_key,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+                )
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the AsyncOpenAI client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        settings = get_settings()
+        client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+# ---------------------------------------------------------------------------
+# Calls
+# ---------------------------------------------------------------------------
+
+def _call(site: str, fn: Callable[[], T], retries: int | None) -> T:
+    max_retries = get_settings().llm_max_retries if retries is None else retries
+    with _track(site) as stats:
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                delay = backoff_delay(e, attempt)
+                with _stats_lock:
+                    stats.retries += 1
+                logger.warning(
+                    "%s: %s, retry %d/%d in %.1fs",
+                    site, type(e).__name__, attempt, max_retries, delay,
+                )
+                time.sleep(delay)
+
+
+async def _acall(site: str, fn: Callable[[], Awaitable[T]], retries: int | None) -> T:
+    max_retries = get_settings().llm_max_retries if retries is None else retries
+    with _track(site) as stats:
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                delay = backoff_delay(e, attempt)
+                with _stats_lock:
+                    stats.retries += 1
+                logger.warning(
+                    "%s: %s, retry %d/%d in %.1fs",
+                    site, type(e).__name__, attempt, max_retries, delay,
+                )
+                await asyncio.sleep(delay)
+
+
+def chat(site: str, *, retries: int | None = None, **kwargs):
+    """
+    Create a chat completion.
+
+    Args:
+        site: Call-site name the metrics are recorded under.
+        retries: Override ``llm_max_retries`` for this call.
+        **kwargs: Passed to ``chat.completions.create``.
+
+    Returns:
+        The completion object.
+    """
+    client = get_client()
+    response = _call(site, lambda: client.chat.completions.create(**kwargs), retries)
+    _record_usage(site, response)
+    return response
+
+
+async def achat(site: str, *, retries: int | None = None, **kwargs):
+    """Async variant of ``chat``."""
+    client = get_async_client()
+    response = await _acall(site, lambda: client.chat.completions.create(**kwargs), retries)
+    _record_usage(site, response)
+    return response
+
+
+async def astream_chat(site: str, *, retries: int | None = None, **kwargs) -> AsyncIterator[str]:
+    """
+    Stream a chat completion, yielding the text deltas.
+
+    Only opening the stream is retried (nothing has been yielded yet);
+    the recorded latency is the time to the first response. Token usage
+    is requested from the API and recorded from the final chunk.
+    """
+    client = get_async_client()
+    stream = await _acall(
+        site,
+        lambda: client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **kwargs
+        ),
+        retries,
+    )
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            _record_usage(site, chunk)
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            yield content
+
+
+def embed(site: str, texts: list[str], *, model: str | None = None, retries: int | None = None) -> list[list[float]]:
+    """
+    Embed one batch of texts in a single request.
+
+    Args:
+        site: Call-site name the metrics are recorded under.
+        texts: The batch to embed.
+        model: Embedding model (defaults to ``openai_embed_model``).
+        retries: Override ``llm_max_retries`` for this call.
+
+    Returns:
+        One vector per text, in order.
+    """
+    client = get_client()
+    model = model or get_settings().openai_embed_model
+    response = _call(site, lambda: client.embeddings.create(model=model, input=texts), retries)
+    _record_usage(site, response)
+    return [item.embedding for item in response.data]
+
+
+async def aembed(site: str, texts: list[str], *, model: str | None = None, retries: int | None = None) -> list[list[float]]:
+    """Async variant of ``embed``."""
+    client = get_async_client()
+    model = model or get_settings().openai_embed_model
+    response = await _acall(
+        site, lambda: client.embeddings.create(model=model, input=texts), retries
+    )
+    _record_usage(site, response)
+    return [item.embedding for item in response.data]
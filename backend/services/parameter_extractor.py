@@ -10,9 +10,8 @@ import logging
 from pathlib import Path
 
 import yaml
-from openai import OpenAI
-
 from config import get_settings
+from services import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -193,13 +192,12 @@ def extract_parameters(description: str) -> dict:
 
     system_message = SYSTEM_PROMPT.format(schema_description=schema_description)
 
-    client = OpenAI(api_key=settings.openai_api_key)
-
     logger.info(
         "Extracting parameters from description (%d chars)", len(description)
     )
 
-    completion = client.chat.completions.create(
+    completion = llm_gateway.chat(
+        "wizard.extract",
         model=settings.openai_model,
         messages=[
             {"role": "system", "content": system_message},
@@ -379,14 +377,12 @@ def parse_edit_instruction(instruction: str, stream_names: list[str]) -> dict:
     Returns:
         Dict with target_stream_name, changes, and message.
     """
-    settings = get_settings()
-    client = OpenAI(api_key=settings.openai_api_key)
-
     names_text = ", ".join(stream_names) if stream_names else "(keine Streams vorhanden)"
 
     logger.info("Parsing edit instruction: %s", instruction[:100])
 
-    completion = client.chat.completions.create(
+    completion = llm_gateway.chat(
+        "wizard.edit",
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": EDIT_SYSTEM_PROMPT},
@@ -0,0 +1,260 @@
+"""
+Process pool for CPU-heavy document parsing.
+
+PyMuPDF and openpyxl hold the GIL while they parse, so parsing in a
+thread caps ingestion at one core per process and starves the request
+handlers running next to it. PDF, DOCX and XLSX files are therefore
+parsed in a pool of worker processes; large PDFs are split into page
+ranges (and workbooks into sheets) that are parsed in parallel, so a
+single document can use several cores.
+
+Every task runs under a CPU time limit: a pathological file gets its
+worker process killed instead of monopolizing it. A killed worker breaks
+the whole pool, failing every task in flight, so each failed task is run
+once more in a pool of its own; only the task that is killed there too
+fails with ``ParseLimitExceeded``.
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Callable, Iterator, NamedTuple
+
+from config import get_settings
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# File kinds worth a trip to another process (XLSX: see iter_table_chunks)
+_POOLED_KINDS = ("pdf", "docx", "xlsx")
+
+
+class ParseLimitExceeded(RuntimeError):
+    """A parse task used up its CPU time limit (or its worker died)."""
+
+
+class _Task(NamedTuple):
+    pool: ProcessPoolExecutor
+    future: Future
+    fn: Callable
+    args: tuple
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _new_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        # Never fork the threaded API process
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(get_settings().parse_workers)
+        return _pool
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown() -> None:
+    """Stop the worker processes (a new pool is started on next use)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ── Worker side ──────────────────────────────────────────────────────
+
+def _limited(cpu_seconds: float, fn: Callable, *args):
+    """Run ``fn`` in a worker with at most ``cpu_seconds`` more CPU time."""
+    if resource is None or cpu_seconds <= 0:
+        return fn(*args)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(used + cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    # Exceeding the soft limit sends SIGXCPU, which kills the worker
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        return fn(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _parse_pdf_range(path: str, start: int, stop: int) -> list:
+    from services.document_processor import _iter_pdf_pages
+
+    return list(_iter_pdf_pages(path, start, stop))
+
+
+def _parse_file(path: str, filename: str, content_type: str) -> list:
+    from services.document_processor import _iter_segments
+
+    return list(_iter_segments(filename, path, content_type))
+
+
+def _parse_xlsx_sheet(path: str, sheet: str, options: tuple) -> list:
+    from services.document_processor import _iter_xlsx_chunks
+
+    return list(_iter_xlsx_chunks(path, sheet, *options))
+
+
+# ── Caller side ──────────────────────────────────────────────────────
+
+def _submit(fn: Callable, *args) -> _Task:
+    pool = _get_pool()
+    limit = get_settings().parse_cpu_limit
+    return _Task(pool, pool.submit(_limited, limit, fn, *args), fn, args)
+
+
+def _run_isolated(fn: Callable, *args):
+    """Run one task in a throwaway single-process pool."""
+    limit = get_settings().parse_cpu_limit
+    with _new_pool(1) as pool:
+        try:
+            return pool.submit(_limited, limit, fn, *args).result()
+        except BrokenProcessPool as e:
+            raise ParseLimitExceeded(
+                f"Parsing aborted: worker exceeded the CPU limit of {limit:g}s or crashed"
+            ) from e
+
+
+def _result(task: _Task):
+    try:
+        return task.future.result()
+    except BrokenProcessPool:
+        _discard_pool(task.pool)
+    # Possibly failed only because another task killed a shared worker
+    logger.warning("Parse pool broke, retrying %s in isolation", task.fn.__name__)
+    return _run_isolated(task.fn, *task.args)
+
+
+@contextmanager
+def _spooled(source: bytes | str, suffix: str = "") -> Iterator[str]:
+    """
+    Write the file once so workers read it from disk instead of a pickled
+    copy; a path is used as is.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(prefix="parse-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def _ordered(tasks: Iterator[tuple]) -> Iterator:
+    """
+    Run ``(fn, *args)`` tasks in the pool, at most two per worker in
+    flight, and yield the items of their list results in task order.
+    """
+    window = max(1, get_settings().parse_workers * 2)
+    tasks = iter(tasks)
+    in_flight: deque[_Task] = deque()
+    try:
+        while True:
+            while len(in_flight) < window:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                in_flight.append(_submit(*task))
+            if not in_flight:
+                return
+            yield from _result(in_flight.popleft())
+    finally:
+        for task in in_flight:
+            task.future.cancel()
+
+
+def iter_segments(filename: str, source: bytes | str, content_type: str) -> Iterator:
+    """
+    Parse a file (bytes or a path) into segments like
+    ``document_processor._iter_segments``, in the process pool where that
+    pays off.
+
+    PDFs with more than ``parse_shard_pages`` pages are parsed as page
+    ranges in parallel; segments are yielded in page order.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        ParseLimitExceeded: If a task ran out of CPU time.
+    """
+    from services import document_processor
+
+    settings = get_settings()
+    kind = document_processor._file_kind(filename, content_type)
+    if settings.parse_workers <= 0 or kind not in _POOLED_KINDS:
+        yield from document_processor._iter_segments(filename, source, content_type)
+        return
+
+    with _spooled(source, os.path.splitext(filename)[1]) as path:
+        if kind != "pdf":
+            yield from _result(_submit(_parse_file, path, filename, content_type))
+            return
+
+        pages = document_processor._pdf_page_count(path)
+        shard = max(1, settings.parse_shard_pages)
+        yield from _ordered(
+            (_parse_pdf_range, path, start, min(start + shard, pages))
+            for start in range(0, pages, shard)
+        )
+
+
+def iter_table_chunks(source: bytes | str) -> Iterator:
+    """
+    Row-group chunks of an XLSX workbook like
+    ``document_processor._iter_workbook_chunks``, with its sheets chunked
+    in parallel.
+
+    Sheets are not split further: openpyxl parses a sheet from its first
+    row whatever ``min_row`` says, so row ranges of one sheet would each
+    re-parse everything above them.
+
+    Raises:
+        ParseLimitExceeded: If a task ran out of CPU time.
+    """
+    from services import document_processor
+
+    settings = get_settings()
+    if settings.parse_workers <= 0:
+        yield from document_processor._iter_workbook_chunks(source)
+        return
+
+    options = (settings.xlsx_chunk_rows, settings.chunk_size, settings.chunk_unit)
+    # openpyxl goes by the file extension
+    with _spooled(source, ".xlsx") as path:
+        yield from _ordered(
+            (_parse_xlsx_sheet, path, sheet, options)
+            for sheet in document_processor._xlsx_sheets(path)
+        )
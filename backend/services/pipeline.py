@@ -0,0 +1,156 @@
+"""
+Bounded-queue pipeline of worker-thread stages.
+
+Items produced by a source iterator flow through a chain of stages, each
+run by its own worker threads and connected by bounded queues. Stages
+overlap (the first embedding batch is sent while the source is still
+parsing), and a full queue blocks the stage feeding it, so the number of
+items in flight, and with it memory, stays bounded however long the
+source is.
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for a failed sibling while blocked on a queue
+_POLL = 0.1
+
+_DONE = object()
+
+
+class Stage(NamedTuple):
+    """One pipeline step: ``fn`` maps an item to the item for the next stage."""
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+class Cancelled(RuntimeError):
+    """Raised by ``run_pipeline`` when its ``cancel`` event was set."""
+
+
+class _Aborted(Exception):
+    pass
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: list[Stage],
+    maxsize: int = 4,
+    cancel: threading.Event | None = None,
+) -> None:
+    """
+    Push every item of ``source`` through ``stages``.
+
+    Results of the last stage are discarded; stages record what they need
+    themselves. Items may be processed out of order when a stage has
+    several workers.
+
+    Args:
+        source: Iterator producing the items (consumed in its own thread).
+        stages: The stages, in order.
+        maxsize: Capacity of each queue between two steps.
+        cancel: Optional event; once set, every step stops before its
+            next item.
+
+    Raises:
+        Cancelled: If ``cancel`` was set while the pipeline ran.
+        The first exception raised by the source or any stage; the other
+            steps stop as soon as they notice it.
+    """
+    queues = [queue.Queue(maxsize=max(1, maxsize)) for _ in stages]
+    failed = threading.Event()
+    errors: list[BaseException] = []
+    errors_lock = threading.Lock()
+
+    def fail(exc: BaseException) -> None:
+        with errors_lock:
+            errors.append(exc)
+        failed.set()
+
+    def check() -> None:
+        if cancel is not None and cancel.is_set() and not failed.is_set():
+            fail(Cancelled("Pipeline cancelled"))
+        if failed.is_set():
+            raise _Aborted
+
+    def put(q: queue.Queue, item) -> None:
+        while True:
+            check()
+            try:
+                q.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def get(q: queue.Queue):
+        while True:
+            check()
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                continue
+
+    def produce() -> None:
+        try:
+            for item in source:
+                put(queues[0], item)
+            put(queues[0], _DONE)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            fail(e)
+
+    def work(index: int, stage: Stage, remaining: list[int], lock: threading.Lock) -> None:
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(queues) else None
+        try:
+            while True:
+                item = get(inbox)
+                if item is _DONE:
+                    # Let the sibling workers see the end too
+                    put(inbox, _DONE)
+                    break
+                result = stage.fn(item)
+                if outbox is not None:
+                    put(outbox, result)
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and outbox is not None:
+                put(outbox, _DONE)
+        except _Aborted:
+            pass
+        except BaseException as e:
+            logger.debug("Pipeline stage %s failed: %s", stage.name, e)
+            fail(e)
+
+    threads = [threading.Thread(target=produce, name="pipeline-source", daemon=True)]
+    for index, stage in enumerate(stages):
+        workers = max(1, stage.workers)
+        remaining = [workers]
+        lock = threading.Lock()
+        threads.extend(
+            threading.Thread(
+                target=work,
+                args=(index, stage, remaining, lock),
+                name=f"pipeline-{stage.name}-{n}",
+                daemon=True,
+            )
+            for n in range(workers)
+        )
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    if cancel is not None and cancel.is_set():
+        raise Cancelled("Pipeline cancelled")
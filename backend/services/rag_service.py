@@ -5,18 +5,38 @@ Coordinates hybrid search, cross-encoder reranking, context assembly,
 and LLM generation to answer user questions with cited sources.
 """
 
-import json
 import logging
-from openai import OpenAI
-from config import get_settings
+import threading
+from config import get_settings, resolve_data_path
+from services.db import commit_horizon, get_db
 from services.hybrid_search import HybridSearcher
+from services import llm_gateway, vector_store
 from services import reranker as reranker_service
+from services.ingestion import READY
 
 logger = logging.getLogger(__name__)
 
 # Module-level singleton for the hybrid searcher
 _hybrid_searcher: HybridSearcher | None = None
 
+# Position in the documents table up to which the BM25 index is synced
+_SYNC_KEYS = ["updated_at", "id"]
+
+_sync_stop: threading.Event | None = None
+
+NO_RESULTS_ANSWER = (
+    "Es konnten keine relevanten Informationen zu Ihrer Frage "
+    "gefunden werden. Bitte formulieren Sie die Frage um oder "
+    "stellen Sie sicher, dass die entsprechenden Dokumente "
+    "hochgeladen wurden."
+)
+
+UNAVAILABLE_ANSWER = (
+    "Die Wissensdatenbank ist derzeit nicht erreichbar. "
+    "Bitte stellen Sie sicher, dass Qdrant laeuft "
+    "(make infra) und laden Sie Dokumente hoch."
+)
+
 SYSTEM_PROMPT = """\
 Du bist ein hilfreicher Streamworks-Experte und Assistent fuer ein Enterprise-Automatisierungssystem.
 
@@ -40,18 +60,113 @@ def _get_hybrid_searcher() -> HybridSearcher:
     """Return the module-level HybridSearcher singleton."""
     global _hybrid_searcher
     if _hybrid_searcher is None:
-        _hybrid_searcher = HybridSearcher()
+        settings = get_settings()
+        snapshot_path = None
+        if settings.bm25_snapshot_dir:
+            snapshot_dir = resolve_data_path(settings.bm25_snapshot_dir)
+            snapshot_path = snapshot_dir / f"{settings.qdrant_collection}.bm25"
+        _hybrid_searcher = HybridSearcher(
+            snapshot_path=snapshot_path,
+            collection=settings.qdrant_collection,
+            watermark=_sync_watermark,
+        )
     return _hybrid_searcher
 
 
-def mark_index_dirty() -> None:
+def _ready_documents():
+    return get_db().table("documents").select("id, updated_at").eq("status", READY)
+
+
+def _sync_watermark() -> list | None:
+    """Position of the most recently finished document that is settled."""
+    query = _ready_documents().lt("updated_at", commit_horizon())
+    for key in _SYNC_KEYS:
+        query = query.order(key, desc=True)
+    rows = query.limit(1).execute().data
+    return [rows[0][key] for key in _SYNC_KEYS] if rows else None
+
+
+def sync_index(batch_size: int = 100) -> int:
     """
-    Signal that the BM25 index should be rebuilt on the next query.
+    Add documents that finished ingestion since the last sync to the BM25
+    index.
+
+    The API process owns the index: ingestion jobs, wherever they run,
+    only write Qdrant and the document row, and this picks finished
+    documents up by their ``updated_at`` and loads their chunks from
+    Qdrant. Re-ingested documents come back with a newer ``updated_at``
+    and replace their old chunks. Only rows stamped before the oldest open
+    transaction are read, so a document whose job commits late is never
+    passed by the sync position.
 
-    Call this after documents are added or removed.
+    Returns:
+        The number of documents (re-)indexed.
     """
     searcher = _get_hybrid_searcher()
-    searcher.mark_dirty()
+    ready, synced = searcher.sync_position()
+    if not ready:
+        return 0
+    count = 0
+    horizon = commit_horizon()
+    while True:
+        query = _ready_documents().lt("updated_at", horizon)
+        for key in _SYNC_KEYS:
+            query = query.order(key)
+        if synced is not None:
+            query = query.after(synced)
+        rows = query.limit(batch_size).execute().data
+        for row in rows:
+            synced = [row[key] for key in _SYNC_KEYS]
+            chunks = list(vector_store.iter_payloads(document_id=row["id"]))
+            searcher.add_document(row["id"], chunks, synced=synced)
+            count += 1
+        if len(rows) < batch_size:
+            break
+    if count:
+        logger.info("Synced %d finished documents into the BM25 index", count)
+    return count
+
+
+def start_index_sync(interval: float) -> None:
+    """Run ``sync_index`` every ``interval`` seconds in a background thread."""
+    global _sync_stop
+    if interval <= 0 or _sync_stop is not None:
+        return
+    stop = _sync_stop = threading.Event()
+
+    def run() -> None:
+        while not stop.is_set():
+            try:
+                sync_index()
+            except Exception as e:
+                logger.warning("BM25 index sync failed: %s", e)
+            stop.wait(interval)
+
+    threading.Thread(target=run, name="bm25-sync", daemon=True).start()
+
+
+def stop_index_sync() -> None:
+    """Stop the background sync thread."""
+    global _sync_stop
+    if _sync_stop is not None:
+        _sync_stop.set()
+        _sync_stop = None
+
+
+def remove_document_from_index(document_id: str) -> None:
+    """Remove a deleted document's chunks from the BM25 index in place."""
+    _get_hybrid_searcher().remove_document(document_id)
+
+
+def flush_index() -> None:
+    """Write BM25 changes still waiting for the next snapshot write."""
+    if _hybrid_searcher is not None:
+        _hybrid_searcher.flush()
+
+
+def index_stats() -> dict:
+    """Return size and memory statistics of the BM25 index."""
+    return _get_hybrid_searcher().stats()
 
 
 def _build_context_and_sources(
@@ -148,7 +263,18 @@ def _build_messages(
     return messages
 
 
-def query(
+async def _retrieve(question: str) -> list[dict]:
+    """Hybrid search followed by reranking (steps 1 and 2 of the pipeline)."""
+    searcher = _get_hybrid_searcher()
+    raw_results = await searcher.asearch(query=question, limit=15)
+    return await reranker_service.arerank(
+        query=question,
+        results=raw_results,
+        top_k=5,
+    )
+
+
+async def query(
     question: str,
     chat_history: list[dict] | None = None,
 ) -> dict:
@@ -162,6 +288,9 @@ def query(
     4. OpenAI chat completion with the enriched prompt.
     5. Confidence estimation based on retrieval scores.
 
+    All network I/O is async, so concurrent chats on one worker do not
+    block each other.
+
     Args:
         question: The user's question.
         chat_history: Optional list of prior conversation turns,
@@ -172,17 +301,9 @@ def query(
     """
     try:
         settings = get_settings()
-        searcher = _get_hybrid_searcher()
 
-        # 1. Hybrid search
-        raw_results = searcher.search(query=question, limit=15)
-
-        # 2. Rerank
-        reranked = reranker_service.rerank(
-            query=question,
-            results=raw_results,
-            top_k=5,
-        )
+        # 1. + 2. Hybrid search and rerank
+        reranked = await _retrieve(question)
 
         # 3. Build context
         context_str, sources_str, source_list = _build_context_and_sources(reranked)
@@ -190,20 +311,15 @@ def query(
         # 4. LLM generation
         if not reranked:
             return {
-                "answer": (
-                    "Es konnten keine relevanten Informationen zu Ihrer Frage "
-                    "gefunden werden. Bitte formulieren Sie die Frage um oder "
-                    "stellen Sie sicher, dass die entsprechenden Dokumente "
-                    "hochgeladen wurden."
-                ),
+                "answer": NO_RESULTS_ANSWER,
                 "sources": [],
                 "confidence": 0.0,
             }
 
         messages = _build_messages(question, context_str, sources_str, chat_history)
 
-        client = OpenAI(api_key=settings.openai_api_key)
-        completion = client.chat.completions.create(
+        completion = await llm_gateway.achat(
+            "rag.answer",
             model=settings.openai_model,
             messages=messages,
             temperature=0.2,
@@ -222,11 +338,7 @@ def query(
     except (ConnectionError, OSError) as e:
         logger.warning("RAG query failed (service unavailable): %s", e)
         return {
-            "answer": (
-                "Die Wissensdatenbank ist derzeit nicht erreichbar. "
-                "Bitte stellen Sie sicher, dass Qdrant laeuft "
-                "(make infra) und laden Sie Dokumente hoch."
-            ),
+            "answer": UNAVAILABLE_ANSWER,
             "sources": [],
             "confidence": 0.0,
         }
@@ -242,15 +354,12 @@ def query(
         }
 
 
-def query_stream(
+async def query_stream(
     question: str,
     chat_history: list[dict] | None = None,
 ):
     """
-    Stream an answer using Server-Sent Events (SSE).
-
-    Yields SSE-formatted strings that can be returned directly from
-    a FastAPI StreamingResponse.
+    Stream an answer as an async generator of events.
 
     The stream emits three event types:
     - ``chunk``: Incremental answer text tokens.
@@ -262,21 +371,13 @@ def query_stream(
         chat_history: Optional list of prior conversation turns.
 
     Yields:
-        SSE-formatted strings (``data: ...\\n\\n``).
+        Event dicts with ``type`` and ``data``.
     """
     try:
         settings = get_settings()
-        searcher = _get_hybrid_searcher()
-
-        # 1. Hybrid search
-        raw_results = searcher.search(query=question, limit=15)
 
-        # 2. Rerank
-        reranked = reranker_service.rerank(
-            query=question,
-            results=raw_results,
-            top_k=5,
-        )
+        # 1. + 2. Hybrid search and rerank
+        reranked = await _retrieve(question)
 
         # 3. Build context
         context_str, sources_str, source_list = _build_context_and_sources(reranked)
@@ -297,19 +398,14 @@ def query_stream(
         # 4. Streaming LLM generation
         messages = _build_messages(question, context_str, sources_str, chat_history)
 
-        client = OpenAI(api_key=settings.openai_api_key)
-        stream = client.chat.completions.create(
+        async for text in llm_gateway.astream_chat(
+            "rag.stream",
             model=settings.openai_model,
             messages=messages,
             temperature=0.2,
             max_tokens=2048,
-            stream=True,
-        )
-
-        for chunk in stream:
-            delta = chunk.choices[0].delta
-            if delta.content:
-                yield {"type": "chunk", "data": delta.content}
+        ):
+            yield {"type": "chunk", "data": text}
 
         # 5. Done event with confidence
         confidence = _estimate_confidence(reranked)
@@ -317,13 +413,8 @@ def query_stream(
 
     except (ConnectionError, OSError) as e:
         logger.warning("RAG stream failed (service unavailable): %s", e)
-        error_msg = (
-            "Die Wissensdatenbank ist derzeit nicht erreichbar. "
-            "Bitte stellen Sie sicher, dass Qdrant laeuft "
-            "(make infra) und laden Sie Dokumente hoch."
-        )
         yield {"type": "sources", "data": []}
-        yield {"type": "chunk", "data": error_msg}
+        yield {"type": "chunk", "data": UNAVAILABLE_ANSWER}
         yield {"type": "done", "data": 0.0}
     except Exception as e:
         logger.error("RAG stream failed unexpectedly: %s", e)
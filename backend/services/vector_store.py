@@ -5,11 +5,13 @@ Handles embedding generation, chunk upsert, similarity search,
 and collection lifecycle management.
 """
 
+import asyncio
+import hashlib
 import logging
+import threading
 import uuid
 from functools import lru_cache
-from openai import OpenAI
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
     Distance,
     PointStruct,
@@ -17,13 +19,19 @@ from qdrant_client.models import (
     Filter,
     FieldCondition,
     MatchAny,
+    PointIdsList,
+    PayloadSelectorExclude,
 )
 from config import get_settings
+from services import embedding_cache, embedding_scheduler, llm_gateway
 
 logger = logging.getLogger(__name__)
 
 VECTOR_DIM = 3072  # text-embedding-3-large dimensionality
 
+# Namespace for deterministic chunk point ids (never change: ids are stored)
+_POINT_NAMESPACE = uuid.UUID("6f1c2a4e-8d3b-5e7f-9a0c-1b2d3e4f5a6b")
+
 
 @lru_cache
 def get_qdrant_client() -> QdrantClient:
@@ -32,10 +40,11 @@ def get_qdrant_client() -> QdrantClient:
     return QdrantClient(url=settings.qdrant_url)
 
 
-def _get_openai_client() -> OpenAI:
-    """Return an OpenAI client (not cached -- lightweight object)."""
+@lru_cache
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """Return a cached async Qdrant client singleton."""
     settings = get_settings()
-    return OpenAI(api_key=settings.openai_api_key)
+    return AsyncQdrantClient(url=settings.qdrant_url)
 
 
 def ensure_collection() -> None:
@@ -71,6 +80,11 @@ def embed_texts(texts: list[str]) -> list[list[float]]:
     """
     Generate embeddings for a list of texts using OpenAI.
 
+    Vectors are looked up in the persistent embedding cache first; only
+    texts that are not cached (deduplicated) are sent to OpenAI, in
+    token-bounded concurrent batches, and their vectors are added to
+    the cache.
+
     Args:
         texts: The texts to embed.
 
@@ -81,13 +95,73 @@ def embed_texts(texts: list[str]) -> list[list[float]]:
         return []
 
     settings = get_settings()
-    client = _get_openai_client()
+    model = settings.openai_embed_model
+    cache = embedding_cache.get_cache()
+
+    vectors = cache.get_many(model, texts) if cache is not None else {}
+    missing = list(dict.fromkeys(t for t in texts if t not in vectors))
+
+    if missing:
+        # Retries are handled by the scheduler so it can adapt to 429s
+        def embed_batch(batch: list[str]) -> list[list[float]]:
+            return llm_gateway.embed("embeddings", batch, model=model, retries=0)
+
+        fresh = embedding_scheduler.embed_batched(missing, embed_batch)
+        vectors.update(zip(missing, fresh))
+        if cache is not None:
+            cache.put_many(model, missing, fresh)
+
+    return [vectors[text] for text in texts]
+
+
+async def aembed_texts(texts: list[str]) -> list[list[float]]:
+    """
+    Async variant of ``embed_texts`` for the request path.
+
+    The SQLite cache is accessed in a worker thread; uncached texts are
+    embedded with the async gateway client so the event loop is never
+    blocked.
+    """
+    if not texts:
+        return []
+
+    settings = get_settings()
+    model = settings.openai_embed_model
+    cache = embedding_cache.get_cache()
+
+    vectors = await asyncio.to_thread(cache.get_many, model, texts) if cache is not None else {}
+    missing = list(dict.fromkeys(t for t in texts if t not in vectors))
+
+    if missing:
+        async def embed_batch(batch: list[str]) -> list[list[float]]:
+            return await llm_gateway.aembed("embeddings", batch, model=model, retries=0)
+
+        fresh = await embedding_scheduler.aembed_batched(missing, embed_batch)
+        vectors.update(zip(missing, fresh))
+        if cache is not None:
+            await asyncio.to_thread(cache.put_many, model, missing, fresh)
+
+    return [vectors[text] for text in texts]
 
-    response = client.embeddings.create(
-        model=settings.openai_embed_model,
-        input=texts,
-    )
-    return [item.embedding for item in response.data]
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_point_id(document_id: str, chunk_index: int, text: str) -> str:
+    """
+    Deterministic point id for a chunk.
+
+    The same chunk of the same document always maps to the same point,
+    so re-processing a document overwrites instead of duplicating it.
+    """
+    key = f"{document_id}:{chunk_index}:{content_hash(text)}"
+    return str(uuid.uuid5(_POINT_NAMESPACE, key))
+
+
+def _chunk_index(chunk: dict, position: int) -> int:
+    return (chunk.get("metadata") or {}).get("chunk_index", position)
 
 
 def upsert_chunks(document_id: str, chunks: list[dict]) -> None:
@@ -98,9 +172,12 @@ def upsert_chunks(document_id: str, chunks: list[dict]) -> None:
         - text (str): The chunk text content.
         - embedding (list[float]): The precomputed embedding vector.
         - metadata (dict, optional): Additional metadata (page, etc.).
+        - id (str, optional): Point id; derived from document id, chunk
+          index and content hash if omitted.
 
-    A ``document_id`` payload field is added to every point so that
-    chunks can be filtered or deleted by document later.
+    ``document_id`` and ``content_hash`` payload fields are added to
+    every point so that chunks can be filtered, diffed or deleted by
+    document later.
 
     Args:
         document_id: Unique identifier for the source document.
@@ -110,17 +187,21 @@ def upsert_chunks(document_id: str, chunks: list[dict]) -> None:
     client = get_qdrant_client()
 
     points = []
-    for chunk in chunks:
+    for position, chunk in enumerate(chunks):
         payload = {
             "document_id": document_id,
             "text": chunk["text"],
+            "content_hash": content_hash(chunk["text"]),
         }
         if "metadata" in chunk and chunk["metadata"]:
             payload.update(chunk["metadata"])
 
+        point_id = chunk.get("id") or chunk_point_id(
+            document_id, _chunk_index(chunk, position), chunk["text"]
+        )
         points.append(
             PointStruct(
-                id=str(uuid.uuid4()),
+                id=point_id,
                 vector=chunk["embedding"],
                 payload=payload,
             )
@@ -136,6 +217,246 @@ def upsert_chunks(document_id: str, chunks: list[dict]) -> None:
         )
 
 
+def document_points(document_id: str, batch_size: int = 1000) -> dict[str, dict]:
+    """
+    List the points currently stored for a document.
+
+    Args:
+        document_id: The document whose points to list.
+        batch_size: Points per scroll request.
+
+    Returns:
+        A dict mapping point id to its stored payload without the text
+        (``content_hash`` is missing for points written before content
+        hashes were recorded).
+    """
+    settings = get_settings()
+    client = get_qdrant_client()
+    points: dict[str, dict] = {}
+    offset = None
+
+    while True:
+        results, next_offset = client.scroll(
+            collection_name=settings.qdrant_collection,
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(
+                        key="document_id",
+                        match=MatchAny(any=[document_id]),
+                    )
+                ]
+            ),
+            limit=batch_size,
+            offset=offset,
+            with_payload=PayloadSelectorExclude(exclude=["text"]),
+            with_vectors=False,
+        )
+        for point in results:
+            points[str(point.id)] = point.payload or {}
+
+        if next_offset is None:
+            break
+        offset = next_offset
+
+    return points
+
+
+def _retrieve_vectors(point_ids: list[str]) -> dict[str, list[float]]:
+    if not point_ids:
+        return {}
+    settings = get_settings()
+    client = get_qdrant_client()
+    points = client.retrieve(
+        collection_name=settings.qdrant_collection,
+        ids=point_ids,
+        with_payload=False,
+        with_vectors=True,
+    )
+    return {str(point.id): point.vector for point in points if point.vector}
+
+
+def delete_points(point_ids: list[str]) -> None:
+    """
+    Delete specific points by id.
+
+    Args:
+        point_ids: Qdrant point ids to remove.
+    """
+    if not point_ids:
+        return
+    settings = get_settings()
+    client = get_qdrant_client()
+    client.delete(
+        collection_name=settings.qdrant_collection,
+        points_selector=PointIdsList(points=point_ids),
+    )
+
+
+class DocumentSync:
+    """
+    Incrementally make the stored points of a document match a new chunk
+    set that arrives in batches.
+
+    Points are diffed by their deterministic id: chunks whose point
+    already exists are left untouched (unless their metadata changed,
+    e.g. page numbers) and new or changed chunks are upserted. Once
+    every batch has been written, ``finish`` deletes the points that no
+    longer belong to the document; this happens after the upserts, so
+    the document is never empty in between. Vectors of new points are
+    reused from stored points with the same content hash where possible
+    (e.g. chunks that only moved), the rest are embedded.
+
+    ``embed`` and ``upsert`` may be called from several threads.
+    """
+
+    def __init__(self, document_id: str) -> None:
+        self.document_id = document_id
+        self._existing = document_points(document_id)
+        self._by_hash = {
+            payload["content_hash"]: point_id
+            for point_id, payload in self._existing.items()
+            if payload.get("content_hash")
+        }
+        self._lock = threading.Lock()
+        # Only the ids are kept, not the chunks: they decide which stored
+        # points are stale once every batch has been written
+        self._wanted: set[str] = set()
+        self._upserted = 0
+        self._embedded = 0
+
+    def embed(self, chunks: list[dict]) -> list[dict]:
+        """
+        Assign point ids to a batch of chunks and embed the changed ones.
+
+        Args:
+            chunks: Chunk dicts with text and optional metadata
+                (``chunk_index`` defaults to the list position).
+
+        Returns:
+            The new or changed chunks as records with ``id`` and
+            ``embedding``, ready for ``upsert``.
+        """
+        records = []
+        for position, chunk in enumerate(chunks):
+            record = dict(chunk)
+            record["id"] = chunk_point_id(
+                self.document_id, _chunk_index(chunk, position), chunk["text"]
+            )
+            records.append(record)
+        changed = [
+            record for record in records
+            if record["id"] not in self._existing
+            or self._stale(record, self._existing[record["id"]])
+        ]
+
+        # Reuse vectors of stored points with identical content
+        reusable = {
+            record["id"]: self._by_hash[content_hash(record["text"])]
+            for record in changed
+            if content_hash(record["text"]) in self._by_hash
+        }
+        stored = _retrieve_vectors(list(set(reusable.values())))
+        to_embed = []
+        for record in changed:
+            vector = stored.get(reusable.get(record["id"], ""))
+            if vector is not None:
+                record["embedding"] = vector
+            else:
+                to_embed.append(record)
+
+        if to_embed:
+            embeddings = embed_texts([record["text"] for record in to_embed])
+            for record, embedding in zip(to_embed, embeddings):
+                record["embedding"] = embedding
+
+        with self._lock:
+            self._wanted.update(record["id"] for record in records)
+            self._embedded += len(to_embed)
+        return changed
+
+    @staticmethod
+    def _stale(record: dict, payload: dict) -> bool:
+        """True if a stored point's payload lacks or differs in the chunk's metadata."""
+        metadata = record.get("metadata") or {}
+        return any(payload.get(key) != value for key, value in metadata.items())
+
+    def upsert(self, changed: list[dict]) -> None:
+        """Write records returned by ``embed``."""
+        upsert_chunks(self.document_id, changed)
+        with self._lock:
+            self._upserted += len(changed)
+
+    def finish(self) -> dict:
+        """
+        Delete points of chunks that were not seen and report the diff.
+
+        Returns:
+            A dict with the counts ``chunks_count`` (points the document
+            now has), ``upserted``, ``deleted``, ``unchanged`` and
+            ``embedded``.
+        """
+        vanished = [point_id for point_id in self._existing if point_id not in self._wanted]
+        delete_points(vanished)
+
+        unchanged = len(self._wanted) - self._upserted
+        logger.info(
+            "Synced document %s: %d upserted, %d deleted, %d unchanged, %d embedded",
+            self.document_id, self._upserted, len(vanished), unchanged, self._embedded,
+        )
+        return {
+            "chunks_count": len(self._wanted),
+            "upserted": self._upserted,
+            "deleted": len(vanished),
+            "unchanged": unchanged,
+            "embedded": self._embedded,
+        }
+
+
+def sync_document_chunks(document_id: str, chunks: list[dict]) -> dict:
+    """
+    Make the stored points of a document match ``chunks`` in one go.
+
+    See ``DocumentSync`` for the diffing rules.
+
+    Args:
+        document_id: Unique identifier for the source document.
+        chunks: List of chunk dicts with text and optional metadata
+            (``chunk_index`` defaults to the list position).
+
+    Returns:
+        The counts reported by ``DocumentSync.finish``.
+    """
+    sync = DocumentSync(document_id)
+    sync.upsert(sync.embed(chunks))
+    return sync.finish()
+
+
+def _document_filter(filter_doc_ids: list[str] | None) -> Filter | None:
+    if not filter_doc_ids:
+        return None
+    return Filter(
+        must=[
+            FieldCondition(
+                key="document_id",
+                match=MatchAny(any=filter_doc_ids),
+            )
+        ]
+    )
+
+
+def _hits_to_dicts(hits) -> list[dict]:
+    results = []
+    for hit in hits:
+        result = {
+            "id": str(hit.id),
+            "score": hit.score,
+        }
+        if hit.payload:
+            result.update(hit.payload)
+        results.append(result)
+    return results
+
+
 def search(
     query_embedding: list[float],
     limit: int = 10,
@@ -156,35 +477,31 @@ def search(
     settings = get_settings()
     client = get_qdrant_client()
 
-    query_filter = None
-    if filter_doc_ids:
-        query_filter = Filter(
-            must=[
-                FieldCondition(
-                    key="document_id",
-                    match=MatchAny(any=filter_doc_ids),
-                )
-            ]
-        )
-
     hits = client.search(
         collection_name=settings.qdrant_collection,
         query_vector=query_embedding,
         limit=limit,
-        query_filter=query_filter,
+        query_filter=_document_filter(filter_doc_ids),
     )
+    return _hits_to_dicts(hits)
 
-    results = []
-    for hit in hits:
-        result = {
-            "id": str(hit.id),
-            "score": hit.score,
-        }
-        if hit.payload:
-            result.update(hit.payload)
-        results.append(result)
 
-    return results
+async def asearch(
+    query_embedding: list[float],
+    limit: int = 10,
+    filter_doc_ids: list[str] | None = None,
+) -> list[dict]:
+    """Async variant of ``search`` using the async Qdrant client."""
+    settings = get_settings()
+    client = get_async_qdrant_client()
+
+    hits = await client.search(
+        collection_name=settings.qdrant_collection,
+        query_vector=query_embedding,
+        limit=limit,
+        query_filter=_document_filter(filter_doc_ids),
+    )
+    return _hits_to_dicts(hits)
 
 
 def delete_document(document_id: str) -> None:
@@ -211,28 +528,29 @@ def delete_document(document_id: str) -> None:
     logger.info("Deleted all chunks for document %s", document_id)
 
 
-def scroll_all(limit: int = 1000) -> list[dict]:
+def iter_payloads(batch_size: int = 1000, document_id: str | None = None):
     """
-    Scroll through all points in the collection.
+    Yield the payload of every point in the collection, batch by batch.
 
-    Useful for building external indexes (e.g. BM25).
+    Unlike ``scroll_all`` this never holds more than one scroll page in
+    memory, which matters when feeding an external index (e.g. BM25).
 
     Args:
-        limit: Batch size per scroll request.
+        batch_size: Points per scroll request.
+        document_id: Only yield the points of this document.
 
-    Returns:
-        A flat list of payload dicts from every point.
+    Yields:
+        Payload dicts with the point id under ``id``.
     """
     settings = get_settings()
     client = get_qdrant_client()
-
-    all_payloads: list[dict] = []
     offset = None
 
     while True:
         results, next_offset = client.scroll(
             collection_name=settings.qdrant_collection,
-            limit=limit,
+            scroll_filter=_document_filter([document_id] if document_id else None),
+            limit=batch_size,
             offset=offset,
             with_payload=True,
             with_vectors=False,
@@ -241,10 +559,50 @@ def scroll_all(limit: int = 1000) -> list[dict]:
             if point.payload:
                 entry = {"id": str(point.id)}
                 entry.update(point.payload)
-                all_payloads.append(entry)
+                yield entry
 
         if next_offset is None:
             break
         offset = next_offset
 
-    return all_payloads
+
+def retrieve(point_ids: list[str]) -> list[dict]:
+    """
+    Fetch the payloads of specific points by id.
+
+    Args:
+        point_ids: Qdrant point ids.
+
+    Returns:
+        Payload dicts (with ``id``) for the points that exist.
+    """
+    if not point_ids:
+        return []
+
+    settings = get_settings()
+    client = get_qdrant_client()
+    points = client.retrieve(
+        collection_name=settings.qdrant_collection,
+        ids=point_ids,
+        with_payload=True,
+        with_vectors=False,
+    )
+    results = []
+    for point in points:
+        entry = {"id": str(point.id)}
+        entry.update(point.payload or {})
+        results.append(entry)
+    return results
+
+
+def scroll_all(limit: int = 1000) -> list[dict]:
+    """
+    Scroll through all points in the collection.
+
+    Args:
+        limit: Batch size per scroll request.
+
+    Returns:
+        A flat list of payload dicts from every point.
+    """
+    return list(iter_payloads(batch_size=limit))
@@ -8,6 +8,9 @@ os.environ.pop("DATABASE_URL", None)
 os.environ.pop("SUPABASE_URL", None)
 os.environ.pop("SUPABASE_KEY", None)
 os.environ["OPENAI_API_KEY"] = "sk-test-fake-key"
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["BM25_SNAPSHOT_DIR"] = ""
+os.environ["BM25_SYNC_INTERVAL"] = "0"
 
 from config import get_settings, Settings
 from services.db import _MemStore
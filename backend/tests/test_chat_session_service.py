@@ -1,16 +1,18 @@
 """Tests for chat session service."""
 
+import asyncio
+
 import services.db as db_mod
 from services.db import _MemStore
 from services import chat_session_service
 
 
 def _with_fresh_db(fn):
-    """Run fn with a fresh in-memory DB."""
+    """Run the coroutine function fn with a fresh in-memory DB."""
     original = db_mod._store
     db_mod._store = _MemStore(persist=False)
     try:
-        return fn()
+        return asyncio.run(fn())
     finally:
         # Restore to None so get_db() re-initializes next time
         db_mod._store = None
@@ -18,87 +20,115 @@ def _with_fresh_db(fn):
 
 class TestChatSessionCRUD:
     def test_create_session(self):
-        def run():
-            session = chat_session_service.create_session("Test Chat")
+        async def run():
+            session = await chat_session_service.create_session("Test Chat")
             assert session["title"] == "Test Chat"
             assert "id" in session
             return session
         _with_fresh_db(run)
 
     def test_list_sessions(self):
-        def run():
-            chat_session_service.create_session("Chat 1")
-            chat_session_service.create_session("Chat 2")
-            sessions = chat_session_service.list_sessions()
+        async def run():
+            await chat_session_service.create_session("Chat 1")
+            await chat_session_service.create_session("Chat 2")
+            sessions = await chat_session_service.list_sessions()
             assert len(sessions) == 2
         _with_fresh_db(run)
 
     def test_get_session(self):
-        def run():
-            created = chat_session_service.create_session("Get Me")
-            fetched = chat_session_service.get_session(created["id"])
+        async def run():
+            created = await chat_session_service.create_session("Get Me")
+            fetched = await chat_session_service.get_session(created["id"])
             assert fetched is not None
             assert fetched["title"] == "Get Me"
         _with_fresh_db(run)
 
     def test_get_missing_session(self):
-        def run():
-            result = chat_session_service.get_session("nonexistent")
+        async def run():
+            result = await chat_session_service.get_session("nonexistent")
             assert result is None
         _with_fresh_db(run)
 
     def test_delete_session(self):
-        def run():
-            created = chat_session_service.create_session("Delete Me")
-            chat_session_service.delete_session(created["id"])
-            assert chat_session_service.get_session(created["id"]) is None
+        async def run():
+            created = await chat_session_service.create_session("Delete Me")
+            await chat_session_service.delete_session(created["id"])
+            assert await chat_session_service.get_session(created["id"]) is None
         _with_fresh_db(run)
 
     def test_update_session_title(self):
-        def run():
-            created = chat_session_service.create_session("Old Title")
-            updated = chat_session_service.update_session_title(created["id"], "New Title")
+        async def run():
+            created = await chat_session_service.create_session("Old Title")
+            updated = await chat_session_service.update_session_title(created["id"], "New Title")
             assert updated is not None
             assert updated["title"] == "New Title"
         _with_fresh_db(run)
 
     def test_update_session_title_missing_returns_none(self):
-        def run():
-            result = chat_session_service.update_session_title("nonexistent", "Title")
+        async def run():
+            result = await chat_session_service.update_session_title("nonexistent", "Title")
             assert result is None
         _with_fresh_db(run)
 
 
 class TestChatMessages:
     def test_add_and_get_messages(self):
-        def run():
-            session = chat_session_service.create_session()
-            chat_session_service.add_message(session["id"], "user", "Hello")
-            chat_session_service.add_message(session["id"], "assistant", "Hi there")
+        async def run():
+            session = await chat_session_service.create_session()
+            await chat_session_service.add_message(session["id"], "user", "Hello")
+            await chat_session_service.add_message(session["id"], "assistant", "Hi there")
 
-            messages = chat_session_service.get_messages(session["id"])
+            messages = await chat_session_service.get_messages(session["id"])
             assert len(messages) == 2
             assert messages[0]["role"] == "user"
             assert messages[1]["role"] == "assistant"
         _with_fresh_db(run)
 
     def test_chat_history_limit(self):
-        def run():
-            session = chat_session_service.create_session()
+        async def run():
+            session = await chat_session_service.create_session()
             for i in range(20):
-                chat_session_service.add_message(session["id"], "user", f"msg {i}")
+                await chat_session_service.add_message(session["id"], "user", f"msg {i}")
 
-            history = chat_session_service.get_chat_history(session["id"], limit=5)
+            history = await chat_session_service.get_chat_history(session["id"], limit=5)
             assert len(history) == 5
         _with_fresh_db(run)
 
+    def test_chat_history_keeps_the_latest_in_order(self):
+        async def run():
+            session = await chat_session_service.create_session()
+            for i in range(8):
+                await chat_session_service.add_message(session["id"], "user", f"msg {i}")
+
+            history = await chat_session_service.get_chat_history(session["id"], limit=3)
+            assert [m["content"] for m in history] == ["msg 5", "msg 6", "msg 7"]
+        _with_fresh_db(run)
+
     def test_chat_history_format(self):
-        def run():
-            session = chat_session_service.create_session()
-            chat_session_service.add_message(session["id"], "user", "Question")
-            chat_session_service.add_message(session["id"], "assistant", "Answer")
+        async def run():
+            session = await chat_session_service.create_session()
+            await chat_session_service.add_message(session["id"], "user", "Question")
+            await chat_session_service.add_message(session["id"], "assistant", "Answer")
 
-            history = chat_session_service.get_chat_history(session["id"])
+            history = await chat_session_service.get_chat_history(session["id"])
             assert history[0] == {"role": "user", "content": "Question"}
             assert history[1] == {"role": "assistant", "content": "Answer"}
         _with_fresh_db(run)
+
+    def test_messages_page_through_the_session(self):
+        async def run():
+            session = await chat_session_service.create_session()
+            for i in range(7):
+                await chat_session_service.add_message(session["id"], "user", f"msg {i}")
+
+            seen, cursor = [], None
+            while True:
+                page, cursor = await chat_session_service.get_messages_page(
+                    session["id"], 3, cursor
+                )
+                assert len(page) <= 3
+                seen.extend(m["content"] for m in page)
+                if cursor is None:
+                    break
+            assert sorted(seen) == sorted(f"msg {i}" for i in range(7))
+        _with_fresh_db(run)
@@ -1,6 +1,27 @@
-"""Tests for the in-memory database fallback store."""
+"""Tests for the in-memory database fallback store and the connection pool."""
 
-from services.db import _MemStore, _MemResult
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+
+from services.db import (
+    _AsyncStore,
+    _ConnectionPool,
+    _MemStore,
+    _MemResult,
+    _PgStore,
+    _PgTable,
+    _numbered,
+    PoolTimeout,
+    commit_horizon,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+    page_result,
+)
 
 
 class TestMemStoreInsertSelect:
@@ -103,6 +124,122 @@ class TestMemStoreSingleOrderLimit:
         assert result.data[1]["id"] == "c"
 
 
+class TestMemStoreBulk:
+    def test_insert_many_and_filter_in(self, fresh_memstore):
+        rows = [{"id": f"s{i}", "data": {}} for i in range(4)]
+        result = fresh_memstore.table("sessions").insert(rows).execute()
+        assert len(result.data) == 4
+
+        found = fresh_memstore.table("sessions").select("*").in_("id", ["s1", "s3", "x"]).execute()
+        assert sorted(r["id"] for r in found.data) == ["s1", "s3"]
+
+    def test_update_and_delete_with_in_filter(self, fresh_memstore):
+        fresh_memstore.table("sessions").insert([{"id": f"s{i}", "n": 0} for i in range(3)]).execute()
+
+        updated = fresh_memstore.table("sessions").update({"n": 1}).in_("id", ["s0", "s1"]).execute()
+        deleted = fresh_memstore.table("sessions").delete().in_("id", ["s1", "s2"]).execute()
+
+        assert len(updated.data) == 2
+        assert len(deleted.data) == 2
+        assert fresh_memstore.table("sessions").select("*").execute().data == [updated.data[0]]
+
+    def test_upsert_updates_existing_and_inserts_new(self, fresh_memstore):
+        fresh_memstore.table("sessions").insert({"id": "s1", "key": "a", "n": 0}).execute()
+
+        result = fresh_memstore.table("sessions").upsert(
+            [{"key": "a", "n": 1}, {"key": "b", "n": 2}], on_conflict="key"
+        ).execute()
+
+        assert len(result.data) == 2
+        rows = {r["key"]: r for r in fresh_memstore.table("sessions").select("*").execute().data}
+        assert rows["a"]["id"] == "s1"
+        assert rows["a"]["n"] == 1
+        assert rows["b"]["n"] == 2
+
+    def test_upsert_keeps_existing_id(self, fresh_memstore):
+        fresh_memstore.table("sessions").insert({"id": "s1", "key": "a", "n": 0}).execute()
+
+        fresh_memstore.table("sessions").upsert(
+            {"id": "neu", "key": "a", "n": 1}, on_conflict="key"
+        ).execute()
+
+        rows = fresh_memstore.table("sessions").select("*").execute().data
+        assert [(r["id"], r["n"]) for r in rows] == [("s1", 1)]
+
+
+class TestMemStoreAggregates:
+    def test_count_and_group_by(self, fresh_memstore):
+        fresh_memstore.table("documents").insert([
+            {"folder_id": "f1"}, {"folder_id": "f1"}, {"folder_id": "f2"}, {"folder_id": None},
+        ]).execute()
+
+        assert fresh_memstore.table("documents").count().execute().data == 4
+        assert fresh_memstore.table("documents").count().eq("folder_id", "f1").execute().data == 2
+        groups = fresh_memstore.table("documents").group_by("folder_id").count().execute().data
+        assert {g["folder_id"]: g["count"] for g in groups} == {"f1": 2, "f2": 1, None: 1}
+        # Grouping is kept in whatever order the calls come, as in SQL
+        groups = fresh_memstore.table("documents").count().group_by("folder_id").execute().data
+        assert {g["folder_id"]: g["count"] for g in groups} == {"f1": 2, "f2": 1, None: 1}
+
+    def test_order_by_column_with_nulls(self, fresh_memstore):
+        fresh_memstore.table("documents").insert([
+            {"id": "a", "folder_id": "f2"}, {"id": "b", "folder_id": None}, {"id": "c", "folder_id": "f1"},
+        ]).execute()
+
+        table = fresh_memstore.table("documents")
+        asc = table.select("id").order("folder_id").execute().data
+        desc = table.select("id").order("folder_id", desc=True).execute().data
+        assert [r["id"] for r in asc] == ["c", "a", "b"]
+        assert [r["id"] for r in desc] == ["b", "a", "c"]
+
+
+class TestMemStoreKeyset:
+    def _rows(self, store):
+        store.table("documents").insert([
+            {"id": f"d{n}", "filename": f"{n}.txt", "created_at": f"2024-01-0{n // 2 + 1}"}
+            for n in range(5)
+        ]).execute()
+
+    def test_pages_follow_each_other_without_gaps(self, fresh_memstore):
+        self._rows(fresh_memstore)
+        keys = ["created_at", "id"]
+        seen, cursor = [], None
+        while True:
+            query = keyset_page(
+                fresh_memstore.table("documents").select("id, created_at"), keys, 2, cursor, desc=True
+            )
+            rows, cursor = page_result(query.execute().data, keys, 2)
+            seen.extend(r["id"] for r in rows)
+            if cursor is None:
+                break
+        # Equal timestamps are ordered by the id tie-breaker
+        assert seen == ["d4", "d3", "d2", "d1", "d0"]
+
+    def test_select_projects_columns(self, fresh_memstore):
+        self._rows(fresh_memstore)
+        rows = fresh_memstore.table("documents").select("id, filename").eq("id", "d1").execute().data
+        assert rows == [{"id": "d1", "filename": "1.txt"}]
+
+    def test_gt_and_lt_filters(self, fresh_memstore):
+        self._rows(fresh_memstore)
+        rows = (
+            fresh_memstore.table("documents").select("id")
+            .gt("created_at", "2024-01-01").lt("created_at", "2024-01-03")
+            .order("id").execute().data
+        )
+        assert [r["id"] for r in rows] == ["d2", "d3"]
+
+    def test_malformed_cursor_is_rejected(self, fresh_memstore):
+        with pytest.raises(ValueError):
+            decode_cursor("not a cursor")
+        query = fresh_memstore.table("documents").select("id")
+        with pytest.raises(ValueError):
+            keyset_page(query, ["created_at", "id"], 2, "WyJhIl0=")  # one value, two keys
+        wrong_types = encode_cursor({"created_at": {}, "id": None}, ["created_at", "id"])
+        with pytest.raises(ValueError):
+            keyset_page(query, ["created_at", "id"], 2, wrong_types)
+
+
 class TestSeedData:
     def test_dropdown_options_seeded(self, fresh_memstore):
         result = fresh_memstore.table("dropdown_options").select("*").execute()
@@ -116,3 +253,290 @@ class TestSeedData:
             .execute()
         )
         assert len(result.data) == 5
+
+
+class _FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.status = 0  # TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.broken = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = 0
+
+    def cursor(self):
+        conn = self
+
+        class _Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if conn.broken:
+                    raise RuntimeError("server closed the connection")
+
+        return _Cursor()
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def conns():
+    return []
+
+
+def _pool(conns, **kwargs):
+    def connect():
+        conns.append(_FakeConn())
+        return conns[-1]
+    return _ConnectionPool(connect, **kwargs)
+
+
+class TestConnectionPool:
+    def test_opens_minconn_and_reuses_connections(self, conns):
+        pool = _pool(conns, minconn=2, maxconn=4)
+        assert len(conns) == 2
+
+        conn = pool.getconn()
+        pool.putconn(conn)
+        assert pool.getconn() is conn
+        assert pool.stats()["in_use"] == 1
+        assert pool.stats()["idle"] == 1
+
+    def test_exhausted_pool_times_out(self, conns):
+        pool = _pool(conns, minconn=0, maxconn=1, timeout=0.05)
+        pool.getconn()
+        with pytest.raises(PoolTimeout):
+            pool.getconn()
+        assert pool.stats()["timeouts"] == 1
+
+    def test_waiter_gets_returned_connection(self, conns):
+        pool = _pool(conns, minconn=0, maxconn=1, timeout=5)
+        conn = pool.getconn()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+        waiter.start()
+        threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+        waiter.join(5)
+        assert got == [conn]
+        assert pool.stats()["wait_seconds_max"] > 0
+
+    def test_open_transaction_is_rolled_back_on_return(self, conns):
+        pool = _pool(conns, minconn=0, maxconn=1)
+        conn = pool.getconn()
+        conn.status = 2  # TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        assert conn.rollbacks == 1
+        assert pool.getconn() is conn
+
+    def test_closed_and_broken_connections_are_replaced(self, conns):
+        pool = _pool(conns, minconn=0, maxconn=1, check_idle=0)
+        conn = pool.getconn()
+        conn.closed = 1
+        pool.putconn(conn)
+        assert pool.stats()["open"] == 0
+
+        second = pool.getconn()
+        pool.putconn(second)
+        second.broken = True
+        third = pool.getconn()
+        assert third is not second
+        assert second.closed
+        assert pool.stats()["open"] == 1
+        assert pool.stats()["discarded"] == 2
+
+    def test_concurrent_checkouts_never_exceed_max(self, conns):
+        pool = _pool(conns, minconn=0, maxconn=3, timeout=5)
+        peak = []
+
+        def worker():
+            for _ in range(50):
+                conn = pool.getconn()
+                peak.append(pool.stats()["in_use"])
+                pool.putconn(conn)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert max(peak) <= 3
+        assert len(conns) <= 3
+        assert pool.stats()["in_use"] == 0
+
+
+class TestPgStatements:
+    def test_select_statement(self):
+        sql, values = (
+            _PgTable("documents", None)
+            .select("*")
+            .eq("folder_id", "f1")
+            .eq("error", None)
+            .order("created_at", desc=True)
+            .limit(5)
+            ._statement()
+        )
+        assert sql == (
+            'SELECT * FROM "documents" WHERE "folder_id" = %s AND "error" IS NULL'
+            ' ORDER BY "created_at" DESC LIMIT 5'
+        )
+        assert values == ["f1"]
+
+    def test_update_statement_numbered_for_asyncpg(self):
+        sql, values = (
+            _PgTable("documents", None)
+            .update({"chunks": 3, "updated_at": "now()", "status": "ready"})
+            .eq("id", "d1")
+            ._statement()
+        )
+        assert _numbered(sql) == (
+            'UPDATE "documents" SET "chunks" = $1, "updated_at" = NOW(), "status" = $2'
+            ' WHERE "id" = $3 RETURNING *'
+        )
+        assert values == [3, "ready", "d1"]
+
+
+class TestPgBulkStatements:
+    def test_multi_row_insert_is_one_statement(self):
+        sql, values = _PgTable("documents", None).insert([
+            {"id": "a", "filename": "a.txt", "chunks": 1},
+            {"id": "b", "filename": "b.txt", "updated_at": "now()"},
+        ])._statement()
+        assert sql == (
+            'INSERT INTO "documents" ("id", "filename", "chunks", "updated_at") VALUES '
+            "(%s, %s, %s, DEFAULT), (%s, %s, DEFAULT, NOW()) RETURNING *"
+        )
+        assert values == ["a", "a.txt", 1, "b", "b.txt"]
+
+    def test_upsert_keeps_existing_id(self):
+        sql, _ = _PgTable("ingest_jobs", None).upsert(
+            {"document_id": "d1", "status": "queued"}, on_conflict="document_id"
+        )._statement()
+        assert sql.endswith(
+            'ON CONFLICT ("document_id") DO UPDATE SET "status" = EXCLUDED."status" RETURNING *'
+        )
+
+    def test_in_filter_mutations(self):
+        sql, values = (
+            _PgTable("documents", None).update({"folder_id": None}).in_("id", ["a", "b"])._statement()
+        )
+        assert sql == 'UPDATE "documents" SET "folder_id" = %s WHERE "id" IN (%s, %s) RETURNING *'
+        assert values == [None, "a", "b"]
+
+        sql, values = _PgTable("documents", None).delete().in_("id", [])._statement()
+        assert sql == 'DELETE FROM "documents" WHERE FALSE RETURNING *'
+
+    def test_empty_insert_runs_nothing(self):
+        assert _PgTable("documents", None).insert([])._statement() is None
+
+
+class TestPgAggregateStatements:
+    def test_count(self):
+        sql, values = _PgTable("documents", None).count().eq("folder_id", "f1")._statement()
+        assert sql == 'SELECT COUNT(*) AS "count" FROM "documents" WHERE "folder_id" = %s'
+        assert values == ["f1"]
+        assert _PgTable("documents", None).count()._result([{"count": 7}]).data == 7
+
+    def test_group_by_count(self):
+        sql, _ = _PgTable("documents", None).group_by("folder_id").count()._statement()
+        assert sql == (
+            'SELECT "folder_id", COUNT(*) AS "count" FROM "documents" GROUP BY "folder_id"'
+        )
+
+
+class TestPgKeysetStatements:
+    def test_after_compares_order_keys_as_a_row(self):
+        sql, values = (
+            _PgTable("chat_sessions", None)
+            .select("id, title")
+            .order("updated_at", desc=True)
+            .order("id", desc=True)
+            .after(["2024-01-01T00:00:00+00:00", "s1"])
+            .limit(3)
+            ._statement()
+        )
+        assert sql == (
+            'SELECT id, title FROM "chat_sessions" WHERE ("updated_at", "id") < (%s, %s)'
+            ' ORDER BY "updated_at" DESC, "id" DESC LIMIT 3'
+        )
+        assert values == ["2024-01-01T00:00:00+00:00", "s1"]
+
+    def test_after_needs_one_value_per_order_key(self):
+        with pytest.raises(ValueError):
+            _PgTable("documents", None).order("created_at").after(["x", "y"])._statement()
+
+    def test_values_postgres_rejects_are_an_invalid_cursor(self):
+        pool = MagicMock()
+        cur = pool.getconn.return_value.cursor.return_value.__enter__.return_value
+        cur.execute.side_effect = psycopg2.DataError("invalid input syntax for type uuid")
+        query = _PgTable("documents", pool).select("id, created_at").order("created_at").order("id")
+        with pytest.raises(ValueError):
+            query.after(["2024-01-01T00:00:00+00:00", "kein-uuid"]).execute()
+
+        query = _PgTable("documents", pool).select("id").eq("id", "kein-uuid")
+        with pytest.raises(psycopg2.DataError):
+            query.execute()
+
+
+class TestCommitHorizon:
+    def test_memstore_horizon_is_now(self, fresh_memstore):
+        from datetime import datetime
+
+        with patch("services.db.get_db", return_value=fresh_memstore):
+            horizon = datetime.fromisoformat(commit_horizon())
+        assert abs((datetime.now(horizon.tzinfo) - horizon).total_seconds()) < 5
+
+    def test_pg_horizon_is_oldest_open_transaction(self):
+        from contextlib import contextmanager
+        from datetime import datetime, timezone
+
+        started = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        conn = MagicMock()
+        cur = conn.cursor.return_value.__enter__.return_value
+        cur.fetchone.return_value = (started,)
+
+        @contextmanager
+        def fake_connection():
+            yield conn
+
+        with patch("services.db.get_db", return_value=_PgStore(None)), \
+                patch("services.db.pg_connection", fake_connection):
+            assert commit_horizon() == "2024-01-01T12:00:00+00:00"
+        assert "pg_stat_activity" in cur.execute.call_args[0][0]
+
+
+class TestAsyncStore:
+    def test_shares_rows_with_sync_store(self, fresh_memstore):
+        adb = _AsyncStore(fresh_memstore, offload=False)
+
+        async def run():
+            await adb.table("sessions").insert({"id": "s1", "data": {}}).execute()
+            return await adb.table("sessions").select("*").eq("id", "s1").single().execute()
+
+        assert asyncio.run(run()).data["id"] == "s1"
+        assert fresh_memstore.table("sessions").select("*").execute().data[0]["id"] == "s1"
+
+    def test_blocking_store_runs_in_thread(self, fresh_memstore):
+        adb = _AsyncStore(fresh_memstore, offload=True)
+        seen = []
+        original = type(fresh_memstore.table("x")).execute
+
+        def execute(query):
+            seen.append(threading.current_thread())
+            return original(query)
+
+        async def run():
+            return await adb.table("sessions").select("*").execute()
+
+        with patch("services.db._MemTable.execute", execute):
+            asyncio.run(run())
+        assert seen and seen[0] is not threading.main_thread()
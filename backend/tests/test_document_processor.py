@@ -2,7 +2,20 @@
 
 from unittest.mock import patch, MagicMock
 
-from services.document_processor import _parse_file, _chunk_text, process_document
+import pytest
+
+from services.document_processor import (
+    _parse_file,
+    _chunk_text,
+    _Segment,
+    _iter_chunk_batches,
+    _iter_chunks,
+    _iter_segments,
+    _iter_workbook_chunks,
+    _split_paragraphs,
+    _stream_paragraphs,
+    ingest_document,
+)
 
 
 class TestParseFile:
@@ -49,39 +62,266 @@ class TestChunkText:
     def test_whitespace_only_returns_empty(self):
         assert _chunk_text("  \n\n  \n  ") == []
 
+    def test_long_unbroken_text_is_cut_with_overlap(self):
+        text = "x" * 100_000
+        chunks = _chunk_text(text, chunk_size=800, overlap=200)
+        assert all(len(c) <= 800 for c in chunks)
+        assert len(chunks) == pytest.approx(100_000 / 600, abs=2)
+
+    def test_long_paragraph_cut_at_sentences_with_exact_offsets(self):
+        text = "Satz eins ist hier. " * 50
+        paragraphs = _split_paragraphs(text, 200)
+        chunks = list(_iter_chunks(paragraphs, 200, 50))
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.text) <= 200
+            assert chunk.text.endswith(".")
+            assert text[chunk.char_start:chunk.char_end] == chunk.text
+        # Consecutive chunks overlap
+        assert chunks[1].char_start < chunks[0].char_end
+
+    def test_token_sized_chunks(self):
+        from services.embedding_scheduler import count_tokens
+
+        text = "\n\n".join(f"Job {i} wurde erfolgreich beendet." for i in range(500))
+        chunks = _chunk_text(text, chunk_size=100, overlap=20, unit="tokens")
+        assert len(chunks) > 1
+        assert all(count_tokens(c) <= 100 for c in chunks)
+
+    def test_unknown_unit_raises(self):
+        with pytest.raises(ValueError):
+            _chunk_text("Text", unit="words")
+
+
+class TestStreamingChunks:
+    def test_segments_chunk_like_joined_text(self):
+        pages = [
+            _Segment(1, "Seite eins. " * 40),
+            _Segment(2, "Kapitel\n\n" + "Seite zwei. " * 90),
+            _Segment(4, "Kurz."),
+        ]
+        streamed = [c.text for c in _iter_chunks(_stream_paragraphs(pages, 200), 200, 50)]
+        joined = "\n\n".join(p.text for p in pages)
+        assert streamed == _chunk_text(joined, chunk_size=200, overlap=50)
+
+    def test_single_segment_uses_line_fallback(self):
+        text = "\n".join(f"Zeile {i}" for i in range(100))
+        streamed = [
+            c.text for c in _iter_chunks(_stream_paragraphs([_Segment(None, text)], 200), 200, 50)
+        ]
+        assert streamed == _chunk_text(text, chunk_size=200, overlap=50)
+
+    def test_chunks_carry_pages_and_offsets(self):
+        pages = [
+            _Segment(1, "Erste Seite. " * 30),
+            _Segment(2, "Zweite Seite. " * 30),
+            _Segment(3, "Dritte Seite. " * 30),
+        ]
+        joined = "\n\n".join(p.text for p in pages)
+        chunks = list(_iter_chunks(_stream_paragraphs(pages, 500), 500, 100))
+
+        assert chunks[0].page_start == 1
+        assert chunks[-1].page_end == 3
+        # Overlapping chunks span the page they borrow from
+        assert any(c.page_start < c.page_end for c in chunks)
+        for chunk in chunks:
+            assert joined[chunk.char_start:chunk.char_end].startswith(chunk.text[:20])
+            assert joined[chunk.char_start:chunk.char_end].endswith(chunk.text[-20:])
+
+
+class TestPageNumbers:
+    def test_pdf_pages(self):
+        import fitz
+
+        pdf = fitz.open()
+        for n in range(3):
+            page = pdf.new_page()
+            page.insert_text((72, 72), f"Inhalt der Seite {n + 1}")
+        data = pdf.tobytes()
+
+        batches = list(_iter_chunk_batches("manual.pdf", data, "application/pdf", 10))
+        chunk = batches[0][0]
+        assert chunk["metadata"]["page"] == 1
+        assert chunk["metadata"]["page_end"] == 3
+        assert "Inhalt der Seite 3" in chunk["text"]
+
+    def test_docx_sections_follow_headings_and_page_breaks(self):
+        import io
+        from docx import Document
+
+        doc = Document()
+        doc.add_heading("Einleitung", level=1)
+        doc.add_paragraph("Text auf Seite eins.")
+        doc.add_page_break()
+        doc.add_paragraph("Text auf Seite zwei.")
+        doc.add_heading("Anhang", level=1)
+        doc.add_paragraph("Noch Seite zwei.")
+        buf = io.BytesIO()
+        doc.save(buf)
+        data = buf.getvalue()
+        content_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+        segments = list(_iter_segments("doc.docx", data, content_type))
+        assert [s.page for s in segments] == [1, 2, 2]
+        assert segments[2].text.startswith("Anhang")
+        assert _parse_file("doc.docx", data, content_type) == "\n\n".join(s.text for s in segments)
+
+    def test_files_are_read_from_a_path(self, tmp_path):
+        path = tmp_path / "notes.txt"
+        path.write_bytes(b"Hallo Welt")
+        batches = list(_iter_chunk_batches("notes.txt", str(path), "text/plain", 10))
+        assert batches[0][0]["text"] == "Hallo Welt"
+
+    def test_text_files_have_no_pages(self):
+        batches = list(_iter_chunk_batches("notes.txt", b"Hallo Welt", "text/plain", 10))
+        metadata = batches[0][0]["metadata"]
+        assert metadata["page"] is None
+        assert (metadata["char_start"], metadata["char_end"]) == (0, len("Hallo Welt"))
+
+
+def _xlsx(sheets: dict[str, list[tuple]]) -> bytes:
+    import io
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+class TestSpreadsheetChunks:
+    def test_row_groups_repeat_sheet_and_header(self, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "xlsx_chunk_rows", 2)
+        data = _xlsx({
+            "Jobs": [("Name", "Agent"), ("J1", "A1"), ("J2", "A2"), ("J3", "A3")],
+            "Leer": [],
+        })
+
+        chunks = list(_iter_workbook_chunks(data))
+
+        assert [(c.sheet, c.row_start, c.row_end) for c in chunks] == [
+            ("Jobs", 2, 3), ("Jobs", 4, 4),
+        ]
+        assert chunks[0].text == "--- Sheet: Jobs ---\nName | Agent\nJ1 | A1\nJ2 | A2"
+        assert chunks[1].text == "--- Sheet: Jobs ---\nName | Agent\nJ3 | A3"
+
+    def test_rows_are_capped_by_size_and_never_mix_sheets(self, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "chunk_size", 60)
+        data = _xlsx({
+            "A": [("Spalte",)] + [(f"Wert {i}",) for i in range(10)],
+            "B": [(None, None), ("Kopf", None), ("x", None)],
+        })
+
+        chunks = list(_iter_workbook_chunks(data))
+
+        assert all(len(c.text) <= 60 for c in chunks if c.row_start != c.row_end)
+        assert {c.sheet for c in chunks} == {"A", "B"}
+        rows_a = [r for c in chunks if c.sheet == "A" for r in range(c.row_start, c.row_end + 1)]
+        assert rows_a == list(range(2, 12))
+        # First non-empty row is the header, trailing empty cells are dropped
+        assert chunks[-1].text == "--- Sheet: B ---\nKopf\nx"
+        assert (chunks[-1].row_start, chunks[-1].row_end) == (3, 3)
+
+    def test_header_only_sheet_keeps_its_column_names(self):
+        data = _xlsx({
+            "Vorlage": [(None,), ("Name", "Agent", "Zeitplan")],
+            "Leer": [],
+        })
+
+        chunks = list(_iter_workbook_chunks(data))
+
+        assert [(c.sheet, c.row_start, c.row_end) for c in chunks] == [("Vorlage", 2, 2)]
+        assert chunks[0].text == "--- Sheet: Vorlage ---\nName | Agent | Zeitplan"
+
+    def test_batches_carry_sheet_and_rows(self, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "parse_workers", 0)
+        data = _xlsx({"Jobs": [("Name",), ("J1",)]})
+        mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        batches = list(_iter_chunk_batches("jobs.xlsx", data, mime, 10))
+
+        metadata = batches[0][0]["metadata"]
+        assert metadata["page"] is None
+        assert (metadata["sheet"], metadata["row_start"], metadata["row_end"]) == ("Jobs", 2, 2)
+
+
+class _FakeSync:
+    """Stands in for vector_store.DocumentSync: every chunk is new."""
+
+    instances: list["_FakeSync"] = []
+
+    def __init__(self, document_id):
+        self.document_id = document_id
+        self.embedded: list[dict] = []
+        self.upserted: list[dict] = []
+        _FakeSync.instances.append(self)
+
+    def embed(self, chunks):
+        records = [{**c, "id": f"p{c['metadata']['chunk_index']}"} for c in chunks]
+        self.embedded.extend(records)
+        return records
+
+    def upsert(self, changed):
+        self.upserted.extend(changed)
+
+    def finish(self):
+        return {
+            "chunks_count": len(self.embedded),
+            "upserted": len(self.upserted),
+            "deleted": 0,
+            "unchanged": 0,
+            "embedded": len(self.embedded),
+        }
+
+
+@pytest.fixture
+def mock_vs():
+    _FakeSync.instances.clear()
+    with patch("services.document_processor.vector_store") as mock_vs:
+        mock_vs.DocumentSync.side_effect = _FakeSync
+        yield mock_vs
+
+
+class TestIngestPipeline:
+    def test_large_document_flows_in_batches(self, mock_vs, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "ingest_batch_chunks", 3)
+        text = "\n\n".join(f"Absatz {i}. " * 60 for i in range(20)).encode()
+        progress = []
+
+        result = ingest_document(
+            "doc-1", "big.txt", text, "text/plain",
+            on_progress=lambda stage, percent: progress.append(percent),
+        )
+
+        assert result["chunks_count"] > 3
+        upserted = _FakeSync.instances[0].upserted
+        assert sorted(c["metadata"]["chunk_index"] for c in upserted) == list(range(result["chunks_count"]))
+        assert "chunks" not in result
+        assert progress[-1] == 90
+
+
+class TestIngestDocument:
+    def test_ingest_syncs_chunks_instead_of_embedding_all(self, mock_vs):
+        result = ingest_document("doc-1", "test.txt", b"Hello new world", "text/plain")
+
+        mock_vs.embed_texts.assert_not_called()
+        sync = _FakeSync.instances[0]
+        assert sync.document_id == "doc-1"
+        assert sync.embedded[0]["metadata"]["chunk_index"] == 0
+        assert result["document_id"] == "doc-1"
+        assert result["embedded"] == 1
+        assert result["chunks_count"] == 1
 
-class TestProcessDocument:
-    def test_process_with_mocked_services(self):
-        with patch("services.document_processor.vector_store") as mock_vs, \
-             patch("services.document_processor.file_storage") as mock_fs:
-            mock_vs.embed_texts.return_value = [[0.1] * 10]
-            mock_vs.ensure_collection.return_value = None
-            mock_vs.upsert_chunks.return_value = None
-            mock_fs.upload_file.return_value = None
-
-            result = process_document("test.txt", b"Hello world content here", "text/plain")
-
-            assert "document_id" in result
-            assert result["filename"] == "test.txt"
-            assert result["chunks_count"] >= 1
-            mock_vs.embed_texts.assert_called_once()
-            mock_fs.upload_file.assert_called_once()
-
-    def test_empty_document(self):
-        with patch("services.document_processor.vector_store") as mock_vs, \
-             patch("services.document_processor.file_storage") as mock_fs:
-            result = process_document("empty.txt", b"", "text/plain")
-            assert result["chunks_count"] == 0
-            mock_vs.embed_texts.assert_not_called()
-
-    def test_process_returns_document_id(self):
-        with patch("services.document_processor.vector_store") as mock_vs, \
-             patch("services.document_processor.file_storage") as mock_fs:
-            mock_vs.embed_texts.return_value = [[0.1] * 10]
-            mock_vs.ensure_collection.return_value = None
-            mock_vs.upsert_chunks.return_value = None
-            mock_fs.upload_file.return_value = None
-
-            result = process_document("doc.txt", b"Some text", "text/plain")
-            import uuid
-            uuid.UUID(result["document_id"])  # Should not raise
+    def test_empty_file_drops_all_chunks(self, mock_vs):
+        result = ingest_document("doc-1", "empty.txt", b"   ", "text/plain")
+        assert _FakeSync.instances[0].embedded == []
+        assert result["chunks_count"] == 0
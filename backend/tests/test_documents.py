@@ -0,0 +1,229 @@
+"""Tests for document upload and background ingestion endpoints."""
+
+import hashlib
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from services import ingestion
+
+
+def _ingested(document_id, filename, n=2, **extra):
+    return {
+        "document_id": document_id,
+        "filename": filename,
+        "chunks_count": n,
+        "upserted": n,
+        "deleted": 0,
+        "unchanged": 0,
+        "embedded": n,
+        **extra,
+    }
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    """Patch storage and the ingestion pipeline."""
+    stored: dict[str, bytes] = {}
+
+    with patch("routers.documents.file_storage") as mock_upload_fs, \
+         patch("services.ingestion.file_storage") as mock_job_fs, \
+         patch("services.ingestion.document_processor") as mock_dp:
+        def upload_stream(name, stream, content_type, max_bytes=None):
+            data = stream.read()
+            stored[name] = data
+            return len(data), hashlib.sha256(data).hexdigest()
+
+        @contextmanager
+        def download_to_temp(name, suffix=""):
+            path = tmp_path / f"original{suffix}"
+            path.write_bytes(stored[name])
+            yield str(path)
+
+        def ingest(doc_id, filename, path, content_type, on_progress=None, cancel=None):
+            with open(path, "rb") as f:
+                return _ingested(doc_id, filename, n=len(f.read().split()))
+
+        mock_upload_fs.upload_stream.side_effect = upload_stream
+        mock_job_fs.download_to_temp.side_effect = download_to_temp
+        mock_upload_fs.download_to_temp.side_effect = download_to_temp
+        mock_dp.ingest_document.side_effect = ingest
+        yield mock_dp
+
+
+def _upload(client, name="manual.txt", content=b"Version eins"):
+    return client.post(
+        "/api/documents/upload",
+        files={"file": (name, content, "text/plain")},
+    )
+
+
+class TestUpload:
+    def test_upload_is_queued_and_processed_in_background(self, client, pipeline):
+        resp = _upload(client)
+        assert resp.status_code == 202
+        data = resp.json()
+        assert data["status"] == "queued"
+        assert data["replaced"] is False
+
+        ingestion.wait(data["document_id"], timeout=5)
+        status = client.get(f"/api/documents/{data['document_id']}/status").json()
+        assert status["status"] == "ready"
+        assert status["progress"] == 100
+        assert status["chunks"] == 2
+
+    def test_existing_filename_is_replaced_in_place(self, client, pipeline):
+        mock_dp = pipeline
+        first = _upload(client).json()
+        ingestion.wait(first["document_id"], timeout=5)
+
+        resp = _upload(client, content=b"Version zwei mit mehr Text")
+        assert resp.status_code == 202
+        second = resp.json()
+        assert second["document_id"] == first["document_id"]
+        assert second["replaced"] is True
+
+        ingestion.wait(second["document_id"], timeout=5)
+        docs = client.get("/api/documents/").json()
+        assert len(docs) == 1
+        assert docs[0]["chunks"] == 5
+        assert docs[0]["status"] == "ready"
+        assert docs[0]["file_size"] == len(b"Version zwei mit mehr Text")
+
+    def test_new_version_replaces_original_only_once_ingested(self, client, pipeline, monkeypatch):
+        from config import get_settings
+        from services.db import get_db
+        monkeypatch.setattr(get_settings(), "ingest_max_attempts", 1)
+        mock_dp = pipeline
+
+        def original(document_id):
+            return get_db().table("documents").select("*").eq("id", document_id).execute().data[0]
+
+        document_id = _upload(client).json()["document_id"]
+        ingestion.wait(document_id, timeout=5)
+        first = original(document_id)["object_name"]
+
+        ingest = mock_dp.ingest_document.side_effect
+        mock_dp.ingest_document.side_effect = RuntimeError("kaputt")
+        _upload(client, content=b"Version zwei")
+        ingestion.wait(document_id, timeout=5)
+        row = original(document_id)
+        assert row["status"] == "failed"
+        assert row["object_name"] == first
+        assert row["pending_object_name"] is None
+
+        mock_dp.ingest_document.side_effect = ingest
+        _upload(client, content=b"Version drei")
+        ingestion.wait(document_id, timeout=5)
+        row = original(document_id)
+        assert row["status"] == "ready"
+        assert row["object_name"] not in (first, None)
+        assert row["pending_object_name"] is None
+
+        preview = client.get(f"/api/documents/{document_id}/preview").json()
+        assert preview["content"] == "Version drei"
+
+    def test_unchanged_upload_is_not_reingested(self, client, pipeline):
+        mock_dp = pipeline
+        first = _upload(client).json()
+        ingestion.wait(first["document_id"], timeout=5)
+
+        resp = _upload(client)
+        assert resp.status_code == 202
+        assert resp.json()["status"] == "ready"
+        assert resp.json()["replaced"] is True
+        assert mock_dp.ingest_document.call_count == 1
+
+    def test_too_large_upload_is_rejected(self, client, pipeline, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "max_upload_mb", 0)
+        resp = _upload(client)
+        assert resp.status_code == 400
+        assert "too large" in resp.json()["detail"]
+
+    def test_upload_while_processing_is_rejected(self, client, pipeline):
+        with patch.object(ingestion, "enqueue"):
+            _upload(client)
+            resp = _upload(client)
+        assert resp.status_code == 409
+
+    def test_failed_job_is_retried_then_recorded(self, client, pipeline, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "ingest_retry_delay", 0.0)
+        mock_dp = pipeline
+        mock_dp.ingest_document.side_effect = RuntimeError("kaputt")
+
+        document_id = _upload(client).json()["document_id"]
+        ingestion.wait(document_id, timeout=5)
+
+        status = client.get(f"/api/documents/{document_id}/status").json()
+        assert status["status"] == "failed"
+        assert "kaputt" in status["error"]
+        assert mock_dp.ingest_document.call_count == get_settings().ingest_max_attempts
+
+    def test_status_of_unknown_document_is_404(self, client):
+        assert client.get("/api/documents/nope/status").status_code == 404
+
+
+class TestProgressEvents:
+    def test_stream_ends_with_done(self, client, pipeline):
+        document_id = _upload(client).json()["document_id"]
+        ingestion.wait(document_id, timeout=5)
+
+        resp = client.get(f"/api/documents/{document_id}/events")
+        assert resp.status_code == 200
+        assert "event: progress" in resp.text
+        assert 'event: done\ndata: {"status": "ready"}' in resp.text
+
+
+class TestResume:
+    def test_pending_jobs_are_requeued(self, client, pipeline):
+        with patch.object(ingestion, "enqueue"):
+            document_id = _upload(client).json()["document_id"]
+
+        assert ingestion.resume_pending() == 1
+        ingestion.wait(document_id, timeout=5)
+        assert client.get(f"/api/documents/{document_id}/status").json()["status"] == "ready"
+
+
+class TestPagedList:
+    def test_pages_cover_every_document_once(self, client, pipeline):
+        for n in range(5):
+            ingestion.wait(_upload(client, name=f"{n}.txt").json()["document_id"], timeout=5)
+
+        names, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/api/documents/paged", params=params).json()
+            names.extend(d["filename"] for d in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert names == [d["filename"] for d in client.get("/api/documents/").json()]
+        assert sorted(names) == [f"{n}.txt" for n in range(5)]
+
+
+class TestFolders:
+    def test_folder_document_counts(self, client, pipeline):
+        folder = client.post("/api/documents/folders", json={"name": "Handbuecher"}).json()
+        for name in ("a.txt", "b.txt"):
+            resp = client.post(
+                "/api/documents/upload",
+                params={"folder_id": folder["id"]},
+                files={"file": (name, b"Inhalt", "text/plain")},
+            )
+            ingestion.wait(resp.json()["document_id"], timeout=5)
+        ingestion.wait(_upload(client, name="root.txt").json()["document_id"], timeout=5)
+
+        folders = client.get("/api/documents/folders").json()
+        assert [(f["name"], f["document_count"]) for f in folders] == [("Handbuecher", 2)]
+
+        updated = client.put(
+            f"/api/documents/folders/{folder['id']}", json={"color": "#ff0000"}
+        ).json()
+        assert updated["document_count"] == 2
+
+        client.delete(f"/api/documents/folders/{folder['id']}")
+        docs = client.get("/api/documents/").json()
+        assert {d["folder_id"] for d in docs} == {None}
@@ -0,0 +1,105 @@
+"""Tests for the persistent embedding cache."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import embedding_cache, vector_store
+from services.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(tmp_path / "cache.sqlite3", max_bytes=64 * 1024 * 1024)
+
+
+class TestEmbeddingCache:
+    def test_miss_then_hit(self, cache):
+        assert cache.get_many("m", ["a", "b"]) == {}
+        cache.put_many("m", ["a"], [[0.5, -0.25]])
+
+        found = cache.get_many("m", ["a", "b"])
+        assert found == {"a": [0.5, -0.25]}
+        assert cache.hits == 1
+        assert cache.misses == 3
+
+    def test_key_includes_model(self, cache):
+        cache.put_many("model-a", ["text"], [[1.0]])
+        assert cache.get_many("model-b", ["text"]) == {}
+
+    def test_float16_roundtrip_is_close(self, cache):
+        vector = [0.123456, -0.987654, 0.000321]
+        cache.put_many("m", ["t"], [vector])
+        restored = cache.get_many("m", ["t"])["t"]
+        assert restored == pytest.approx(vector, abs=1e-3)
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "cache.sqlite3"
+        EmbeddingCache(path, max_bytes=1 << 30).put_many("m", ["t"], [[1.0, 2.0]])
+        assert EmbeddingCache(path, max_bytes=1 << 30).get_many("m", ["t"]) == {"t": [1.0, 2.0]}
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = EmbeddingCache(tmp_path / "small.sqlite3", max_bytes=256 * 1024)
+        cache.put_many("m", ["keep"], [[0.1] * 1024])
+        for i in range(300):
+            cache.get_many("m", ["keep"])
+            cache.put_many("m", [f"text-{i}"], [[0.2] * 1024])
+
+        stats = cache.stats()
+        assert stats["evictions"] > 0
+        assert stats["bytes"] <= 256 * 1024
+        assert "keep" in cache.get_many("m", ["keep"])
+        assert cache.get_many("m", ["text-0"]) == {}
+
+    def test_failing_file_degrades_to_miss_and_skipped_write(self, cache):
+        import sqlite3
+
+        cache.put_many("m", ["a"], [[1.0]])
+        real = cache._conn
+        cache._conn = MagicMock()
+        cache._conn.execute.side_effect = sqlite3.OperationalError("database is locked")
+
+        assert cache.get_many("m", ["a"]) == {}
+        cache.put_many("m", ["b"], [[2.0]])
+        assert cache.errors == 2
+
+        cache._conn = real
+        assert cache.get_many("m", ["a", "b"]) == {"a": [1.0]}
+
+    def test_stats_when_disabled(self):
+        assert embedding_cache.stats() == {"enabled": False}
+
+
+class TestEmbedTextsWithCache:
+    @staticmethod
+    def _mock_openai(dim=3):
+        def create(model, input):
+            response = MagicMock()
+            response.data = [MagicMock(embedding=[float(len(t))] * dim) for t in input]
+            return response
+
+        client = MagicMock()
+        client.embeddings.create.side_effect = create
+        return client
+
+    def test_only_uncached_texts_are_embedded(self, cache, monkeypatch):
+        monkeypatch.setattr(embedding_cache, "get_cache", lambda: cache)
+        client = self._mock_openai()
+
+        with patch("services.llm_gateway.get_client", return_value=client):
+            first = vector_store.embed_texts(["a", "bb", "a"])
+            second = vector_store.embed_texts(["bb", "ccc"])
+
+        assert first == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+        assert second == [[2.0] * 3, [3.0] * 3]
+        calls = [c.kwargs["input"] for c in client.embeddings.create.call_args_list]
+        assert calls == [["a", "bb"], ["ccc"]]
+
+    def test_fully_cached_batch_skips_api(self, cache, monkeypatch):
+        monkeypatch.setattr(embedding_cache, "get_cache", lambda: cache)
+        cache.put_many(vector_store.get_settings().openai_embed_model, ["x"], [[4.0]])
+        client = self._mock_openai()
+
+        with patch("services.llm_gateway.get_client", return_value=client):
+            assert vector_store.embed_texts(["x"]) == [[4.0]]
+        client.embeddings.create.assert_not_called()
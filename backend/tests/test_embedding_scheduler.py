@@ -0,0 +1,141 @@
+"""Tests for the token-aware embedding scheduler."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from config import get_settings
+from services import embedding_scheduler, llm_gateway
+from services.embedding_scheduler import (
+    AdaptiveLimiter,
+    aembed_batched,
+    embed_batched,
+    plan_batches,
+)
+
+
+@pytest.fixture
+def scheduler_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "embed_batch_max_tokens", 10)
+    monkeypatch.setattr(settings, "embed_batch_max_inputs", 3)
+    monkeypatch.setattr(settings, "embed_max_retries", 3)
+    monkeypatch.setattr(llm_gateway, "_BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(embedding_scheduler, "count_tokens", len)
+    monkeypatch.setattr(embedding_scheduler, "_limiter", AdaptiveLimiter(4))
+    return settings
+
+
+def _rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    response = httpx.Response(429, headers=headers, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+class TestPlanBatches:
+    def test_respects_token_budget(self, scheduler_settings):
+        texts = ["aaaa", "bbbb", "cccc", "dd"]
+        assert plan_batches(texts, max_tokens=8, max_inputs=10) == [(0, 2), (2, 4)]
+
+    def test_respects_input_limit(self, scheduler_settings):
+        texts = ["a"] * 7
+        assert plan_batches(texts, max_tokens=100, max_inputs=3) == [(0, 3), (3, 6), (6, 7)]
+
+    def test_oversized_text_gets_own_batch(self, scheduler_settings):
+        texts = ["a", "x" * 50, "b"]
+        assert plan_batches(texts, max_tokens=10, max_inputs=10) == [(0, 1), (1, 2), (2, 3)]
+
+    def test_covers_every_text(self):
+        texts = [f"text {i} " * (i % 7 + 1) for i in range(200)]
+        batches = plan_batches(texts, max_tokens=50, max_inputs=16)
+        assert batches[0][0] == 0 and batches[-1][1] == len(texts)
+        assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+
+
+class TestEmbedBatched:
+    def test_results_are_in_input_order(self, scheduler_settings):
+        texts = [f"t{i:02d}" for i in range(20)]
+
+        def embed(batch):
+            time.sleep(0.01 * (20 - int(batch[0][1:])) / 20)
+            return [[float(t[1:])] for t in batch]
+
+        assert embed_batched(texts, embed) == [[float(i)] for i in range(20)]
+
+    def test_batches_run_concurrently(self, scheduler_settings):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def embed(batch):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return [[0.0] for _ in batch]
+
+        embed_batched(["aaaaa"] * 16, embed)
+        assert peak > 1
+
+    def test_retries_rate_limited_batch(self, scheduler_settings):
+        calls = MagicMock(side_effect=[_rate_limit_error(retry_after=0), [[1.0]]])
+        assert embed_batched(["a"], calls) == [[1.0]]
+        assert calls.call_count == 2
+
+    def test_gives_up_after_max_retries(self, scheduler_settings):
+        embed = MagicMock(side_effect=_rate_limit_error(retry_after=0))
+        with pytest.raises(RateLimitError):
+            embed_batched(["a"], embed)
+        assert embed.call_count == scheduler_settings.embed_max_retries + 1
+
+
+class TestAembedBatched:
+    def test_concurrent_callers_share_one_limit(self, scheduler_settings, monkeypatch):
+        monkeypatch.setattr(embedding_scheduler, "_limiter", AdaptiveLimiter(2))
+        active = 0
+        peak = 0
+
+        async def embed(batch):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return [[0.0] for _ in batch]
+
+        async def run():
+            return await asyncio.gather(
+                *(aembed_batched(["aaaaa"] * 6, embed) for _ in range(3))
+            )
+
+        results = asyncio.run(run())
+        assert [len(r) for r in results] == [6, 6, 6]
+        assert peak == 2
+
+
+class TestAdaptiveLimiter:
+    def test_throttle_and_recover(self):
+        limiter = AdaptiveLimiter(8)
+        limiter.throttle()
+        limiter.throttle()
+        assert limiter.limit == 2
+        limiter.recover()
+        assert limiter.limit == 3
+        for _ in range(10):
+            limiter.recover()
+        assert limiter.limit == 8
+
+    def test_never_drops_below_one(self):
+        limiter = AdaptiveLimiter(2)
+        for _ in range(5):
+            limiter.throttle()
+        assert limiter.limit == 1
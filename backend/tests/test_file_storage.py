@@ -0,0 +1,53 @@
+"""Tests for streamed MinIO uploads."""
+
+import hashlib
+import io
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services import file_storage
+
+
+@pytest.fixture
+def minio():
+    client = MagicMock()
+    received = []
+
+    def put_object(bucket_name, object_name, data, length, content_type, part_size):
+        while True:
+            part = data.read(part_size)
+            if not part:
+                break
+            received.append(part)
+
+    client.put_object.side_effect = put_object
+    with patch.object(file_storage, "get_minio_client", return_value=client), \
+         patch.object(file_storage, "ensure_bucket"):
+        yield client, received
+
+
+class TestUploadStream:
+    def test_streams_with_unknown_length_and_hashes(self, minio, monkeypatch):
+        from config import get_settings
+        monkeypatch.setattr(get_settings(), "upload_part_size", 4)
+        client, received = minio
+        data = b"0123456789"
+
+        size, digest = file_storage.upload_stream("a/b.txt", io.BytesIO(data), "text/plain")
+
+        assert (size, digest) == (10, hashlib.sha256(data).hexdigest())
+        assert client.put_object.call_args.kwargs["length"] == -1
+        assert received == [b"0123", b"4567", b"89"]
+
+    def test_too_large_stream_is_aborted(self, minio):
+        with pytest.raises(file_storage.UploadTooLarge):
+            file_storage.upload_stream("a/b.txt", io.BytesIO(b"x" * 10), "text/plain", 5)
+
+
+class TestDiscardFile:
+    def test_failure_is_logged_not_raised(self, minio):
+        client, _ = minio
+        client.remove_object.side_effect = ConnectionError("minio down")
+        file_storage.discard_file("a/b.txt")
+        client.remove_object.assert_called_once()
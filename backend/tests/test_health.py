@@ -7,3 +7,21 @@ def test_health_returns_200_with_status(client):
     data = response.json()
     assert data["status"] == "ok"
     assert "version" in data
+
+
+def test_search_index_stats(client):
+    response = client.get("/health/search-index")
+    assert response.status_code == 200
+    assert "chunks" in response.json()
+
+
+def test_embedding_cache_stats(client):
+    response = client.get("/health/embedding-cache")
+    assert response.status_code == 200
+    assert response.json() == {"enabled": False}
+
+
+def test_llm_metrics(client):
+    response = client.get("/health/llm")
+    assert response.status_code == 200
+    assert isinstance(response.json(), dict)
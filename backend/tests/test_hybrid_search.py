@@ -1,5 +1,7 @@
 """Tests for hybrid search components."""
 
+import uuid
+
 from services.hybrid_search import HybridSearcher
 
 
@@ -56,3 +58,350 @@ class TestReciprocalRankFusion:
     def test_empty_lists(self):
         fused = HybridSearcher._reciprocal_rank_fusion([[], []], k=60)
         assert fused == []
+
+    def test_deduplicates_by_point_id(self):
+        list1 = [{"id": "p1", "text": "same doc", "score": 0.9}]
+        list2 = [
+            {"id": "p2", "text": "same doc", "score": 0.8},
+            {"id": "p1", "text": "same doc", "score": 0.7},
+        ]
+        fused = HybridSearcher._reciprocal_rank_fusion([list1, list2], k=60)
+        assert [doc["id"] for doc in fused] == ["p1", "p2"]
+
+
+class TestIncrementalIndexing:
+    def _searcher(self, monkeypatch, corpus):
+        from services import hybrid_search
+
+        calls = []
+        store = {doc["id"]: doc for doc in corpus}
+
+        def fake_iter_payloads():
+            calls.append(1)
+            return iter(list(corpus))
+
+        def fake_retrieve(ids):
+            return [store[i] for i in ids if i in store]
+
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", fake_iter_payloads)
+        monkeypatch.setattr(hybrid_search.vector_store, "retrieve", fake_retrieve)
+        s = HybridSearcher()
+        s._bm25_search("warmup", limit=5)
+        return s, calls, store
+
+    def test_add_document_does_not_rescan(self, monkeypatch):
+        s, calls, store = self._searcher(
+            monkeypatch, [{"id": str(uuid.uuid4()), "text": "alte Doku", "document_id": "old"}]
+        )
+        chunk = {"id": str(uuid.uuid4()), "text": "neue Anleitung", "document_name": "n.txt"}
+        store[chunk["id"]] = chunk
+        s.add_document("new", [chunk])
+
+        results = s._bm25_search("anleitung", limit=5)
+        assert len(calls) == 1
+        assert results[0]["document_id"] == "new"
+        assert results[0]["document_name"] == "n.txt"
+        assert results[0]["text"] == "neue Anleitung"
+
+    def test_remove_document_does_not_rescan(self, monkeypatch):
+        s, calls, _ = self._searcher(
+            monkeypatch,
+            [
+                {"id": str(uuid.uuid4()), "text": "backup skript", "document_id": "a"},
+                {"id": str(uuid.uuid4()), "text": "backup plan", "document_id": "b"},
+            ],
+        )
+        s.remove_document("a")
+
+        results = s._bm25_search("backup", limit=5)
+        assert len(calls) == 1
+        assert [r["document_id"] for r in results] == ["b"]
+
+    def test_add_before_first_build_is_deferred(self, monkeypatch):
+        from services import hybrid_search
+
+        corpus = [{"id": str(uuid.uuid4()), "text": "from qdrant", "document_id": "q"}]
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", lambda: iter(corpus))
+        monkeypatch.setattr(hybrid_search.vector_store, "retrieve", lambda ids: corpus)
+        s = HybridSearcher()
+        s.add_document("x", [{"text": "from qdrant"}])
+        results = s._bm25_search("qdrant", limit=5)
+        assert [r["document_id"] for r in results] == ["q"]
+        assert results[0]["text"] == "from qdrant"
+
+    def test_stats_report_memory(self, monkeypatch):
+        s, _, _ = self._searcher(
+            monkeypatch, [{"id": str(uuid.uuid4()), "text": "alpha beta", "document_id": "a"}]
+        )
+        stats = s.stats()
+        assert stats["chunks"] == 1
+        assert stats["memory_bytes"]["total"] > 0
+
+
+class TestSnapshotPersistence:
+    def _patch(self, monkeypatch, corpus, calls):
+        from services import hybrid_search
+
+        def fake_iter_payloads():
+            calls.append(1)
+            return iter(list(corpus))
+
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", fake_iter_payloads)
+        monkeypatch.setattr(
+            hybrid_search.vector_store,
+            "retrieve",
+            lambda ids: [{"id": i, "text": ""} for i in ids],
+        )
+
+    def test_second_worker_loads_snapshot_instead_of_scanning(self, monkeypatch, tmp_path):
+        calls = []
+        corpus = [{"id": str(uuid.uuid4()), "text": "sap backup", "document_id": "a"}]
+        self._patch(monkeypatch, corpus, calls)
+        path = tmp_path / "streamworks.bm25"
+
+        HybridSearcher(snapshot_path=path, collection="streamworks")._bm25_search("x", 5)
+        assert len(calls) == 1 and path.exists()
+
+        worker = HybridSearcher(snapshot_path=path, collection="streamworks")
+        results = worker._bm25_search("backup", 5)
+        assert len(calls) == 1
+        assert [r["document_id"] for r in results] == ["a"]
+        assert worker.stats()["generation"] == 1
+
+    def test_changes_are_persisted_in_one_batch(self, monkeypatch, tmp_path):
+        from config import get_settings
+
+        monkeypatch.setattr(get_settings(), "bm25_persist_interval", 60.0)
+        self._patch(monkeypatch, [], [])
+        path = tmp_path / "streamworks.bm25"
+        worker = HybridSearcher(snapshot_path=path, collection="streamworks")
+        worker._bm25_search("warmup", 5)
+        worker.flush()
+        generation = worker.stats()["generation"]
+
+        for n in range(5):
+            worker.add_document(f"doc-{n}", [{"id": str(uuid.uuid4()), "text": "agent"}])
+        # Searchable at once, on disk only with the next snapshot write
+        assert len(worker._bm25_search("agent", 10)) == 5
+        assert worker.stats()["generation"] == generation
+
+        worker.flush()
+        assert worker.stats()["generation"] == generation + 1
+        reader = HybridSearcher(snapshot_path=path, collection="streamworks")
+        assert len(reader._bm25_search("agent", 10)) == 5
+
+    def test_changes_before_first_query_go_to_the_snapshot(self, monkeypatch, tmp_path):
+        calls = []
+        self._patch(monkeypatch, [], calls)
+        path = tmp_path / "streamworks.bm25"
+        HybridSearcher(snapshot_path=path, collection="streamworks")._bm25_search("x", 5)
+
+        worker = HybridSearcher(snapshot_path=path, collection="streamworks")
+        worker.add_document("doc-a", [{"id": str(uuid.uuid4()), "text": "agent alpha"}])
+        # Applied to the mapped snapshot, not held back in memory
+        assert worker.stats()["chunks"] == 1
+        worker.flush()
+        assert worker._pending == []
+        assert len(calls) == 1
+
+    def test_workers_see_each_others_changes(self, monkeypatch, tmp_path):
+        calls = []
+        self._patch(monkeypatch, [], calls)
+        path = tmp_path / "streamworks.bm25"
+        worker_a = HybridSearcher(snapshot_path=path, collection="streamworks")
+        worker_b = HybridSearcher(snapshot_path=path, collection="streamworks")
+        worker_a._bm25_search("warmup", 5)
+        worker_b._bm25_search("warmup", 5)
+
+        worker_a.add_document("doc-a", [{"id": str(uuid.uuid4()), "text": "agent alpha"}])
+        worker_a.flush()
+        worker_b.add_document("doc-b", [{"id": str(uuid.uuid4()), "text": "agent beta"}])
+        worker_b.flush()
+
+        for worker in (worker_a, worker_b):
+            found = {r["document_id"] for r in worker._bm25_search("agent", 5)}
+            assert found == {"doc-a", "doc-b"}
+        assert len(calls) == 1
+
+
+class TestConcurrentLegs:
+    def test_legs_run_concurrently(self, monkeypatch):
+        import asyncio
+        import time
+
+        s = HybridSearcher()
+
+        def slow_bm25(query, limit):
+            time.sleep(0.3)
+            return [{"id": "1", "text": "lexical hit"}]
+
+        async def slow_semantic(query, limit):
+            await asyncio.sleep(0.3)
+            return [{"id": "2", "text": "semantic hit"}]
+
+        monkeypatch.setattr(s, "_bm25_search", slow_bm25)
+        monkeypatch.setattr(s, "_asemantic_search", slow_semantic)
+
+        started = time.monotonic()
+        results = asyncio.run(s.asearch("frage", limit=5))
+        assert time.monotonic() - started < 0.55
+        assert {r["text"] for r in results} == {"lexical hit", "semantic hit"}
+
+    def test_timed_out_leg_is_dropped(self, monkeypatch):
+        import asyncio
+        import time
+
+        from config import get_settings
+
+        monkeypatch.setattr(get_settings(), "bm25_search_timeout", 0.05)
+        s = HybridSearcher()
+
+        def stuck_bm25(query, limit):
+            time.sleep(0.5)
+            return [{"text": "too late"}]
+
+        async def semantic(query, limit):
+            return [{"text": "semantic hit"}]
+
+        monkeypatch.setattr(s, "_bm25_search", stuck_bm25)
+        monkeypatch.setattr(s, "_asemantic_search", semantic)
+        assert [r["text"] for r in asyncio.run(s.asearch("frage"))] == ["semantic hit"]
+
+    def test_both_legs_failing_raises(self, monkeypatch):
+        import asyncio
+
+        import pytest
+
+        s = HybridSearcher()
+
+        def down(query, limit):
+            raise ConnectionError("bm25 down")
+
+        async def adown(query, limit):
+            raise ConnectionError("qdrant down")
+
+        monkeypatch.setattr(s, "_bm25_search", down)
+        monkeypatch.setattr(s, "_asemantic_search", adown)
+        with pytest.raises(ConnectionError):
+            asyncio.run(s.asearch("frage"))
+
+
+class TestAsyncSearch:
+    def test_asearch_fuses_both_legs(self, monkeypatch):
+        import asyncio
+
+        from services import hybrid_search
+
+        s = HybridSearcher()
+        monkeypatch.setattr(
+            s, "_bm25_search",
+            lambda query, limit: [{"id": "p1", "text": "lexical"}, {"id": "p2", "text": "shared"}],
+        )
+
+        async def fake_embed(texts):
+            return [[0.0]]
+
+        async def fake_search(embedding, limit):
+            return [{"id": "p2", "text": "shared", "score": 0.9}]
+
+        monkeypatch.setattr(hybrid_search.vector_store, "aembed_texts", fake_embed)
+        monkeypatch.setattr(hybrid_search.vector_store, "asearch", fake_search)
+
+        results = asyncio.run(s.asearch("frage"))
+        assert [r["id"] for r in results] == ["p2", "p1"]
+
+    def test_asearch_drops_timed_out_leg(self, monkeypatch):
+        import asyncio
+
+        from config import get_settings
+
+        monkeypatch.setattr(get_settings(), "semantic_search_timeout", 0.05)
+        s = HybridSearcher()
+        monkeypatch.setattr(s, "_bm25_search", lambda query, limit: [{"id": "p1", "text": "hit"}])
+
+        async def stuck(query, limit):
+            await asyncio.sleep(1)
+            return []
+
+        monkeypatch.setattr(s, "_asemantic_search", stuck)
+        assert [r["id"] for r in asyncio.run(s.asearch("frage"))] == ["p1"]
+
+
+class TestBackgroundRebuild:
+    def test_queries_serve_old_index_during_rebuild(self, monkeypatch):
+        import threading
+
+        from services import hybrid_search
+
+        release = threading.Event()
+        corpus = [{"id": str(uuid.uuid4()), "text": "alter stand", "document_id": "old"}]
+        calls = []
+
+        def fake_iter_payloads():
+            calls.append(1)
+            if len(calls) > 1:
+                release.wait(5)
+                return iter([{"id": str(uuid.uuid4()), "text": "neuer stand", "document_id": "new"}])
+            return iter(corpus)
+
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", fake_iter_payloads)
+        monkeypatch.setattr(hybrid_search.vector_store, "retrieve", lambda ids: [])
+        s = HybridSearcher()
+        s._bm25_search("warmup", 5)
+
+        s.mark_dirty()
+        s.mark_dirty()  # coalesced into the running rebuild
+        assert [r["document_id"] for r in s._bm25_search("stand", 5)] == ["old"]
+        assert s.stats()["rebuilding"] is True
+
+        release.set()
+        s.flush()
+        assert [r["document_id"] for r in s._bm25_search("stand", 5)] == ["new"]
+        assert len(calls) == 2
+        assert s.stats()["stale_seconds"] == 0.0
+
+    def test_changes_during_rebuild_are_replayed(self, monkeypatch):
+        import threading
+
+        from services import hybrid_search
+
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fake_iter_payloads():
+            calls.append(1)
+            if len(calls) > 1:
+                started.set()
+                release.wait(5)
+            return iter([])
+
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", fake_iter_payloads)
+        monkeypatch.setattr(hybrid_search.vector_store, "retrieve", lambda ids: [])
+        s = HybridSearcher()
+        s._bm25_search("warmup", 5)
+
+        s.mark_dirty()
+        started.wait(5)
+        s.add_document("late", [{"text": "nachzuegler"}])
+        release.set()
+        s.flush()
+        assert [r["document_id"] for r in s._bm25_search("nachzuegler", 5)] == ["late"]
+
+    def test_exceeding_staleness_bound_waits_for_rebuild(self, monkeypatch):
+        from config import get_settings
+        from services import hybrid_search
+
+        monkeypatch.setattr(get_settings(), "bm25_max_staleness", 0.0)
+        versions = iter(["eins", "zwei"])
+        monkeypatch.setattr(
+            hybrid_search.vector_store,
+            "iter_payloads",
+            lambda: iter([{"text": next(versions), "document_id": "d"}]),
+        )
+        monkeypatch.setattr(hybrid_search.vector_store, "retrieve", lambda ids: [])
+        s = HybridSearcher()
+        s._bm25_search("warmup", 5)
+        with s._lock:
+            s._dirty = True
+            s._stale_since = 0.0
+        assert s._bm25_search("zwei", 5)[0]["document_id"] == "d"
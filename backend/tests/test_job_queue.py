@@ -0,0 +1,143 @@
+"""Tests for the ingestion job queue on the in-memory store."""
+
+import pytest
+
+from services import job_queue
+
+
+@pytest.fixture(autouse=True)
+def memstore(monkeypatch, fresh_memstore):
+    import services.db as db_mod
+    monkeypatch.setattr(db_mod, "_store", fresh_memstore)
+    return fresh_memstore
+
+
+def _job(store, document_id):
+    rows = store.table("ingest_jobs").select("*").eq("document_id", document_id).execute()
+    return rows.data[0] if rows.data else None
+
+
+class TestClaim:
+    def test_each_job_is_claimed_once(self):
+        job_queue.push("doc-1")
+        job = job_queue.claim("w1", lease_seconds=60)
+        assert job == {"document_id": "doc-1", "attempts": 1}
+        assert job_queue.claim("w2", lease_seconds=60) is None
+
+    def test_expired_lease_is_reclaimed(self):
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=-1)
+
+        job = job_queue.claim("w2", lease_seconds=60)
+        assert job == {"document_id": "doc-1", "attempts": 2}
+        assert job_queue.heartbeat("doc-1", "w1", 60) is False
+        assert job_queue.heartbeat("doc-1", "w2", 60) is True
+
+    def test_push_leaves_running_job_alone(self, memstore):
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=60)
+        job_queue.push("doc-1")
+        assert _job(memstore, "doc-1")["locked_by"] == "w1"
+
+    def test_push_many_requeues_all_but_running(self, memstore):
+        job_queue.push_many(["doc-1", "doc-2"])
+        job_queue.claim("w1", lease_seconds=60)
+        job_queue.push_many(["doc-1", "doc-2", "doc-3"])
+
+        statuses = {
+            job["document_id"]: job["status"]
+            for job in memstore.table("ingest_jobs").select("*").execute().data
+        }
+        assert statuses == {"doc-1": "running", "doc-2": "queued", "doc-3": "queued"}
+
+
+class TestSettle:
+    def test_finish_writes_document_and_removes_job(self, memstore):
+        memstore.table("documents").insert({"id": "doc-1", "filename": "a.txt"}).execute()
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=60)
+        assert job_queue.finish("doc-1", "w1", {"status": "ready"}) is True
+        assert _job(memstore, "doc-1") is None
+        doc = memstore.table("documents").select("*").eq("id", "doc-1").execute().data[0]
+        assert doc["status"] == "ready"
+
+    def test_finish_after_lost_lease_writes_nothing(self, memstore):
+        memstore.table("documents").insert({"id": "doc-1", "filename": "a.txt"}).execute()
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=-1)
+        job_queue.claim("w2", lease_seconds=60)
+
+        assert job_queue.finish("doc-1", "w1", {"status": "ready"}) is False
+        assert _job(memstore, "doc-1")["locked_by"] == "w2"
+        doc = memstore.table("documents").select("*").eq("id", "doc-1").execute().data[0]
+        assert doc.get("status") is None
+
+    def test_fail_retries_until_attempts_are_used_up(self, memstore):
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=60)
+        assert job_queue.fail("doc-1", "w1", "boom", max_attempts=2, retry_delay=0) is True
+
+        job_queue.claim("w1", lease_seconds=60)
+        assert job_queue.fail("doc-1", "w1", "boom", max_attempts=2, retry_delay=0) is False
+        job = _job(memstore, "doc-1")
+        assert job["status"] == "failed"
+        assert job["last_error"] == "boom"
+        assert job_queue.claim("w1", lease_seconds=60) is None
+
+    def test_retry_waits_for_backoff(self):
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=60)
+        job_queue.fail("doc-1", "w1", "boom", max_attempts=3, retry_delay=60)
+        assert job_queue.claim("w1", lease_seconds=60) is None
+
+    def test_reap_parks_crashed_last_attempt(self, memstore):
+        job_queue.push("doc-1")
+        job_queue.claim("w1", lease_seconds=-1)
+
+        assert job_queue.reap(max_attempts=1) == ["doc-1"]
+        assert _job(memstore, "doc-1")["status"] == "failed"
+        assert job_queue.claim("w2", lease_seconds=60) is None
+
+
+class TestLeaseLoss:
+    def test_reclaimed_job_is_left_to_the_new_worker(self, memstore):
+        from contextlib import contextmanager
+        from unittest.mock import patch
+
+        from services import ingestion
+
+        memstore.table("documents").insert(
+            {"id": "doc-1", "filename": "a.txt", "object_name": "doc-1/a.txt"}
+        ).execute()
+        job_queue.push("doc-1")
+        job = job_queue.claim("w1", lease_seconds=60)
+
+        @contextmanager
+        def download_to_temp(name, suffix=""):
+            yield "/tmp/a.txt"
+
+        def ingest(*args, **kwargs):
+            # Another worker takes the job over while this one is still running
+            memstore.table("ingest_jobs").update({"locked_by": "w2"}).eq(
+                "document_id", "doc-1"
+            ).execute()
+            return {"chunks_count": 1}
+
+        with patch("services.ingestion.file_storage") as fs, \
+                patch("services.ingestion.document_processor") as dp, \
+                patch("services.ingestion.vector_store") as vs:
+            fs.download_to_temp.side_effect = download_to_temp
+            dp.ingest_document.side_effect = ingest
+            assert ingestion.process_job(job, "w1") is False
+
+        doc = memstore.table("documents").select("*").eq("id", "doc-1").execute().data[0]
+        assert doc["status"] == "processing"
+        assert _job(memstore, "doc-1")["locked_by"] == "w2"
+        vs.delete_document.assert_not_called()
+
+    def test_lost_heartbeat_sets_the_cancel_flag(self, monkeypatch):
+        from services import ingestion
+
+        monkeypatch.setattr(job_queue, "heartbeat", lambda *args: False)
+        with ingestion._Lease("doc-1", "w1", lease_seconds=0.03) as lease:
+            assert lease.lost.wait(1)
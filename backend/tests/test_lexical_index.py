@@ -0,0 +1,175 @@
+"""Tests for the incrementally maintained BM25 index."""
+
+import random
+import uuid
+
+from services.lexical_index import LexicalIndex, tokenize
+
+
+def _index(*docs):
+    index = LexicalIndex()
+    index.add_many([{"text": text, "document_id": doc_id} for doc_id, text in docs])
+    return index
+
+
+class TestLexicalIndex:
+    def test_search_ranks_matching_chunks(self):
+        index = _index(
+            ("d1", "SAP Backup taeglich ausfuehren"),
+            ("d2", "Dateitransfer zwischen Agenten"),
+            ("d3", "SAP Report Variante"),
+        )
+        hits = index.search("sap backup", limit=10)
+        assert [doc["document_id"] for doc, _ in hits] == ["d1", "d3"]
+        assert hits[0][1] > hits[1][1]
+
+    def test_unknown_terms_return_nothing(self):
+        index = _index(("d1", "hello world"))
+        assert index.search("streamworks", limit=5) == []
+
+    def test_add_updates_stats_in_place(self):
+        index = _index(("d1", "alpha beta"))
+        index.add({"text": "alpha gamma delta", "document_id": "d2"})
+        assert len(index) == 2
+        assert index.avgdl == 2.5
+        assert {doc["document_id"] for doc, _ in index.search("alpha", 5)} == {"d1", "d2"}
+
+    def test_remove_document_drops_postings(self):
+        index = _index(("d1", "alpha beta"), ("d1", "beta"), ("d2", "beta gamma"))
+        assert index.remove_document("d1") == 2
+        assert len(index) == 1
+        assert index.search("alpha", 5) == []
+        assert [doc["document_id"] for doc, _ in index.search("beta", 5)] == ["d2"]
+
+    def test_compaction_drops_tombstones(self, monkeypatch):
+        monkeypatch.setattr("services.lexical_index._COMPACT_MIN_DEAD", 0)
+        index = _index(("d1", "alpha"), ("d2", "beta"), ("d3", "alpha beta"))
+        index.remove_document("d1")
+        index.remove_document("d2")
+        assert index._base_n == 1
+        assert [hit["document_id"] for hit, _ in index.search("alpha", 5)] == ["d3"]
+
+    def test_limit_is_respected(self):
+        index = _index(*[(f"d{i}", "common term") for i in range(20)])
+        assert len(index.search("common", limit=3)) == 3
+
+
+class TestMaxScorePruning:
+    @staticmethod
+    def _exhaustive(index, corpus, query, limit):
+        """Reference scorer: score every live chunk, sort everything."""
+        scored = []
+        for doc in corpus:
+            tokens = tokenize(doc["text"])
+            norm = index.k1 * (1 - index.b + index.b * len(tokens) / index.avgdl)
+            score = 0.0
+            for term in tokenize(query):
+                freq = tokens.count(term)
+                if freq:
+                    df = index._df[index._term_id(term)]
+                    score += index.idf(df) * freq * (index.k1 + 1) / (freq + norm)
+            if score > 0:
+                scored.append(score)
+        return sorted(scored, reverse=True)[:limit]
+
+    def test_matches_exhaustive_scoring(self):
+        rng = random.Random(7)
+        words = [f"w{i}" for i in range(40)]
+        index = LexicalIndex()
+        corpus = []
+        for i in range(400):
+            text = " ".join(rng.choices(words, weights=range(40, 0, -1), k=rng.randint(3, 30)))
+            corpus.append({"text": text, "document_id": f"d{i % 50}"})
+            index.add(corpus[-1])
+            if i == 200:
+                index.freeze()
+        for doc_id in ("d3", "d17"):
+            index.remove_document(doc_id)
+        corpus = [doc for doc in corpus if doc["document_id"] not in ("d3", "d17")]
+
+        for query in ("w0 w5 w39", "w1", "w38 w39 w2 w2", "w20 w21 w22 w23"):
+            got = [round(score, 9) for _, score in index.search(query, limit=10)]
+            expected = [round(score, 9) for score in self._exhaustive(index, corpus, query, 10)]
+            assert got == expected
+
+
+class TestCompactLayout:
+    def test_hits_carry_metadata_but_no_text(self):
+        index = LexicalIndex()
+        point_id = "6f1c9a52-3c1e-4d5e-9f57-2b7f1b0d8e11"
+        index.add({
+            "id": point_id,
+            "text": "Streamworks Agent",
+            "document_id": "d1",
+            "document_name": "handbuch.pdf",
+            "page": 4,
+        })
+        hit, _ = index.search("agent", 5)[0]
+        assert hit == {
+            "id": point_id,
+            "document_id": "d1",
+            "document_name": "handbuch.pdf",
+            "page": 4,
+        }
+
+    def test_freeze_preserves_results(self):
+        index = _index(("d1", "alpha beta"), ("d2", "beta gamma"), ("d3", "gamma"))
+        before = index.search("beta gamma", 5)
+        index.freeze()
+        assert index.search("beta gamma", 5) == before
+        assert not index._delta
+
+    def test_adds_after_freeze_are_searchable(self):
+        index = _index(("d1", "alpha"))
+        index.freeze()
+        index.add({"text": "alpha alpha", "document_id": "d2"})
+        assert [hit["document_id"] for hit, _ in index.search("alpha", 5)] == ["d2", "d1"]
+
+    def test_memory_usage_report(self):
+        index = _index(("d1", "alpha beta"), ("d2", "gamma"))
+        index.freeze()
+        usage = index.memory_usage()
+        assert usage["postings"] > 0
+        assert usage["total"] == sum(v for k, v in usage.items() if k != "total")
+
+
+class TestSnapshot:
+    def _sample(self):
+        index = LexicalIndex()
+        for n, text in enumerate(["zeta alpha", "beta", "alpha alpha übung"]):
+            index.add({
+                "id": str(uuid.uuid4()),
+                "text": text,
+                "document_id": f"d{n}",
+                "document_name": f"doc{n}.pdf",
+                "page": n + 1,
+            })
+        return index
+
+    def test_round_trip(self, tmp_path):
+        index = self._sample()
+        index.save(tmp_path / "idx.bm25", generation=7, collection="streamworks")
+
+        loaded, generation = LexicalIndex.load(tmp_path / "idx.bm25", "streamworks")
+        assert generation == 7
+        assert len(loaded) == 3
+        for query in ("alpha", "übung beta", "zeta"):
+            assert loaded.search(query, 5) == index.search(query, 5)
+        assert loaded.memory_usage()["mapped"] > 0
+
+    def test_loaded_index_accepts_changes(self, tmp_path):
+        self._sample().save(tmp_path / "idx.bm25", generation=1, collection="c")
+        loaded, _ = LexicalIndex.load(tmp_path / "idx.bm25", "c")
+
+        loaded.add({"text": "alpha neu", "document_id": "d9"})
+        loaded.remove_document("d2")
+        assert {hit["document_id"] for hit, _ in loaded.search("alpha", 5)} == {"d9", "d0"}
+        loaded.freeze()
+        assert [hit["document_id"] for hit, _ in loaded.search("alpha neu", 5)] == ["d9", "d0"]
+
+    def test_collection_mismatch_rejected(self, tmp_path):
+        import pytest
+
+        self._sample().save(tmp_path / "idx.bm25", generation=1, collection="a")
+        with pytest.raises(ValueError, match="collection"):
+            LexicalIndex.load(tmp_path / "idx.bm25", "b")
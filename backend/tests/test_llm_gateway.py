@@ -0,0 +1,145 @@
+"""Tests for the shared LLM gateway."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from services import llm_gateway
+
+
+def _error(cls, status):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers={"retry-after": "0"}, request=request)
+    return cls("error", response=response, body=None)
+
+
+def _completion(content="ok", prompt_tokens=10, completion_tokens=5):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_BACKOFF_BASE", 0.0)
+    llm_gateway.reset_metrics()
+    yield
+    llm_gateway.reset_metrics()
+
+
+class TestClients:
+    def test_sync_client_is_shared(self):
+        assert llm_gateway.get_client() is llm_gateway.get_client()
+        assert llm_gateway.get_client().max_retries == 0
+
+    def test_async_client_is_shared_per_loop(self):
+        async def two():
+            return llm_gateway.get_async_client(), llm_gateway.get_async_client()
+
+        a, b = asyncio.run(two())
+        c, _ = asyncio.run(two())
+        assert a is b
+        assert a is not c
+
+
+class TestChat:
+    def test_records_latency_and_tokens(self):
+        client = MagicMock()
+        client.chat.completions.create.return_value = _completion()
+        with patch.object(llm_gateway, "get_client", return_value=client):
+            llm_gateway.chat("site.a", model="m", messages=[])
+            llm_gateway.chat("site.a", model="m", messages=[])
+
+        stats = llm_gateway.metrics()["site.a"]
+        assert stats["calls"] == 2
+        assert stats["errors"] == 0
+        assert stats["prompt_tokens"] == 20
+        assert stats["completion_tokens"] == 10
+
+    def test_retries_rate_limit(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [
+            _error(RateLimitError, 429),
+            _completion("second try"),
+        ]
+        with patch.object(llm_gateway, "get_client", return_value=client):
+            response = llm_gateway.chat("site.b", model="m", messages=[])
+
+        assert response.choices[0].message.content == "second try"
+        stats = llm_gateway.metrics()["site.b"]
+        assert stats["calls"] == 1
+        assert stats["retries"] == 1
+
+    def test_non_retryable_error_is_counted_and_raised(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = _error(BadRequestError, 400)
+        with patch.object(llm_gateway, "get_client", return_value=client):
+            with pytest.raises(BadRequestError):
+                llm_gateway.chat("site.c", model="m", messages=[])
+
+        assert client.chat.completions.create.call_count == 1
+        stats = llm_gateway.metrics()["site.c"]
+        assert stats["errors"] == 1
+        assert stats["error_types"] == {"BadRequestError": 1}
+
+    def test_retry_budget_is_respected(self):
+        client = MagicMock()
+        client.chat.completions.create.side_effect = _error(RateLimitError, 429)
+        with patch.object(llm_gateway, "get_client", return_value=client):
+            with pytest.raises(RateLimitError):
+                llm_gateway.chat("site.d", retries=2, model="m", messages=[])
+        assert client.chat.completions.create.call_count == 3
+
+
+class TestAsync:
+    def test_achat(self):
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=_completion("async"))
+        with patch.object(llm_gateway, "get_async_client", return_value=client):
+            response = asyncio.run(llm_gateway.achat("site.e", model="m", messages=[]))
+        assert response.choices[0].message.content == "async"
+        assert llm_gateway.metrics()["site.e"]["prompt_tokens"] == 10
+
+    def test_astream_chat_yields_text_and_records_usage(self):
+        async def chunks():
+            for text in ("Hal", "lo"):
+                chunk = MagicMock(usage=None)
+                chunk.choices = [MagicMock()]
+                chunk.choices[0].delta.content = text
+                yield chunk
+            final = MagicMock(choices=[])
+            final.usage.prompt_tokens = 7
+            final.usage.completion_tokens = 2
+            yield final
+
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=chunks())
+
+        async def collect():
+            return [t async for t in llm_gateway.astream_chat("site.f", model="m", messages=[])]
+
+        with patch.object(llm_gateway, "get_async_client", return_value=client):
+            assert asyncio.run(collect()) == ["Hal", "lo"]
+
+        kwargs = client.chat.completions.create.call_args.kwargs
+        assert kwargs["stream"] is True
+        assert kwargs["stream_options"] == {"include_usage": True}
+        stats = llm_gateway.metrics()["site.f"]
+        assert (stats["prompt_tokens"], stats["completion_tokens"]) == (7, 2)
+
+
+class TestEmbed:
+    def test_embed_returns_vectors_in_order(self):
+        response = MagicMock()
+        response.data = [MagicMock(embedding=[1.0]), MagicMock(embedding=[2.0])]
+        client = MagicMock()
+        client.embeddings.create.return_value = response
+        with patch.object(llm_gateway, "get_client", return_value=client):
+            assert llm_gateway.embed("emb", ["a", "b"], model="m") == [[1.0], [2.0]]
+        assert client.embeddings.create.call_args.kwargs == {"model": "m", "input": ["a", "b"]}
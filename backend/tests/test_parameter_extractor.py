@@ -56,7 +56,7 @@ class TestExtractParameters:
             "suggestions": ["Bitte Agent angeben"],
         })
 
-        with patch("services.parameter_extractor.OpenAI") as MockOpenAI:
+        with patch("services.llm_gateway.get_client") as MockOpenAI:
             mock_client = MagicMock()
             mock_client.chat.completions.create.return_value = mock_response
             MockOpenAI.return_value = mock_client
@@ -79,7 +79,7 @@ class TestExtractParameters:
             "suggestions": [],
         })
 
-        with patch("services.parameter_extractor.OpenAI") as MockOpenAI:
+        with patch("services.llm_gateway.get_client") as MockOpenAI:
             mock_client = MagicMock()
             mock_client.chat.completions.create.return_value = mock_response
             MockOpenAI.return_value = mock_client
@@ -0,0 +1,105 @@
+"""Tests for process-pool parsing."""
+
+import time
+
+import pytest
+
+from config import get_settings
+from services import document_processor, parse_pool
+
+
+def _pdf(pages: int) -> bytes:
+    import fitz
+
+    pdf = fitz.open()
+    for n in range(pages):
+        page = pdf.new_page()
+        page.insert_text((72, 72), f"Inhalt der Seite {n + 1}")
+    return pdf.tobytes()
+
+
+def _burn():
+    while True:
+        pass
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return ["done"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _stop_pool():
+    yield
+    parse_pool.shutdown()
+
+
+class TestIterSegments:
+    def test_sharded_pdf_matches_inline_parse(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "parse_shard_pages", 2)
+        data = _pdf(5)
+
+        pooled = list(parse_pool.iter_segments("m.pdf", data, "application/pdf"))
+        inline = list(document_processor._iter_segments("m.pdf", data, "application/pdf"))
+
+        assert pooled == inline
+        assert [s.page for s in pooled] == [1, 2, 3, 4, 5]
+
+    def test_text_files_are_parsed_inline(self, monkeypatch):
+        monkeypatch.setattr(parse_pool, "_submit", None)
+        segments = list(parse_pool.iter_segments("a.txt", b"Hallo", "text/plain"))
+        assert [s.text for s in segments] == ["Hallo"]
+
+    def test_unsupported_type_raises(self):
+        with pytest.raises(ValueError):
+            list(parse_pool.iter_segments("x.png", b"\x89PNG", "image/png"))
+
+
+class TestIterTableChunks:
+    def test_sheets_are_chunked_in_parallel_in_order(self, monkeypatch):
+        import io
+        from openpyxl import Workbook
+
+        monkeypatch.setattr(get_settings(), "xlsx_chunk_rows", 3)
+        wb = Workbook()
+        wb.active.title = "Jobs"
+        wb.active.append(("Name", "Agent"))
+        for n in range(20):
+            wb.active.append((f"J{n}", f"A{n}"))
+        agents = wb.create_sheet("Agents")
+        agents.append(("Agent",))
+        agents.append(("A1",))
+        buf = io.BytesIO()
+        wb.save(buf)
+
+        pooled = list(parse_pool.iter_table_chunks(buf.getvalue()))
+
+        assert pooled == list(document_processor._iter_workbook_chunks(buf.getvalue()))
+        jobs = [c for c in pooled if c.sheet == "Jobs"]
+        assert [(c.row_start, c.row_end) for c in jobs][:3] == [(2, 4), (5, 7), (8, 10)]
+        assert all(c.text.startswith("--- Sheet: Jobs ---\nName | Agent\n") for c in jobs)
+        rows = [r for c in jobs for r in range(c.row_start, c.row_end + 1)]
+        assert rows == list(range(2, 22))
+        assert pooled[-1].sheet == "Agents"
+
+
+class TestCpuLimit:
+    def test_runaway_task_is_killed(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "parse_cpu_limit", 1)
+        with pytest.raises(parse_pool.ParseLimitExceeded):
+            parse_pool._result(parse_pool._submit(_burn))
+
+        # The pool is replaced and keeps working
+        monkeypatch.setattr(get_settings(), "parse_cpu_limit", 60)
+        segments = list(parse_pool.iter_segments("m.pdf", _pdf(1), "application/pdf"))
+        assert segments[0].page == 1
+
+    def test_other_tasks_survive_a_killed_worker(self, monkeypatch):
+        monkeypatch.setattr(get_settings(), "parse_cpu_limit", 1)
+        runaway = parse_pool._submit(_burn)
+        innocent = parse_pool._submit(_sleep, 2)
+
+        with pytest.raises(parse_pool.ParseLimitExceeded):
+            parse_pool._result(runaway)
+        # Its worker was killed with the pool, it is rerun on its own
+        assert parse_pool._result(innocent) == ["done"]
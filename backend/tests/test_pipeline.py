@@ -0,0 +1,91 @@
+"""Tests for the bounded-queue stage pipeline."""
+
+import threading
+import time
+
+import pytest
+
+from services.pipeline import Cancelled, Stage, run_pipeline
+
+
+class TestRunPipeline:
+    def test_every_item_passes_every_stage(self):
+        seen = []
+        lock = threading.Lock()
+
+        def sink(x):
+            with lock:
+                seen.append(x)
+
+        run_pipeline(
+            range(50),
+            [Stage("double", lambda x: x * 2, workers=3), Stage("sink", sink, workers=2)],
+            maxsize=2,
+        )
+        assert sorted(seen) == [x * 2 for x in range(50)]
+
+    def test_empty_source(self):
+        calls = []
+        run_pipeline([], [Stage("sink", calls.append)])
+        assert calls == []
+
+    def test_source_is_throttled_by_full_queues(self):
+        produced = []
+
+        def source():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        def slow(x):
+            time.sleep(0.01)
+            # Items in flight: one per queue slot plus the one being processed
+            assert len(produced) - x <= 4
+            return x
+
+        run_pipeline(source(), [Stage("slow", slow)], maxsize=2)
+        assert len(produced) == 20
+
+    def test_stage_error_is_raised_and_stops_source(self):
+        produced = []
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        def boom(x):
+            if x == 3:
+                raise ValueError("kaputt")
+            return x
+
+        with pytest.raises(ValueError, match="kaputt"):
+            run_pipeline(source(), [Stage("boom", boom), Stage("sink", lambda x: None)], maxsize=2)
+        assert len(produced) < 1000
+
+    def test_source_error_is_raised(self):
+        def source():
+            yield 1
+            raise OSError("datei kaputt")
+
+        with pytest.raises(OSError, match="datei kaputt"):
+            run_pipeline(source(), [Stage("sink", lambda x: None)])
+
+    def test_cancel_stops_every_step(self):
+        cancel = threading.Event()
+        produced, done = [], []
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        def sink(x):
+            if x == 3:
+                cancel.set()
+            done.append(x)
+
+        with pytest.raises(Cancelled):
+            run_pipeline(source(), [Stage("sink", sink)], maxsize=2, cancel=cancel)
+        assert len(produced) < 1000
+        assert len(done) < 10
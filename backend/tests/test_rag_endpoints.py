@@ -1,18 +1,18 @@
 """Tests for RAG chat endpoints."""
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 
 
 class TestChatEndpoint:
     def test_chat_creates_session(self, client):
         with patch("routers.rag.rag_service") as mock_rag:
-            mock_rag.query.return_value = {
+            mock_rag.query = AsyncMock(return_value={
                 "answer": "Test answer",
                 "sources": [
                     {"document_name": "doc.pdf", "text": "chunk", "score": 0.9, "page": 1}
                 ],
                 "confidence": 0.85,
-            }
+            })
 
             resp = client.post("/api/rag/chat", json={"message": "What is Streamworks?"})
             assert resp.status_code == 200
@@ -24,15 +24,15 @@ class TestChatEndpoint:
     def test_chat_with_existing_session(self, client):
         with patch("routers.rag.rag_service") as mock_rag, \
              patch("routers.rag.chat_session_service") as mock_css:
-            mock_css.get_session.return_value = {"id": "existing-id", "title": "Test"}
-            mock_css.add_message.return_value = {"id": "msg1"}
-            mock_css.get_chat_history.return_value = []
-            mock_css.update_session_title.return_value = None
-            mock_rag.query.return_value = {
+            mock_css.get_session = AsyncMock(return_value={"id": "existing-id", "title": "Test"})
+            mock_css.add_message = AsyncMock(return_value={"id": "msg1"})
+            mock_css.get_chat_history = AsyncMock(return_value=[])
+            mock_css.update_session_title = AsyncMock(return_value=None)
+            mock_rag.query = AsyncMock(return_value={
                 "answer": "Response",
                 "sources": [],
                 "confidence": 0.5,
-            }
+            })
 
             resp = client.post(
                 "/api/rag/chat",
@@ -42,7 +42,7 @@ class TestChatEndpoint:
 
     def test_chat_with_invalid_session_404(self, client):
         with patch("routers.rag.chat_session_service") as mock_css:
-            mock_css.get_session.return_value = None
+            mock_css.get_session = AsyncMock(return_value=None)
 
             resp = client.post(
                 "/api/rag/chat",
@@ -51,15 +51,60 @@ class TestChatEndpoint:
             assert resp.status_code == 404
 
 
+class TestChatStreamEndpoint:
+    def test_stream_emits_events_and_stores_answer(self, client):
+        async def fake_stream(question, chat_history=None):
+            yield {"type": "sources", "data": [{"document_name": "doc.pdf", "text_preview": "chunk"}]}
+            yield {"type": "chunk", "data": "Hallo "}
+            yield {"type": "chunk", "data": "Welt"}
+            yield {"type": "done", "data": 0.7}
+
+        with patch("routers.rag.rag_service") as mock_rag:
+            mock_rag.query_stream = fake_stream
+            resp = client.post("/api/rag/chat/stream", json={"message": "Frage"})
+
+        assert resp.status_code == 200
+        body = resp.text
+        assert "event: sources" in body
+        assert body.index("Hallo") < body.index("Welt")
+        assert "event: done" in body
+
+        session_id = client.get("/api/rag/sessions").json()[0]["id"]
+        messages = client.get(f"/api/rag/sessions/{session_id}/messages").json()
+        assert [m["role"] for m in messages] == ["user", "assistant"]
+        assert messages[1]["content"] == "Hallo Welt"
+        assert messages[1]["sources"][0]["chunk_text"] == "chunk"
+
+
 class TestChatSessionEndpoints:
     def test_list_sessions(self, client):
         resp = client.get("/api/rag/sessions")
         assert resp.status_code == 200
         assert isinstance(resp.json(), list)
 
+    def test_list_sessions_paged(self, client):
+        from services.db import get_db
+
+        get_db().table("chat_sessions").insert([
+            {"title": f"Chat {n}", "created_at": f"2024-01-0{n + 1}T00:00:00+00:00"}
+            for n in range(3)
+        ]).execute()
+
+        first = client.get("/api/rag/sessions/paged", params={"limit": 2}).json()
+        assert [s["title"] for s in first["items"]] == ["Chat 2", "Chat 1"]
+        rest = client.get(
+            "/api/rag/sessions/paged", params={"limit": 2, "cursor": first["next_cursor"]}
+        ).json()
+        assert [s["title"] for s in rest["items"]] == ["Chat 0"]
+        assert rest["next_cursor"] is None
+
+    def test_paged_rejects_invalid_cursor(self, client):
+        resp = client.get("/api/rag/sessions/paged", params={"cursor": "kaputt"})
+        assert resp.status_code == 400
+
     def test_delete_session(self, client):
         with patch("routers.rag.chat_session_service") as mock_css:
-            mock_css.delete_session.return_value = None
+            mock_css.delete_session = AsyncMock(return_value=None)
 
             resp = client.delete("/api/rag/sessions/some-id")
             assert resp.status_code == 200
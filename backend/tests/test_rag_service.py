@@ -1,5 +1,9 @@
 """Tests for RAG service internal functions."""
 
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from services import rag_service
 from services.rag_service import (
     _build_context_and_sources,
     _estimate_confidence,
@@ -82,3 +86,143 @@ class TestBuildMessages:
         messages = _build_messages("Question", "ctx", "src", chat_history=history)
         # Empty content message should be filtered
         assert len(messages) == 3  # system + 1 valid history + user
+
+
+RESULTS = [{"text": "Agenten starten Jobs", "document_name": "doc.pdf", "page": 2, "rerank_score": 0.9}]
+
+
+class TestAsyncQuery:
+    def test_query_uses_async_pipeline(self):
+        completion = MagicMock()
+        completion.choices = [MagicMock()]
+        completion.choices[0].message.content = "Antwort [1]"
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=completion)
+
+        with patch.object(rag_service, "_retrieve", AsyncMock(return_value=RESULTS)), \
+             patch("services.llm_gateway.get_async_client", return_value=client):
+            result = asyncio.run(rag_service.query("Wie starte ich Jobs?"))
+
+        assert result["answer"] == "Antwort [1]"
+        assert result["sources"][0]["document_name"] == "doc.pdf"
+        assert result["confidence"] > 0
+
+    def test_query_without_results(self):
+        with patch.object(rag_service, "_retrieve", AsyncMock(return_value=[])):
+            result = asyncio.run(rag_service.query("Frage"))
+        assert result["answer"] == rag_service.NO_RESULTS_ANSWER
+        assert result["sources"] == []
+
+    def test_query_stream_yields_chunks_in_order(self):
+        async def deltas():
+            for text in ("Ant", None, "wort"):
+                chunk = MagicMock()
+                chunk.choices = [MagicMock()]
+                chunk.choices[0].delta.content = text
+                yield chunk
+
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=deltas())
+
+        async def collect():
+            return [event async for event in rag_service.query_stream("Frage")]
+
+        with patch.object(rag_service, "_retrieve", AsyncMock(return_value=RESULTS)), \
+             patch("services.llm_gateway.get_async_client", return_value=client):
+            events = asyncio.run(collect())
+
+        assert [e["type"] for e in events] == ["sources", "chunk", "chunk", "done"]
+        assert "".join(e["data"] for e in events if e["type"] == "chunk") == "Antwort"
+
+    def test_concurrent_queries_do_not_serialize(self):
+        async def slow_retrieve(question):
+            await asyncio.sleep(0.2)
+            return []
+
+        async def run_many():
+            return await asyncio.gather(*(rag_service.query(f"Frage {i}") for i in range(20)))
+
+        import time
+
+        with patch.object(rag_service, "_retrieve", slow_retrieve):
+            started = time.monotonic()
+            results = asyncio.run(run_many())
+        assert len(results) == 20
+        assert time.monotonic() - started < 1.0
+
+
+class TestIndexSync:
+    def _setup(self, monkeypatch, tmp_path, payloads):
+        import services.db as db_mod
+        from services import hybrid_search
+        from services.db import _MemStore
+        from services.hybrid_search import HybridSearcher
+
+        monkeypatch.setattr(db_mod, "_store", _MemStore(persist=False))
+        monkeypatch.setattr(hybrid_search.vector_store, "iter_payloads", lambda: iter([]))
+        monkeypatch.setattr(
+            rag_service.vector_store,
+            "iter_payloads",
+            lambda document_id=None: iter(payloads.get(document_id, [])),
+        )
+
+        def searcher():
+            return HybridSearcher(
+                snapshot_path=tmp_path / "streamworks.bm25",
+                collection="streamworks",
+                watermark=rag_service._sync_watermark,
+            )
+
+        monkeypatch.setattr(rag_service, "_hybrid_searcher", searcher())
+        return db_mod._store, searcher
+
+    def test_finished_documents_are_synced_once(self, monkeypatch, tmp_path):
+        payloads = {
+            "a": [{"id": "00000000-0000-0000-0000-00000000000a", "text": "agent alpha"}],
+            "b": [{"id": "00000000-0000-0000-0000-00000000000b", "text": "agent beta"}],
+        }
+        store, searcher = self._setup(monkeypatch, tmp_path, payloads)
+        # Empty index built first: nothing finished yet
+        assert rag_service.sync_index() == 0
+
+        store.table("documents").insert([
+            {"id": "a", "status": "ready", "updated_at": "2024-01-01T00:00:00+00:00"},
+            {"id": "b", "status": "ready", "updated_at": "2024-01-02T00:00:00+00:00"},
+            {"id": "c", "status": "processing", "updated_at": "2024-01-03T00:00:00+00:00"},
+        ]).execute()
+        assert rag_service.sync_index(batch_size=1) == 2
+        assert rag_service.sync_index() == 0
+        assert rag_service.index_stats()["chunks"] == 2
+
+        # A restarted API resumes from the position stored in the snapshot
+        rag_service.flush_index()
+        monkeypatch.setattr(rag_service, "_hybrid_searcher", searcher())
+        assert rag_service.sync_index() == 0
+
+        # Re-ingested documents come back with a newer updated_at
+        store.table("documents").update(
+            {"updated_at": "2024-01-04T00:00:00+00:00"}
+        ).eq("id", "a").execute()
+        assert rag_service.sync_index() == 1
+        assert rag_service.index_stats()["chunks"] == 2
+
+    def test_rows_of_open_transactions_wait_for_the_horizon(self, monkeypatch, tmp_path):
+        payloads = {
+            "a": [{"id": "00000000-0000-0000-0000-00000000000a", "text": "agent alpha"}],
+            "b": [{"id": "00000000-0000-0000-0000-00000000000b", "text": "agent beta"}],
+        }
+        store, _ = self._setup(monkeypatch, tmp_path, payloads)
+        assert rag_service.sync_index() == 0
+
+        # "a" was stamped by a transaction that is still open when "b" is seen
+        monkeypatch.setattr(rag_service, "commit_horizon", lambda: "2024-01-01T00:00:00+00:00")
+        store.table("documents").insert([
+            {"id": "a", "status": "ready", "updated_at": "2024-01-01T00:00:00+00:00"},
+            {"id": "b", "status": "ready", "updated_at": "2024-01-02T00:00:00+00:00"},
+        ]).execute()
+        assert rag_service.sync_index() == 0
+
+        # Once it has committed both are picked up, "a" is not passed over
+        monkeypatch.setattr(rag_service, "commit_horizon", lambda: "2024-01-03T00:00:00+00:00")
+        assert rag_service.sync_index() == 2
+        assert rag_service.index_stats()["chunks"] == 2
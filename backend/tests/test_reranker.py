@@ -36,7 +36,7 @@ class TestReranker:
             {"id": 5, "score": 0.75},
         ])
 
-        with patch("services.reranker.OpenAI") as MockOpenAI:
+        with patch("services.llm_gateway.get_client") as MockOpenAI:
             mock_client = MagicMock()
             mock_client.chat.completions.create.return_value = mock_response
             MockOpenAI.return_value = mock_client
@@ -53,7 +53,7 @@ class TestReranker:
             for i in range(10)
         ]
 
-        with patch("services.reranker.OpenAI") as MockOpenAI:
+        with patch("services.llm_gateway.get_client") as MockOpenAI:
             mock_client = MagicMock()
             mock_client.chat.completions.create.side_effect = Exception("API Error")
             MockOpenAI.return_value = mock_client
@@ -63,3 +63,28 @@ class TestReranker:
         # Should fall back to original order, limited to top_k
         assert len(reranked) == 3
         assert all("rerank_score" in r for r in reranked)
+
+
+class TestAsyncReranker:
+    def test_arerank_uses_async_client(self):
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        from services.reranker import arerank
+
+        results = [{"text": f"Document {i}", "score": 0.5} for i in range(8)]
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = json.dumps({"scores": [
+            {"id": 6, "score": 0.9},
+            {"id": 2, "score": 0.8},
+        ]})
+
+        with patch("services.llm_gateway.get_async_client") as MockAsyncOpenAI:
+            client = MagicMock()
+            client.chat.completions.create = AsyncMock(return_value=response)
+            MockAsyncOpenAI.return_value = client
+
+            reranked = asyncio.run(arerank("query", results, top_k=2))
+
+        assert [r["text"] for r in reranked] == ["Document 6", "Document 2"]
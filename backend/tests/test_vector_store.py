@@ -0,0 +1,123 @@
+"""Tests for vector store point ids and document sync (in-memory Qdrant)."""
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
+
+from config import get_settings
+from services import vector_store
+
+
+DIM = 4
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        collection_name=get_settings().qdrant_collection,
+        vectors_config=VectorParams(size=DIM, distance=Distance.COSINE),
+    )
+    monkeypatch.setattr(vector_store, "get_qdrant_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    calls: list[list[str]] = []
+
+    def fake_embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.0, 0.0] for t in texts]
+
+    monkeypatch.setattr(vector_store, "embed_texts", fake_embed)
+    return calls
+
+
+def _chunks(texts):
+    return [
+        {"text": text, "metadata": {"document_name": "doc.pdf", "chunk_index": i}}
+        for i, text in enumerate(texts)
+    ]
+
+
+def _count(client):
+    return client.count(get_settings().qdrant_collection).count
+
+
+class TestPointIds:
+    def test_deterministic(self):
+        a = vector_store.chunk_point_id("doc", 0, "text")
+        assert a == vector_store.chunk_point_id("doc", 0, "text")
+        assert a != vector_store.chunk_point_id("doc", 1, "text")
+        assert a != vector_store.chunk_point_id("doc", 0, "other")
+        assert a != vector_store.chunk_point_id("other", 0, "text")
+
+    def test_reupsert_does_not_duplicate(self, qdrant):
+        chunks = [
+            {"text": "alpha", "embedding": [1.0, 0, 0, 0], "metadata": {"chunk_index": 0}},
+            {"text": "beta", "embedding": [0, 1.0, 0, 0], "metadata": {"chunk_index": 1}},
+        ]
+        vector_store.upsert_chunks("doc", chunks)
+        vector_store.upsert_chunks("doc", chunks)
+        assert _count(qdrant) == 2
+
+
+class TestSyncDocumentChunks:
+    def test_initial_sync_embeds_everything(self, qdrant, embedded):
+        result = vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        assert result["upserted"] == 3 and result["embedded"] == 3
+        assert _count(qdrant) == 3
+        assert result["chunks_count"] == 3
+        ids = [vector_store.chunk_point_id("doc", i, t) for i, t in enumerate("abc")]
+        assert len(qdrant.retrieve(get_settings().qdrant_collection, ids)) == 3
+
+    def test_unchanged_document_writes_nothing(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        result = vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        assert result == {
+            "chunks_count": 3,
+            "upserted": 0,
+            "deleted": 0,
+            "unchanged": 3,
+            "embedded": 0,
+        }
+        assert len(embedded) == 1
+
+    def test_changed_chunk_is_replaced(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        result = vector_store.sync_document_chunks("doc", _chunks(["a", "B!", "c"]))
+        assert (result["upserted"], result["deleted"], result["unchanged"]) == (1, 1, 2)
+        assert embedded[-1] == ["B!"]
+        assert _count(qdrant) == 3
+
+    def test_removed_chunks_are_deleted(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        result = vector_store.sync_document_chunks("doc", _chunks(["a"]))
+        assert result["deleted"] == 2
+        assert _count(qdrant) == 1
+
+    def test_shifted_chunks_reuse_stored_vectors(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc", _chunks(["a", "b", "c"]))
+        result = vector_store.sync_document_chunks("doc", _chunks(["new", "a", "b", "c"]))
+        # Every position changed, but only the new text needs an embedding
+        assert result["upserted"] == 4
+        assert result["embedded"] == 1
+        assert embedded[-1] == ["new"]
+        assert _count(qdrant) == 4
+
+    def test_changed_metadata_is_rewritten_without_embedding(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc", _chunks(["a", "b"]))
+        chunks = _chunks(["a", "b"])
+        chunks[1]["metadata"]["page"] = 7
+        result = vector_store.sync_document_chunks("doc", chunks)
+        assert (result["upserted"], result["embedded"]) == (1, 0)
+        point_id = vector_store.chunk_point_id("doc", 1, "b")
+        point = qdrant.retrieve(get_settings().qdrant_collection, [point_id])[0]
+        assert point.payload["page"] == 7
+
+    def test_other_documents_untouched(self, qdrant, embedded):
+        vector_store.sync_document_chunks("doc-1", _chunks(["a", "b"]))
+        vector_store.sync_document_chunks("doc-2", _chunks(["x"]))
+        vector_store.sync_document_chunks("doc-1", [])
+        assert _count(qdrant) == 1
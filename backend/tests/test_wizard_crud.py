@@ -28,6 +28,24 @@ class TestListSessions:
         assert len(resp.json()) == 2
 
 
+    def test_list_paged(self, client):
+        for _ in range(3):
+            client.post("/api/wizard/sessions")
+        first = client.get("/api/wizard/sessions/paged", params={"limit": 2}).json()
+        assert len(first["items"]) == 2
+        rest = client.get(
+            "/api/wizard/sessions/paged", params={"limit": 2, "cursor": first["next_cursor"]}
+        ).json()
+        assert len(rest["items"]) == 1
+        assert rest["next_cursor"] is None
+        ids = {s["id"] for s in first["items"] + rest["items"]}
+        assert ids == {s["id"] for s in client.get("/api/wizard/sessions").json()}
+
+    def test_list_paged_rejects_invalid_cursor(self, client):
+        resp = client.get("/api/wizard/sessions/paged", params={"cursor": "kaputt"})
+        assert resp.status_code == 400
+
+
 class TestGetSession:
     def test_get_existing(self, client):
         create_resp = client.post("/api/wizard/sessions")